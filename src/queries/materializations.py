@@ -0,0 +1,158 @@
+"""
+Pre-aggregated rollup tables for ACCOUNT_USAGE analysis
+
+QUERY_HISTORY, WAREHOUSE_METERING_HISTORY and LOGIN_HISTORY hold months of rows and every tool
+invocation re-scans them. When SNOWFLAKE_ROLLUP_SCHEMA points at a writable schema
+(e.g. "ANALYTICS.MCP_ROLLUP"), the rollup tables below are created there, kept fresh
+by a Snowflake TASK, and the optimization queries read from them instead.
+
+- query_history_hourly: successful queries aggregated per hour, warehouse, user,
+  query hash and execution time bucket
+- warehouse_metering_hourly: warehouse credit consumption per hour
+- login_history_hourly: successful logins aggregated per hour, user and first
+  authentication factor
+
+The refresh task re-aggregates a trailing window on every run so rows that land
+late in ACCOUNT_USAGE (up to 45 minutes for QUERY_HISTORY, 2 hours for LOGIN_HISTORY,
+3 hours for metering)
+are picked up without creating duplicates.
+"""
+
+from functools import lru_cache
+from typing import List, Optional
+
+from utils.envs import envs
+
+# (label, lower bound ms, upper bound ms) - shared by the rollup and the distribution query
+EXECUTION_TIME_BUCKETS = (
+    ('Less than 1 second', 0, 1000),
+    ('1-5 seconds', 1000, 5000),
+    ('5-10 seconds', 5000, 10000),
+    ('10-20 seconds', 10000, 20000),
+    ('20-30 seconds', 20000, 30000),
+    ('30-60 seconds', 30000, 60000),
+    ('1-2 minutes', 60000, 120000),
+    ('More than 2 minutes', 120000, 999999999),
+)
+
+ROLLUP_REFRESH_LOOKBACK_HOURS = 3
+ROLLUP_REFRESH_SCHEDULE = '15 MINUTE'
+
+def get_rollup_schema() -> Optional[str]:
+    """Get the fully qualified rollup schema, or None when rollups are disabled"""
+    return envs.SNOWFLAKE_ROLLUP_SCHEMA
+
+@lru_cache(maxsize=None)
+def execution_bucket_expression(column: str = 'execution_time') -> str:
+    """CASE expression mapping an execution time to its bucket's lower bound"""
+    branches = "\n".join(
+        f"            WHEN {column} < {upper} THEN {lower}"
+        for _, lower, upper in EXECUTION_TIME_BUCKETS[:-1]
+    )
+    return (
+        f"CASE\n            WHEN {column} IS NULL THEN NULL\n{branches}\n"
+        f"            ELSE {EXECUTION_TIME_BUCKETS[-1][1]}\n        END"
+    )
+
+def _query_history_hourly_select(since: Optional[str] = None) -> str:
+    """Aggregate successful QUERY_HISTORY rows into hourly rollup rows"""
+    since_filter = f"AND start_time >= {since}" if since else ""
+    return f"""
+    SELECT
+        DATE_TRUNC('hour', start_time) as hr,
+        warehouse_name,
+        user_name,
+        query_hash,
+        {execution_bucket_expression()} as execution_time_bucket,
+        COUNT(*) as cnt,
+        SUM(total_elapsed_time) as sum_elapsed,
+        SUM(execution_time) as sum_exec,
+        SUM(credits_used_cloud_services) as sum_credits,
+        SUM(bytes_scanned) as sum_bytes,
+        -- Sample id and text come from the same query: query_id is unique, so it picks one row
+        MAX(query_id) as sample_query_id,
+        MAX_BY(query_text, query_id) as sample_query_text
+    FROM snowflake.account_usage.query_history
+    WHERE execution_status = 'SUCCESS'
+        {since_filter}
+    GROUP BY 1, 2, 3, 4, 5
+    """
+
+def _warehouse_metering_hourly_select(since: Optional[str] = None) -> str:
+    """Copy hourly WAREHOUSE_METERING_HISTORY rows into the rollup layout"""
+    since_filter = f"WHERE start_time >= {since}" if since else ""
+    return f"""
+    SELECT
+        start_time as hr,
+        warehouse_name,
+        credits_used,
+        credits_used_compute,
+        credits_used_cloud_services
+    FROM snowflake.account_usage.warehouse_metering_history
+    {since_filter}
+    """
+
+def _login_history_hourly_select(since: Optional[str] = None) -> str:
+    """Aggregate successful LOGIN_HISTORY rows into hourly rollup rows"""
+    since_filter = f"AND event_timestamp >= {since}" if since else ""
+    return f"""
+    SELECT
+        DATE_TRUNC('hour', event_timestamp) as hr,
+        user_name,
+        first_authentication_factor,
+        COUNT(*) as cnt,
+        MAX(event_timestamp) as last_login
+    FROM snowflake.account_usage.login_history
+    WHERE is_success = 'YES'
+        {since_filter}
+    GROUP BY 1, 2, 3
+    """
+
+def _refresh_statements(schema: str) -> List[str]:
+    """Delete and re-aggregate the trailing window of each rollup table"""
+    statements = []
+    for table, select_builder in (
+        ('query_history_hourly', _query_history_hourly_select),
+        ('warehouse_metering_hourly', _warehouse_metering_hourly_select),
+        ('login_history_hourly', _login_history_hourly_select),
+    ):
+        # Capture the cutoff once so the DELETE and INSERT cover the same window
+        cutoff = f"{table}_cutoff"
+        statements.append(
+            f"LET {cutoff} TIMESTAMP_LTZ := (SELECT DATEADD(hour, -{ROLLUP_REFRESH_LOOKBACK_HOURS}, "
+            f"COALESCE(MAX(hr), '1970-01-01'::timestamp_ltz)) FROM {schema}.{table});"
+        )
+        statements.append(f"DELETE FROM {schema}.{table} WHERE hr >= :{cutoff};")
+        statements.append(
+            f"INSERT INTO {schema}.{table} {select_builder(f':{cutoff}').strip()};"
+        )
+    return statements
+
+def get_rollup_setup_statements(schema: str, warehouse: str) -> List[str]:
+    """Get the DDL that creates the rollup tables and their refresh task"""
+    refresh_body = "\n        ".join(_refresh_statements(schema))
+    return [
+        f"CREATE SCHEMA IF NOT EXISTS {schema};",
+        f"""
+    CREATE TABLE IF NOT EXISTS {schema}.query_history_hourly AS
+    {_query_history_hourly_select().strip()};
+    """,
+        f"""
+    CREATE TABLE IF NOT EXISTS {schema}.warehouse_metering_hourly AS
+    {_warehouse_metering_hourly_select().strip()};
+    """,
+        f"""
+    CREATE TABLE IF NOT EXISTS {schema}.login_history_hourly AS
+    {_login_history_hourly_select().strip()};
+    """,
+        f"""
+    CREATE OR REPLACE TASK {schema}.refresh_rollups
+        WAREHOUSE = {warehouse}
+        SCHEDULE = '{ROLLUP_REFRESH_SCHEDULE}'
+    AS
+    BEGIN
+        {refresh_body}
+    END;
+    """,
+        f"ALTER TASK {schema}.refresh_rollups RESUME;",
+    ]
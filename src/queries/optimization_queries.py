@@ -8,177 +8,355 @@ All queries have been verified against the official Snowflake ACCOUNT_USAGE docu
 - Proper error handling for NULL values
 
 Last verified: 2024-12-25
+
+When SNOWFLAKE_ROLLUP_SCHEMA is configured, the aggregate queries read from the
+hourly rollup tables in queries/materializations.py instead of the raw views.
+
+Each builder returns (sql, params). Time windows, limits and the credit price are
+bind parameters, so the SQL text is stable across argument values and nothing is
+interpolated into it; the generated SQL fragments are memoized per process. Time
+windows are computed in Python rather than with DATEADD(..., CURRENT_TIMESTAMP()),
+so the bound is a constant at compile time and Snowflake can prune micro-partitions
+on start_time.
 """
 
-def get_slow_queries(hours_back: int = 24, limit: int = 50) -> str:
-    """Get the slowest queries in the specified time period"""
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+from typing import Any, Dict, Tuple
+
+from queries.materializations import (
+    EXECUTION_TIME_BUCKETS,
+    execution_bucket_expression,
+    get_rollup_schema
+)
+
+def _cutoff(hours_back: int, hourly: bool = False) -> str:
+    """Get the start of the lookback window as a timestamp string for binding"""
+    cutoff = datetime.now(timezone.utc) - timedelta(hours=hours_back)
+    # Truncate so repeated calls within the same minute (or hour) produce identical SQL
+    cutoff = cutoff.replace(minute=0 if hourly else cutoff.minute, second=0, microsecond=0)
+    return cutoff.strftime('%Y-%m-%d %H:%M:%S +00:00')
+
+@lru_cache(maxsize=None)
+def _buckets_cte() -> str:
+    """Build the execution time bucket CTE from the shared bucket definitions"""
+    rows = [f"SELECT '{EXECUTION_TIME_BUCKETS[0][0]}' as bucket, {EXECUTION_TIME_BUCKETS[0][1]} as lower_bound, {EXECUTION_TIME_BUCKETS[0][2]} as upper_bound"]
+    rows += [f"UNION ALL SELECT '{label}', {lower}, {upper}" for label, lower, upper in EXECUTION_TIME_BUCKETS[1:]]
+    return "\n        ".join(rows)
+
+@lru_cache(maxsize=None)
+def _with_query_text(top_queries: str, order_by: str,
+                     source: str = 'snowflake.account_usage.query_history',
+                     id_column: str = 'query_id', text_column: str = 'query_text') -> str:
+    """
+    Attach query text to an already ranked top-K so the wide column is only read for those rows.
+    
+    Only the first text_rows rows get their text; reports display a handful of queries
+    but use every row of the top-K for their statistics.
+    """
     return f"""
+    WITH top_queries AS ({top_queries}
+    ),
+    ranked AS (
+        SELECT 
+            t.*,
+            ROW_NUMBER() OVER (ORDER BY t.{order_by} DESC) as text_rank
+        FROM top_queries t
+    )
     SELECT 
-        query_id,
-        query_text,
-        warehouse_name,
-        user_name,
-        execution_time/1000 as execution_time_seconds,
-        total_elapsed_time/1000 as total_elapsed_time_seconds,
-        bytes_scanned,
-        rows_produced,
-        compilation_time,
-        queued_provisioning_time + queued_overload_time + queued_repair_time as total_queued_time
-    FROM snowflake.account_usage.query_history
-    WHERE start_time >= DATEADD(hour, -{hours_back}, CURRENT_TIMESTAMP())
-        AND execution_status = 'SUCCESS'
-    ORDER BY execution_time DESC
-    LIMIT {limit};
+        r.* EXCLUDE text_rank,
+        qt.query_text as {text_column}
+    FROM ranked r
+    LEFT JOIN {source} qt
+        ON qt.query_id = r.{id_column}
+        AND qt.start_time >= %(since)s::timestamp_ltz
+        AND r.text_rank <= %(text_rows)s
+    -- Same order as the text cut, so ties cannot swap rows across it
+    ORDER BY r.text_rank;
     """
 
-def get_query_patterns(hours_back: int = 168, limit: int = 100) -> str:
+def get_slow_queries(hours_back: int = 24, limit: int = 50, detail_rows: int = 10) -> Tuple[str, Dict[str, Any]]:
+    """
+    Get the slowest queries in the specified time period.
+    
+    Statistics over the whole top `limit` window are returned as WINDOW_* columns on
+    each row, so only the first detail_rows queries are transferred.
+    """
+    sql = _with_query_text("""
+    SELECT 
+        *,
+        COUNT(*) OVER () as window_query_count,
+        MAX(execution_time_seconds) OVER () as window_max_execution_seconds,
+        AVG(bytes_scanned) OVER () as window_avg_bytes_scanned,
+        AVG(total_queued_time) OVER () as window_avg_queued_time
+    FROM (
+        SELECT 
+            query_id,
+            warehouse_name,
+            user_name,
+            execution_time/1000 as execution_time_seconds,
+            total_elapsed_time/1000 as total_elapsed_time_seconds,
+            bytes_scanned,
+            rows_produced,
+            compilation_time,
+            queued_provisioning_time + queued_overload_time + queued_repair_time as total_queued_time
+        FROM snowflake.account_usage.query_history
+        WHERE start_time >= %(since)s::timestamp_ltz
+            AND execution_status = 'SUCCESS'
+        QUALIFY ROW_NUMBER() OVER (ORDER BY execution_time DESC) <= %(limit)s
+    )
+    QUALIFY ROW_NUMBER() OVER (ORDER BY execution_time_seconds DESC) <= %(detail_rows)s""", 'execution_time_seconds')
+    return sql, {'since': _cutoff(hours_back), 'limit': limit, 'detail_rows': detail_rows, 'text_rows': detail_rows}
+
+def get_slow_query_summary(hours_back: int = 24, limit: int = 1000) -> Tuple[str, Dict[str, Any]]:
+    """Count and average the slowest queries in Snowflake instead of returning them"""
+    sql = """
+    SELECT 
+        COUNT(*) as total_queries,
+        AVG(execution_time_seconds) as avg_execution_seconds,
+        COUNT_IF(execution_time_seconds > 60) as slow_queries
+    FROM (
+        SELECT execution_time/1000 as execution_time_seconds
+        FROM snowflake.account_usage.query_history
+        WHERE start_time >= %(since)s::timestamp_ltz
+            AND execution_status = 'SUCCESS'
+        QUALIFY ROW_NUMBER() OVER (ORDER BY execution_time DESC) <= %(limit)s
+    );
+    """
+    return sql, {'since': _cutoff(hours_back), 'limit': limit}
+
+def get_query_patterns(hours_back: int = 168, limit: int = 100, text_rows: int = 10) -> Tuple[str, Dict[str, Any]]:
     """Find frequently repeated expensive query patterns"""
-    return f"""
+    rollup_schema = get_rollup_schema()
+    if rollup_schema:
+        sql = f"""
+    SELECT 
+        query_hash,
+        SUM(cnt) as execution_count,
+        SUM(sum_elapsed)/1000 as total_time_seconds,
+        SUM(sum_elapsed)/SUM(cnt)/1000 as avg_time_seconds,
+        COALESCE(SUM(sum_credits), 0) as total_credits_used,
+        -- Take the sample and its warehouse from one rollup row, keyed by the unique sample id
+        MAX(sample_query_id) as sample_query_id,
+        MAX_BY(sample_query_text, sample_query_id) as sample_query_text,
+        MAX_BY(warehouse_name, sample_query_id) as warehouse_name
+    FROM {rollup_schema}.query_history_hourly
+    WHERE hr >= %(since_hour)s::timestamp_ltz
+        AND query_hash IS NOT NULL
+    GROUP BY query_hash
+    HAVING SUM(cnt) > 1
+    QUALIFY ROW_NUMBER() OVER (ORDER BY SUM(sum_elapsed) DESC) <= %(limit)s
+    ORDER BY SUM(sum_elapsed) DESC;
+    """
+        return sql, {'since_hour': _cutoff(hours_back, hourly=True), 'limit': limit}
+    sql = _with_query_text("""
     SELECT 
         query_hash,
         COUNT(*) as execution_count,
         SUM(total_elapsed_time)/1000 as total_time_seconds,
         AVG(total_elapsed_time)/1000 as avg_time_seconds,
-        SUM(COALESCE(credits_used_cloud_services, 0)) as total_credits_used,
-        ANY_VALUE(query_id) as sample_query_id,
-        ANY_VALUE(query_text) as sample_query_text,
-        ANY_VALUE(warehouse_name) as warehouse_name
+        COALESCE(SUM(credits_used_cloud_services), 0) as total_credits_used,
+        -- The sample text is joined on sample_query_id, so take the warehouse from that query too
+        MAX(query_id) as sample_query_id,
+        MAX_BY(warehouse_name, query_id) as warehouse_name
     FROM snowflake.account_usage.query_history
-    WHERE start_time >= DATEADD(hour, -{hours_back}, CURRENT_TIMESTAMP())
+    WHERE start_time >= %(since)s::timestamp_ltz
         AND execution_status = 'SUCCESS'
+        -- Queries without a hash would otherwise collapse into one meaningless group
+        AND query_hash IS NOT NULL
     GROUP BY query_hash
     HAVING COUNT(*) > 1
-    ORDER BY SUM(total_elapsed_time) DESC
-    LIMIT {limit};
-    """
+    QUALIFY ROW_NUMBER() OVER (ORDER BY SUM(total_elapsed_time) DESC) <= %(limit)s""",
+        'total_time_seconds', id_column='sample_query_id', text_column='sample_query_text')
+    return sql, {'since': _cutoff(hours_back), 'limit': limit, 'text_rows': text_rows}
 
-def get_warehouse_credit_usage(days_back: int = 7) -> str:
+def get_warehouse_credit_usage(days_back: int = 7, credit_price: float = 4.00) -> Tuple[str, Dict[str, Any]]:
     """Analyze credit consumption by warehouse"""
-    return f"""
+    params = {'since': _cutoff(days_back * 24), 'credit_price': credit_price}
+    rollup_schema = get_rollup_schema()
+    if rollup_schema:
+        sql = f"""
+    SELECT 
+        warehouse_name,
+        SUM(credits_used_compute) as credits_used_compute_sum,
+        AVG(credits_used_compute) as avg_credits_per_hour,
+        COUNT(*) as active_hours,
+        SUM(credits_used_compute) * %(credit_price)s as estimated_cost
+    FROM {rollup_schema}.warehouse_metering_hourly
+    WHERE hr >= %(since)s::timestamp_ltz
+    GROUP BY warehouse_name
+    ORDER BY credits_used_compute_sum DESC;
+    """
+        return sql, params
+    sql = """
     SELECT 
         warehouse_name,
         SUM(credits_used_compute) as credits_used_compute_sum,
         AVG(credits_used_compute) as avg_credits_per_hour,
         COUNT(*) as active_hours,
-        SUM(credits_used_compute) * {{credit_price}} as estimated_cost
+        SUM(credits_used_compute) * %(credit_price)s as estimated_cost
     FROM snowflake.account_usage.warehouse_metering_history
-    WHERE start_time >= DATEADD(day, -{days_back}, CURRENT_TIMESTAMP())
+    WHERE start_time >= %(since)s::timestamp_ltz
     GROUP BY warehouse_name
     ORDER BY credits_used_compute_sum DESC;
     """
+    return sql, params
 
-def get_cost_per_query(days_back: int = 30) -> str:
+def get_cost_per_query(days_back: int = 30, credit_price: float = 4.00) -> Tuple[str, Dict[str, Any]]:
     """Calculate cost per query by warehouse"""
-    return f"""
-    WITH query_counts AS (
+    # Tag query and metering rows, stack them and aggregate once instead of joining two aggregates.
+    # Each side's column is NULL on the other side's rows, so a warehouse missing one side
+    # gets NULL aggregates for it, as the FULL OUTER JOIN did
+    sql = """
+    WITH usage AS (
         SELECT 
             warehouse_name,
-            COUNT(query_id) as query_count
+            1 as is_query,
+            NULL as credits_used
         FROM snowflake.account_usage.query_history
-        WHERE start_time >= DATEADD(day, -{days_back}, CURRENT_TIMESTAMP())
+        WHERE start_time >= %(since)s::timestamp_ltz
             AND execution_status = 'SUCCESS'
-        GROUP BY warehouse_name
-    ),
-    warehouse_costs AS (
+        UNION ALL
         SELECT 
             warehouse_name,
-            SUM(credits_used) as credits_used,
-            SUM(credits_used) * {{credit_price}} as total_cost
+            NULL as is_query,
+            credits_used
         FROM snowflake.account_usage.warehouse_metering_history
-        WHERE start_time >= DATEADD(day, -{days_back}, CURRENT_TIMESTAMP())
-        GROUP BY warehouse_name
+        WHERE start_time >= %(since)s::timestamp_ltz
     )
     SELECT 
-        COALESCE(wc.warehouse_name, qc.warehouse_name) as warehouse_name,
-        qc.query_count,
-        wc.credits_used,
-        wc.total_cost,
-        CASE WHEN qc.query_count > 0 
-             THEN ROUND(wc.total_cost / qc.query_count, 4) 
-             ELSE 0 END as cost_per_query
-    FROM query_counts qc
-    FULL OUTER JOIN warehouse_costs wc ON wc.warehouse_name = qc.warehouse_name
+        warehouse_name,
+        SUM(is_query) as query_count,
+        SUM(credits_used) as credits_used,
+        SUM(credits_used) * %(credit_price)s as total_cost,
+        ROUND(SUM(credits_used) * %(credit_price)s / NULLIF(SUM(is_query), 0), 4) as cost_per_query
+    FROM usage
+    GROUP BY warehouse_name
     ORDER BY cost_per_query DESC NULLS LAST;
     """
+    return sql, {'since': _cutoff(days_back * 24), 'credit_price': credit_price}
 
-def get_execution_time_distribution(days_back: int = 7) -> str:
+def get_execution_time_distribution(days_back: int = 7) -> Tuple[str, Dict[str, Any]]:
     """Analyze query execution time distribution"""
-    return f"""
+    # Bucket inside the scan and group on the bucket; labels are joined onto the 8 aggregated rows
+    rollup_schema = get_rollup_schema()
+    if rollup_schema:
+        params = {'since_hour': _cutoff(days_back * 24, hourly=True)}
+        bucket_counts = f"""
+        SELECT 
+            execution_time_bucket,
+            SUM(cnt) as query_count
+        FROM {rollup_schema}.query_history_hourly
+        WHERE hr >= %(since_hour)s::timestamp_ltz
+        GROUP BY execution_time_bucket
+        """
+    else:
+        params = {'since': _cutoff(days_back * 24)}
+        bucket_counts = f"""
+        SELECT 
+            {execution_bucket_expression()} as execution_time_bucket,
+            COUNT(*) as query_count
+        FROM snowflake.account_usage.query_history
+        WHERE start_time >= %(since)s::timestamp_ltz
+            AND execution_status = 'SUCCESS'
+        GROUP BY 1
+        """
+    sql = f"""
     WITH buckets AS (
-        SELECT 'Less than 1 second' as bucket, 0 as lower_bound, 1000 as upper_bound
-        UNION ALL SELECT '1-5 seconds', 1000, 5000
-        UNION ALL SELECT '5-10 seconds', 5000, 10000
-        UNION ALL SELECT '10-20 seconds', 10000, 20000
-        UNION ALL SELECT '20-30 seconds', 20000, 30000
-        UNION ALL SELECT '30-60 seconds', 30000, 60000
-        UNION ALL SELECT '1-2 minutes', 60000, 120000
-        UNION ALL SELECT 'More than 2 minutes', 120000, 999999999
-    )
+        {_buckets_cte()}
+    ),
+    bucket_counts AS ({bucket_counts})
     SELECT 
         b.bucket as execution_time_bucket,
-        COUNT(q.query_id) as query_count,
-        ROUND(100.0 * COUNT(q.query_id) / SUM(COUNT(q.query_id)) OVER(), 2) as percentage
-    FROM snowflake.account_usage.query_history q
-    JOIN buckets b ON q.execution_time >= b.lower_bound AND q.execution_time < b.upper_bound
-    WHERE q.start_time >= DATEADD(day, -{days_back}, CURRENT_TIMESTAMP())
-        AND q.execution_status = 'SUCCESS'
-    GROUP BY b.bucket, b.lower_bound
+        c.query_count,
+        ROUND(100.0 * c.query_count / SUM(c.query_count) OVER(), 2) as percentage
+    FROM bucket_counts c
+    JOIN buckets b ON c.execution_time_bucket = b.lower_bound
     ORDER BY b.lower_bound;
     """
+    return sql, params
 
-def get_query_acceleration_candidates(days_back: int = 7, limit: int = 50) -> str:
+def get_query_acceleration_candidates(days_back: int = 7, limit: int = 50, text_rows: int = 20) -> Tuple[str, Dict[str, Any]]:
     """Find queries that would benefit from acceleration service"""
-    return f"""
+    sql = _with_query_text("""
     SELECT 
         query_id,
         eligible_query_acceleration_time,
         warehouse_name,
-        query_text,
-        user_name,
-        start_time
+        user_name
     FROM snowflake.account_usage.query_acceleration_eligible
-    WHERE start_time >= DATEADD(day, -{days_back}, CURRENT_TIMESTAMP())
-    ORDER BY eligible_query_acceleration_time DESC
-    LIMIT {limit};
-    """
+    WHERE start_time >= %(since)s::timestamp_ltz
+        AND start_time < %(until)s::timestamp_ltz
+        AND eligible_query_acceleration_time > 0
+    QUALIFY ROW_NUMBER() OVER (ORDER BY eligible_query_acceleration_time DESC) <= %(limit)s""",
+        'eligible_query_acceleration_time', source='snowflake.account_usage.query_acceleration_eligible')
+    return sql, {'since': _cutoff(days_back * 24), 'until': _cutoff(0), 'limit': limit, 'text_rows': text_rows}
 
-def get_warehouse_utilization(days_back: int = 7) -> str:
+def get_warehouse_utilization(days_back: int = 7) -> Tuple[str, Dict[str, Any]]:
     """Analyze warehouse utilization patterns"""
-    return f"""
+    sql = """
     WITH warehouse_sizes AS (
         SELECT 
             warehouse_name,
-            MODE(warehouse_size) as current_warehouse_size
+            -- Warehouse sizes have few distinct values, so 10 counters keep the top-1 exact
+            APPROX_TOP_K(warehouse_size, 1, 10)[0][0]::string as current_warehouse_size
         FROM snowflake.account_usage.query_history
-        WHERE start_time >= DATEADD(day, -{days_back}, CURRENT_TIMESTAMP())
+        WHERE start_time >= %(since)s::timestamp_ltz
+            -- Cloud-services-only queries have no warehouse
+            AND warehouse_name IS NOT NULL
             AND warehouse_size IS NOT NULL
         GROUP BY warehouse_name
+    ),
+    load_hourly AS (
+        -- Roll 5-minute load intervals up to the hourly grain of the metering view
+        SELECT 
+            warehouse_name,
+            DATE_TRUNC('hour', start_time) as hr,
+            SUM(avg_running) as sum_running,
+            SUM(avg_queued_load) as sum_queued_load,
+            COUNT(*) as load_intervals
+        FROM snowflake.account_usage.warehouse_load_history
+        WHERE start_time >= %(since)s::timestamp_ltz
+        GROUP BY 1, 2
+    ),
+    utilization AS (
+        SELECT 
+            lh.warehouse_name,
+            COALESCE(ws.current_warehouse_size, 'UNKNOWN') as warehouse_size,
+            SUM(lh.sum_running) / SUM(lh.load_intervals) as avg_concurrent_queries,
+            SUM(lh.sum_queued_load) / SUM(lh.load_intervals) as avg_queued_queries,
+            SUM(wmh.credits_used_compute) as total_credits,
+            COUNT(*) as total_hours_active,
+            ROUND(SUM(wmh.credits_used_compute) / NULLIF(COUNT(*), 0), 2) as avg_credits_per_hour
+        FROM load_hourly lh
+        LEFT JOIN snowflake.account_usage.warehouse_metering_history wmh 
+            ON lh.warehouse_name = wmh.warehouse_name 
+            AND lh.hr = wmh.start_time
+            AND wmh.start_time >= %(since_hour)s::timestamp_ltz
+        LEFT JOIN warehouse_sizes ws
+            ON lh.warehouse_name = ws.warehouse_name
+        GROUP BY lh.warehouse_name, ws.current_warehouse_size
     )
     SELECT 
-        wlh.warehouse_name,
-        COALESCE(ws.current_warehouse_size, 'UNKNOWN') as warehouse_size,
-        AVG(wlh.avg_running) as avg_concurrent_queries,
-        AVG(wlh.avg_queued_load) as avg_queued_queries,
-        SUM(wmh.credits_used_compute) as total_credits,
-        COUNT(DISTINCT DATE_TRUNC('hour', wlh.start_time)) as total_hours_active,
-        ROUND(SUM(wmh.credits_used_compute) / NULLIF(COUNT(DISTINCT DATE_TRUNC('hour', wlh.start_time)), 0), 2) as avg_credits_per_hour
-    FROM snowflake.account_usage.warehouse_load_history wlh
-    LEFT JOIN snowflake.account_usage.warehouse_metering_history wmh 
-        ON wlh.warehouse_name = wmh.warehouse_name 
-        AND DATE_TRUNC('hour', wlh.start_time) = wmh.start_time
-    LEFT JOIN warehouse_sizes ws
-        ON wlh.warehouse_name = ws.warehouse_name
-    WHERE wlh.start_time >= DATEADD(day, -{days_back}, CURRENT_TIMESTAMP())
-    GROUP BY wlh.warehouse_name, ws.current_warehouse_size
+        *,
+        -- Utilization flags and sizing advice, so the report only formats them
+        COALESCE(avg_concurrent_queries < 0.5, FALSE) as is_underutilized,
+        COALESCE(avg_queued_queries > 1.0, FALSE) as is_over_queued,
+        CASE
+            WHEN avg_concurrent_queries < 0.3 AND avg_queued_queries < 0.1 THEN 'DOWNSIZE'
+            WHEN avg_queued_queries > 2.0 THEN 'UPSIZE'
+            WHEN avg_concurrent_queries > 5.0 AND avg_queued_queries < 0.5 THEN 'WELL_SIZED'
+        END as sizing_recommendation
+    FROM utilization
     ORDER BY total_credits DESC NULLS LAST;
     """
+    return sql, {'since': _cutoff(days_back * 24), 'since_hour': _cutoff(days_back * 24, hourly=True)}
 
-def get_expensive_queries(days_back: int = 7, limit: int = 25) -> str:
+def get_expensive_queries(days_back: int = 7, limit: int = 25, text_rows: int = 10) -> Tuple[str, Dict[str, Any]]:
     """Find the most expensive queries by credit consumption"""
-    return f"""
+    sql = _with_query_text("""
     SELECT 
         query_id,
-        query_text,
         warehouse_name,
         user_name,
         start_time,
@@ -187,27 +365,69 @@ def get_expensive_queries(days_back: int = 7, limit: int = 25) -> str:
         bytes_scanned,
         rows_produced
     FROM snowflake.account_usage.query_history
-    WHERE start_time >= DATEADD(day, -{days_back}, CURRENT_TIMESTAMP())
+    WHERE start_time >= %(since)s::timestamp_ltz
         AND execution_status = 'SUCCESS'
         AND credits_used_cloud_services > 0
-    ORDER BY credits_used_cloud_services DESC
-    LIMIT {limit};
-    """
+    QUALIFY ROW_NUMBER() OVER (ORDER BY credits_used_cloud_services DESC) <= %(limit)s""", 'credits_used_cloud_services')
+    return sql, {'since': _cutoff(days_back * 24), 'limit': limit, 'text_rows': text_rows}
 
-def get_user_activity_summary(days_back: int = 7) -> str:
-    """Summarize user activity and resource consumption"""
+@lru_cache(maxsize=None)
+def _with_account_user_totals(per_user: str) -> str:
+    """
+    Add account-wide totals and top-20% thresholds to per-user aggregates, then keep the top users.
+    
+    The thresholds (linear-interpolated 80th percentiles) and the power-user and high-cost
+    sums are windowed over every user before QUALIFY cuts the result to `limit` rows.
+    """
     return f"""
+    WITH per_user AS ({per_user}
+    ),
+    thresholds AS (
+        SELECT 
+            *,
+            PERCENTILE_CONT(0.8) WITHIN GROUP (ORDER BY total_queries) OVER () as queries_p80,
+            PERCENTILE_CONT(0.8) WITHIN GROUP (ORDER BY total_credits_used) OVER () as credits_p80
+        FROM per_user
+    )
+    SELECT 
+        * EXCLUDE (queries_p80, credits_p80),
+        COUNT(*) OVER () as account_total_users,
+        SUM(total_queries) OVER () as account_total_queries,
+        SUM(total_credits_used) OVER () as account_total_credits,
+        SUM(IFF(total_queries > queries_p80, 1, 0)) OVER () as account_power_users,
+        SUM(IFF(total_queries > queries_p80, total_queries, 0)) OVER () as account_power_user_queries,
+        SUM(IFF(total_credits_used > credits_p80, total_credits_used, 0)) OVER () as account_high_cost_credits
+    FROM thresholds
+    QUALIFY ROW_NUMBER() OVER (ORDER BY total_credits_used DESC) <= %(limit)s
+    ORDER BY total_credits_used DESC;
+    """
+
+def get_user_activity_summary(days_back: int = 7, limit: int = 100) -> Tuple[str, Dict[str, Any]]:
+    """Summarize user activity and resource consumption for the top users by credits"""
+    rollup_schema = get_rollup_schema()
+    if rollup_schema:
+        sql = _with_account_user_totals(f"""
     SELECT 
         user_name,
-        COUNT(query_id) as total_queries,
+        SUM(cnt) as total_queries,
+        SUM(sum_exec)/1000 as total_execution_seconds,
+        SUM(sum_exec)/NULLIF(SUM(cnt), 0)/1000 as avg_execution_seconds,
+        COALESCE(SUM(sum_credits), 0) as total_credits_used,
+        APPROX_COUNT_DISTINCT(warehouse_name) as warehouses_used
+    FROM {rollup_schema}.query_history_hourly
+    WHERE hr >= %(since_hour)s::timestamp_ltz
+    GROUP BY user_name""")
+        return sql, {'since_hour': _cutoff(days_back * 24, hourly=True), 'limit': limit}
+    sql = _with_account_user_totals("""
+    SELECT 
+        user_name,
+        COUNT(*) as total_queries,
         SUM(execution_time)/1000 as total_execution_seconds,
         AVG(execution_time)/1000 as avg_execution_seconds,
-        SUM(COALESCE(credits_used_cloud_services, 0)) as total_credits_used,
-        COUNT(DISTINCT warehouse_name) as warehouses_used
+        COALESCE(SUM(credits_used_cloud_services), 0) as total_credits_used,
+        APPROX_COUNT_DISTINCT(warehouse_name) as warehouses_used
     FROM snowflake.account_usage.query_history
-    WHERE start_time >= DATEADD(day, -{days_back}, CURRENT_TIMESTAMP())
+    WHERE start_time >= %(since)s::timestamp_ltz
         AND execution_status = 'SUCCESS'
-    GROUP BY user_name
-    HAVING COUNT(query_id) > 0
-    ORDER BY total_credits_used DESC;
-    """
\ No newline at end of file
+    GROUP BY user_name""")
+    return sql, {'since': _cutoff(days_back * 24), 'limit': limit}
@@ -14,41 +14,15 @@ import sys
 import os
 from typing import List
 
-sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+# Running server.py directly already puts src/ first on sys.path; only add it when missing
+_SRC_DIR = os.path.dirname(os.path.abspath(__file__))
+if _SRC_DIR not in sys.path:
+    sys.path.append(_SRC_DIR)
 
 from fastmcp import FastMCP
 
-# Import generic tools
-from tools.generic import (
-    execute_account_usage_query,
-    explore_account_usage_schema,
-    build_query_from_description
-)
-
-# Import security tools
-from tools.security import (
-    analyze_user_authentication,
-    audit_privilege_changes,
-    detect_unusual_access_patterns
-)
-
-# Import existing tools
-from tools.performance import (
-    analyze_slow_queries,
-    analyze_query_patterns,
-    analyze_execution_time_distribution
-)
-from tools.costs import (
-    analyze_warehouse_costs,
-    analyze_cost_per_query,
-    find_expensive_queries,
-    analyze_user_costs
-)
-from tools.monitoring import (
-    analyze_warehouse_utilization,
-    find_query_acceleration_opportunities,
-    generate_optimization_report
-)
+# Tool modules are imported inside each tool so the Snowflake connector and pandas
+# load on first use rather than at server startup
 
 # Initialize FastMCP server
 mcp = FastMCP("Snowflake Account Intelligence")
@@ -66,6 +40,8 @@ def find_slow_queries(hours_back: int = 24, limit: int = 50) -> str:
     Returns:
         Formatted analysis of slow queries with optimization recommendations
     """
+    from tools.performance import analyze_slow_queries
+    
     return analyze_slow_queries(hours_back, limit)
 
 @mcp.tool()
@@ -80,6 +56,8 @@ def analyze_repeated_queries(hours_back: int = 168, limit: int = 50) -> str:
     Returns:
         Analysis of repeated query patterns with potential time and cost savings
     """
+    from tools.performance import analyze_query_patterns
+    
     return analyze_query_patterns(hours_back, limit)
 
 @mcp.tool()
@@ -93,6 +71,8 @@ def query_execution_distribution(days_back: int = 7) -> str:
     Returns:
         Analysis showing percentage of queries in different execution time buckets
     """
+    from tools.performance import analyze_execution_time_distribution
+    
     return analyze_execution_time_distribution(days_back)
 
 # Cost Analysis Tools
@@ -107,6 +87,8 @@ def warehouse_cost_analysis(days_back: int = 7) -> str:
     Returns:
         Detailed cost breakdown by warehouse with optimization suggestions
     """
+    from tools.costs import analyze_warehouse_costs
+    
     return analyze_warehouse_costs(days_back)
 
 @mcp.tool()
@@ -120,6 +102,8 @@ def cost_per_query_analysis(days_back: int = 30) -> str:
     Returns:
         Analysis of cost per query with efficiency comparisons across warehouses
     """
+    from tools.costs import analyze_cost_per_query
+    
     return analyze_cost_per_query(days_back)
 
 @mcp.tool()
@@ -134,6 +118,8 @@ def find_most_expensive_queries(days_back: int = 7, limit: int = 25) -> str:
     Returns:
         List of most expensive queries with cost details and optimization recommendations
     """
+    from tools.costs import find_expensive_queries
+    
     return find_expensive_queries(days_back, limit)
 
 @mcp.tool()
@@ -147,8 +133,29 @@ def user_cost_analysis(days_back: int = 7) -> str:
     Returns:
         Analysis of user activity patterns and associated costs
     """
+    from tools.costs import analyze_user_costs
+    
     return analyze_user_costs(days_back)
 
+@mcp.tool()
+def cost_overview(days_back: int = 7, limit: int = 25) -> str:
+    """
+    Run warehouse, per-query, expensive query and user cost analyses in one pass.
+    
+    The underlying queries run concurrently, so this is faster than calling the
+    four cost tools one after another.
+    
+    Args:
+        days_back: Number of days to look back (default: 7)
+        limit: Maximum number of expensive queries to list (default: 25)
+        
+    Returns:
+        Combined cost analysis with a section per analysis
+    """
+    from tools.costs import analyze_cost_overview
+    
+    return analyze_cost_overview(days_back, limit)
+
 # Monitoring and Optimization Tools
 @mcp.tool()
 def warehouse_utilization_analysis(days_back: int = 7) -> str:
@@ -161,6 +168,8 @@ def warehouse_utilization_analysis(days_back: int = 7) -> str:
     Returns:
         Analysis of warehouse efficiency with sizing and configuration recommendations
     """
+    from tools.monitoring import analyze_warehouse_utilization
+    
     return analyze_warehouse_utilization(days_back)
 
 @mcp.tool()
@@ -175,6 +184,8 @@ def query_acceleration_candidates(days_back: int = 7, limit: int = 50) -> str:
     Returns:
         List of queries eligible for acceleration with potential performance benefits
     """
+    from tools.monitoring import find_query_acceleration_opportunities
+    
     return find_query_acceleration_opportunities(days_back, limit)
 
 @mcp.tool()
@@ -188,8 +199,47 @@ def optimization_report(days_back: int = 7) -> str:
     Returns:
         Executive summary report combining cost, performance, and utilization analysis
     """
+    from tools.monitoring import generate_optimization_report
+    
     return generate_optimization_report(days_back)
 
+@mcp.tool()
+def setup_rollup_tables() -> str:
+    """
+    Create pre-aggregated hourly rollups of QUERY_HISTORY, WAREHOUSE_METERING_HISTORY and LOGIN_HISTORY.
+    
+    Requires SNOWFLAKE_ROLLUP_SCHEMA to name a schema the current role can write to.
+    Once created, a Snowflake task refreshes the rollups every 15 minutes and the
+    aggregate analysis tools read from them instead of re-scanning ACCOUNT_USAGE.
+    
+    Returns:
+        Setup status message
+    """
+    from tools.monitoring import create_rollup_tables
+    
+    return create_rollup_tables()
+
+@mcp.tool()
+def refresh_cached_results() -> str:
+    """
+    Drop cached analysis and query results so the next tool calls re-query Snowflake.
+    
+    Results are normally reused for a while because ACCOUNT_USAGE lags by up to
+    a few hours; use this after changes you expect to see immediately. The memoized
+    credit price is dropped too, but it is only ever read from SNOWFLAKE_CREDIT_PRICE
+    in the server's environment, so changing the price still needs a restart.
+    
+    Returns:
+        Confirmation message
+    """
+    from utils.cache import clear_all_caches
+    from utils.snowflake_connection import snowflake_conn
+    
+    clear_all_caches()
+    snowflake_conn.clear_result_cache()
+    snowflake_conn.clear_credit_price_cache()
+    return "Cached analysis and query results cleared."
+
 # Account Management Tools
 @mcp.tool()
 def select_snowflake_account(account_identifier: str, user: str = None, warehouse: str = None, role: str = None) -> str:
@@ -242,7 +292,7 @@ def get_current_account() -> str:
 
 # Generic Query Tools
 @mcp.tool()
-def execute_query(query: str, limit: int = 1000, interpret: bool = True) -> str:
+def execute_query(query: str, limit: int = 1000, interpret: bool = True, output_format: str = 'csv') -> str:
     """
     Execute any SELECT query against SNOWFLAKE.ACCOUNT_USAGE schema.
     
@@ -253,11 +303,14 @@ def execute_query(query: str, limit: int = 1000, interpret: bool = True) -> str:
         query: SQL SELECT query to execute
         limit: Maximum rows to return (default: 1000)
         interpret: Whether to provide AI interpretation (default: True)
+        output_format: 'csv' for compact rows or 'table' for aligned columns (default: 'csv')
     
     Returns:
         Query results with interpretation and suggestions
     """
-    return execute_account_usage_query(query, limit, interpret)
+    from tools.generic import execute_account_usage_query
+    
+    return execute_account_usage_query(query, limit, interpret, output_format)
 
 @mcp.tool()
 def explore_schema(table_pattern: str = None, show_columns: bool = False) -> str:
@@ -273,6 +326,8 @@ def explore_schema(table_pattern: str = None, show_columns: bool = False) -> str
     Returns:
         List of tables with descriptions and optionally columns
     """
+    from tools.generic import explore_account_usage_schema
+    
     return explore_account_usage_schema(table_pattern, show_columns)
 
 @mcp.tool()
@@ -288,6 +343,8 @@ def help_build_query(description: str) -> str:
     Returns:
         Suggested queries with explanations
     """
+    from tools.generic import build_query_from_description
+    
     return build_query_from_description(description)
 
 # Security and Access Tools
@@ -305,6 +362,8 @@ def check_user_authentication(users: List[str] = None, days_back: int = 30) -> s
     Returns:
         Authentication analysis with security recommendations
     """
+    from tools.security import analyze_user_authentication
+    
     return analyze_user_authentication(users, days_back)
 
 @mcp.tool()
@@ -321,6 +380,8 @@ def audit_privileges(days_back: int = 7, role_filter: str = None) -> str:
     Returns:
         Privilege change audit with security analysis
     """
+    from tools.security import audit_privilege_changes
+    
     return audit_privilege_changes(days_back, role_filter)
 
 @mcp.tool()
@@ -337,6 +398,8 @@ def detect_anomalies(days_back: int = 7, sensitivity: str = "medium") -> str:
     Returns:
         Anomaly detection report with risk assessment
     """
+    from tools.security import detect_unusual_access_patterns
+    
     return detect_unusual_access_patterns(days_back, sensitivity)
 
 # Add some helpful prompts
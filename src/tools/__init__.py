@@ -0,0 +1,11 @@
+"""
+Snowflake ACCOUNT_USAGE analysis tools
+"""
+
+import os
+import sys
+
+# The tool modules import utils and queries as top-level packages; register src/ once here
+_SRC_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if _SRC_DIR not in sys.path:
+    sys.path.append(_SRC_DIR)
@@ -3,11 +3,9 @@ Cost optimization tools for Snowflake
 """
 
 import pandas as pd
-import sys
-import os
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from utils.snowflake_connection import snowflake_conn
+from utils.cache import UncachedResult, ttl_cache
 from queries.optimization_queries import (
     get_warehouse_credit_usage,
     get_cost_per_query,
@@ -15,6 +13,233 @@ from queries.optimization_queries import (
     get_user_activity_summary
 )
 
+def _format_warehouse_costs(df: pd.DataFrame, days_back: int, credit_price: float) -> str:
+    """Render the warehouse cost analysis from get_warehouse_credit_usage results"""
+    if df.empty:
+        return f"No warehouse usage data found in the last {days_back} days."
+    
+    parts = [f"## Warehouse Cost Analysis (Last {days_back} Days)\n"]
+    parts.append(f"*Credit Price: ${credit_price:.2f}*\n\n")
+    
+    total_cost = df['ESTIMATED_COST'].sum()
+    total_credits = df['CREDITS_USED_COMPUTE_SUM'].sum()
+    
+    parts.append(f"**Total Cost: ${total_cost:.2f}**\n")
+    parts.append(f"**Total Credits: {total_credits:.2f}**\n\n")
+    
+    parts.append("### Warehouse Breakdown:\n\n")
+    
+    # Build every warehouse block column-wise instead of row by row
+    if total_cost > 0:
+        cost_percentage = df['ESTIMATED_COST'] / total_cost * 100
+    else:
+        cost_percentage = pd.Series(0.0, index=df.index)
+    
+    blocks = (
+        "**" + df['WAREHOUSE_NAME'].astype(str) + ":**\n"
+        + "- Cost: $" + df['ESTIMATED_COST'].map('{:.2f}'.format)
+        + " (" + cost_percentage.map('{:.1f}'.format) + "% of total)\n"
+        + "- Credits Used: " + df['CREDITS_USED_COMPUTE_SUM'].map('{:.2f}'.format) + "\n"
+        + "- Active Hours: " + df['ACTIVE_HOURS'].astype(str) + "\n"
+        + "- Avg Credits/Hour: " + df['AVG_CREDITS_PER_HOUR'].map('{:.2f}'.format) + "\n\n"
+    )
+    parts.extend(blocks.tolist())
+    
+    # Recommendations
+    parts.append("## Cost Optimization Recommendations:\n\n")
+    
+    # Pull the columns out once and derive every recommendation from the arrays
+    names = df['WAREHOUSE_NAME'].to_numpy()
+    costs = df['ESTIMATED_COST'].to_numpy(dtype=float)
+    avg_credits = df['AVG_CREDITS_PER_HOUR'].to_numpy(dtype=float)
+    
+    # Find most expensive warehouse without relying on the query's ORDER BY
+    top = costs.argmax()
+    parts.append(f"- **{names[top]}** is your most expensive warehouse (${costs[top]:.2f})\n")
+    
+    # Check for idle warehouses
+    low_utilization = names[avg_credits < 0.1].tolist()
+    if low_utilization:
+        parts.append(f"- Consider auto-suspend settings for low-utilization warehouses: {', '.join(low_utilization)}\n")
+    
+    # High credit consumption per hour
+    high_usage = names[avg_credits > 2.0].tolist()
+    if high_usage:
+        parts.append(f"- Review sizing for high credit/hour warehouses: {', '.join(high_usage)}\n")
+    
+    parts.append(f"- Projected monthly cost at current rate: ${(total_cost / days_back * 30):.2f}\n")
+    
+    return "".join(parts)
+
+def _format_cost_per_query(df: pd.DataFrame, days_back: int, credit_price: float) -> str:
+    """Render the cost per query analysis from get_cost_per_query results"""
+    if df.empty:
+        return f"No cost per query data found in the last {days_back} days."
+    
+    parts = [f"## Cost Per Query Analysis (Last {days_back} Days)\n\n"]
+    
+    # Calculate overall metrics
+    total_queries = df['QUERY_COUNT'].sum()
+    total_cost = df['TOTAL_COST'].sum()
+    overall_cost_per_query = total_cost / total_queries if total_queries > 0 else 0
+    
+    parts.append(f"**Overall Metrics:**\n")
+    parts.append(f"- Total Queries: {total_queries:,.0f}\n")
+    parts.append(f"- Total Cost: ${total_cost:.2f}\n")
+    parts.append(f"- Average Cost per Query: ${overall_cost_per_query:.4f}\n\n")
+    
+    parts.append("### By Warehouse:\n\n")
+    parts.append("| Warehouse | Queries | Total Cost | Cost/Query |\n")
+    parts.append("|-----------|---------|------------|------------|\n")
+    
+    for row in df.to_dict('records'):
+        warehouse = row['WAREHOUSE_NAME'] if pd.notna(row['WAREHOUSE_NAME']) else 'Unknown'
+        # A warehouse with no queries or no metering has NULL (NaN) for that side
+        queries = row['QUERY_COUNT'] if pd.notna(row['QUERY_COUNT']) else 0
+        cost = row['TOTAL_COST'] if pd.notna(row['TOTAL_COST']) else 0
+        cost_per_query = row['COST_PER_QUERY'] if pd.notna(row['COST_PER_QUERY']) else 0
+    
+        parts.append(f"| {warehouse} | {queries:,.0f} | ${cost:.2f} | ${cost_per_query:.4f} |\n")
+    
+    # Analysis and recommendations
+    parts.append("\n## Analysis:\n\n")
+    
+    # Find most/least efficient warehouses
+    efficient_df = df[df['COST_PER_QUERY'].notna() & (df['COST_PER_QUERY'] > 0)]
+    
+    if not efficient_df.empty:
+        most_efficient = efficient_df.loc[efficient_df['COST_PER_QUERY'].idxmin()]
+        least_efficient = efficient_df.loc[efficient_df['COST_PER_QUERY'].idxmax()]
+    
+        parts.append(f"- **Most efficient:** {most_efficient['WAREHOUSE_NAME']} (${most_efficient['COST_PER_QUERY']:.4f}/query)\n")
+        parts.append(f"- **Least efficient:** {least_efficient['WAREHOUSE_NAME']} (${least_efficient['COST_PER_QUERY']:.4f}/query)\n")
+    
+        efficiency_ratio = least_efficient['COST_PER_QUERY'] / most_efficient['COST_PER_QUERY']
+        parts.append(f"- **Efficiency gap:** {efficiency_ratio:.1f}x difference\n\n")
+    
+    parts.append("## Recommendations:\n\n")
+    parts.append("- Focus optimization efforts on warehouses with highest cost/query\n")
+    parts.append("- Consider workload consolidation for low-volume, high-cost warehouses\n")
+    parts.append("- Review warehouse sizing for cost-inefficient warehouses\n")
+    parts.append("- Implement query result caching to reduce redundant execution costs\n")
+    
+    return "".join(parts)
+
+def _format_expensive_queries(df: pd.DataFrame, days_back: int, limit: int, credit_price: float) -> str:
+    """Render the expensive query list from get_expensive_queries results"""
+    if df.empty:
+        return f"No expensive queries found in the last {days_back} days."
+    
+    parts = [f"## Most Expensive Queries (Last {days_back} Days)\n\n"]
+    
+    total_credits = df['CREDITS_USED_CLOUD_SERVICES'].sum()
+    total_cost = total_credits * credit_price
+    
+    parts.append(f"**Top {limit} queries consumed {total_credits:.4f} credits (${total_cost:.2f})**\n\n")
+    
+    # Build every query block column-wise instead of row by row
+    top = df.head(10)
+    credits = top['CREDITS_USED_CLOUD_SERVICES']
+    query_text = top['QUERY_TEXT'].fillna('')
+    truncated_text = query_text.str.slice(0, 200)
+    truncated_text = truncated_text.where(query_text.str.len() <= 200, truncated_text + "...")
+    
+    blocks = (
+        "**Query " + pd.Series(top.index + 1, index=top.index).astype(str) + ":**\n"
+        + "- Cost: $" + (credits * credit_price).map('{:.4f}'.format)
+        + " (" + credits.map('{:.4f}'.format) + " credits)\n"
+        + "- Execution Time: " + top['EXECUTION_SECONDS'].map('{:.2f}'.format) + " seconds\n"
+        + "- Warehouse: " + top['WAREHOUSE_NAME'].astype(str) + "\n"
+        + "- User: " + top['USER_NAME'].astype(str) + "\n"
+        + "- Bytes Scanned: " + top['BYTES_SCANNED'].fillna(0).map('{:,.0f}'.format) + "\n"
+        + "- Rows Produced: " + top['ROWS_PRODUCED'].fillna(0).map('{:,.0f}'.format) + "\n"
+        + "- Query: `" + truncated_text + "`\n\n"
+    )
+    parts.extend(blocks.tolist())
+    
+    # Recommendations
+    parts.append("## Optimization Recommendations:\n\n")
+    
+    avg_credits = df['CREDITS_USED_CLOUD_SERVICES'].mean()
+    high_credit_queries = int((df['CREDITS_USED_CLOUD_SERVICES'] > avg_credits * 2).sum())
+    
+    if high_credit_queries:
+        parts.append(f"- {high_credit_queries} queries use >2x average credits - prioritize these for optimization\n")
+    
+    # Check for large scans
+    large_scans = int((df['BYTES_SCANNED'] > 1000000000).sum())  # 1GB
+    if large_scans:
+        parts.append(f"- {large_scans} queries scan >1GB - consider clustering/partitioning\n")
+    
+    # Check for long-running expensive queries
+    long_expensive = int(((df['EXECUTION_SECONDS'] > 60) & (df['CREDITS_USED_CLOUD_SERVICES'] > avg_credits)).sum())
+    if long_expensive:
+        parts.append(f"- {long_expensive} queries are both slow (>1min) and expensive - high optimization priority\n")
+    
+    parts.append("- Consider query result caching for frequently executed expensive queries\n")
+    parts.append("- Review warehouse sizing for consistently expensive operations\n")
+    
+    return "".join(parts)
+
+def _format_user_costs(df: pd.DataFrame, days_back: int, credit_price: float) -> str:
+    """Render the user cost analysis from get_user_activity_summary results"""
+    if df.empty:
+        return f"No user activity data found in the last {days_back} days."
+    
+    parts = [f"## User Cost Analysis (Last {days_back} Days)\n\n"]
+    
+    # Totals cover every user, not just the top users returned
+    total_users = df['ACCOUNT_TOTAL_USERS'].iloc[0]
+    total_credits = df['ACCOUNT_TOTAL_CREDITS'].iloc[0]
+    total_cost = total_credits * credit_price
+    total_queries = df['ACCOUNT_TOTAL_QUERIES'].iloc[0]
+    
+    parts.append(f"**Summary:**\n")
+    parts.append(f"- Total Users: {total_users}\n")
+    parts.append(f"- Total Queries: {total_queries:,}\n")
+    parts.append(f"- Total Estimated Cost: ${total_cost:.2f}\n\n")
+    
+    parts.append("### Top Users by Cost:\n\n")
+    parts.append("| User | Queries | Total Cost | Avg Time/Query | Warehouses |\n")
+    parts.append("|------|---------|------------|----------------|------------|\n")
+    
+    top_users = df.head(10)
+    rows = (
+        "| " + top_users['USER_NAME'].astype(str)
+        + " | " + top_users['TOTAL_QUERIES'].map('{:,}'.format)
+        + " | $" + (top_users['TOTAL_CREDITS_USED'] * credit_price).map('{:.2f}'.format)
+        + " | " + top_users['AVG_EXECUTION_SECONDS'].map('{:.1f}'.format)
+        + "s | " + top_users['WAREHOUSES_USED'].astype(str) + " |\n"
+    )
+    parts.extend(rows.tolist())
+    
+    # Analysis
+    parts.append("\n## Analysis:\n\n")
+    
+    # Find power users; thresholds and sums are account-wide, computed in SQL
+    power_users = df['ACCOUNT_POWER_USERS'].iloc[0]
+    power_user_queries = df['ACCOUNT_POWER_USER_QUERIES'].iloc[0]
+    parts.append(f"- **Power users (top 20%):** {power_users} users account for {power_user_queries:,} queries\n")
+    
+    # Find high-cost users
+    # Cost is credits times a flat price, so rank and share are computed on credits
+    cost_concentration = df['ACCOUNT_HIGH_COST_CREDITS'].iloc[0] / total_credits * 100
+    parts.append(f"- **High-cost users (top 20%):** Account for {cost_concentration:.1f}% of total cost\n")
+    
+    # Multi-warehouse users
+    multi_warehouse = int((df['WAREHOUSES_USED'] > 3).sum())
+    if multi_warehouse:
+        parts.append(f"- **Multi-warehouse users:** {multi_warehouse} users access 4+ warehouses\n")
+    
+    parts.append("\n## Recommendations:\n\n")
+    parts.append("- Engage with high-cost users on query optimization best practices\n")
+    parts.append("- Provide training for users with long average query times\n")
+    parts.append("- Consider workload management policies for power users\n")
+    parts.append("- Review access patterns for multi-warehouse users\n")
+    
+    return "".join(parts)
+
+@ttl_cache()
 def analyze_warehouse_costs(days_back: int = 7) -> str:
     """
     Analyze credit consumption and costs by warehouse.
@@ -27,62 +252,14 @@ def analyze_warehouse_costs(days_back: int = 7) -> str:
     """
     try:
         credit_price = snowflake_conn.get_credit_price()
-        query = get_warehouse_credit_usage(days_back).format(credit_price=credit_price)
-        df = snowflake_conn.execute_query(query)
-        
-        if df.empty:
-            return f"No warehouse usage data found in the last {days_back} days."
-        
-        result = f"## Warehouse Cost Analysis (Last {days_back} Days)\n"
-        result += f"*Credit Price: ${credit_price:.2f}*\n\n"
-        
-        total_cost = df['ESTIMATED_COST'].sum()
-        total_credits = df['CREDITS_USED_COMPUTE_SUM'].sum()
-        
-        result += f"**Total Cost: ${total_cost:.2f}**\n"
-        result += f"**Total Credits: {total_credits:.2f}**\n\n"
-        
-        result += "### Warehouse Breakdown:\n\n"
-        
-        for idx, row in df.iterrows():
-            warehouse = row['WAREHOUSE_NAME']
-            credits = row['CREDITS_USED_COMPUTE_SUM']
-            cost = row['ESTIMATED_COST']
-            avg_credits = row['AVG_CREDITS_PER_HOUR']
-            active_hours = row['ACTIVE_HOURS']
-            
-            cost_percentage = (cost / total_cost * 100) if total_cost > 0 else 0
-            
-            result += f"**{warehouse}:**\n"
-            result += f"- Cost: ${cost:.2f} ({cost_percentage:.1f}% of total)\n"
-            result += f"- Credits Used: {credits:.2f}\n"
-            result += f"- Active Hours: {active_hours}\n"
-            result += f"- Avg Credits/Hour: {avg_credits:.2f}\n\n"
-        
-        # Recommendations
-        result += "## Cost Optimization Recommendations:\n\n"
-        
-        # Find most expensive warehouse
-        most_expensive = df.iloc[0]
-        result += f"- **{most_expensive['WAREHOUSE_NAME']}** is your most expensive warehouse (${most_expensive['ESTIMATED_COST']:.2f})\n"
-        
-        # Check for idle warehouses
-        low_utilization = df[df['AVG_CREDITS_PER_HOUR'] < 0.1]
-        if not low_utilization.empty:
-            result += f"- Consider auto-suspend settings for low-utilization warehouses: {', '.join(low_utilization['WAREHOUSE_NAME'].tolist())}\n"
-        
-        # High credit consumption per hour
-        high_usage = df[df['AVG_CREDITS_PER_HOUR'] > 2.0]
-        if not high_usage.empty:
-            result += f"- Review sizing for high credit/hour warehouses: {', '.join(high_usage['WAREHOUSE_NAME'].tolist())}\n"
-        
-        result += f"- Projected monthly cost at current rate: ${(total_cost / days_back * 30):.2f}\n"
-        
-        return result
+        query, params = get_warehouse_credit_usage(days_back, credit_price)
+        df = snowflake_conn.execute_query(query, params)
+        return _format_warehouse_costs(df, days_back, credit_price)
         
     except Exception as e:
         return f"Error analyzing warehouse costs: {str(e)}"
 
+@ttl_cache()
 def analyze_cost_per_query(days_back: int = 30) -> str:
     """
     Calculate and analyze cost per query by warehouse.
@@ -95,63 +272,14 @@ def analyze_cost_per_query(days_back: int = 30) -> str:
     """
     try:
         credit_price = snowflake_conn.get_credit_price()
-        query = get_cost_per_query(days_back).format(credit_price=credit_price)
-        df = snowflake_conn.execute_query(query)
-        
-        if df.empty:
-            return f"No cost per query data found in the last {days_back} days."
-        
-        result = f"## Cost Per Query Analysis (Last {days_back} Days)\n\n"
-        
-        # Calculate overall metrics
-        total_queries = df['QUERY_COUNT'].sum()
-        total_cost = df['TOTAL_COST'].sum()
-        overall_cost_per_query = total_cost / total_queries if total_queries > 0 else 0
-        
-        result += f"**Overall Metrics:**\n"
-        result += f"- Total Queries: {total_queries:,}\n"
-        result += f"- Total Cost: ${total_cost:.2f}\n"
-        result += f"- Average Cost per Query: ${overall_cost_per_query:.4f}\n\n"
-        
-        result += "### By Warehouse:\n\n"
-        result += "| Warehouse | Queries | Total Cost | Cost/Query |\n"
-        result += "|-----------|---------|------------|------------|\n"
-        
-        for _, row in df.iterrows():
-            warehouse = row['WAREHOUSE_NAME'] if row['WAREHOUSE_NAME'] else 'Unknown'
-            queries = row['QUERY_COUNT'] if row['QUERY_COUNT'] else 0
-            cost = row['TOTAL_COST'] if row['TOTAL_COST'] else 0
-            cost_per_query = row['COST_PER_QUERY'] if row['COST_PER_QUERY'] else 0
-            
-            result += f"| {warehouse} | {queries:,} | ${cost:.2f} | ${cost_per_query:.4f} |\n"
-        
-        # Analysis and recommendations
-        result += "\n## Analysis:\n\n"
-        
-        # Find most/least efficient warehouses
-        efficient_df = df[df['COST_PER_QUERY'].notna() & (df['COST_PER_QUERY'] > 0)].sort_values('COST_PER_QUERY')
-        
-        if not efficient_df.empty:
-            most_efficient = efficient_df.iloc[0]
-            least_efficient = efficient_df.iloc[-1]
-            
-            result += f"- **Most efficient:** {most_efficient['WAREHOUSE_NAME']} (${most_efficient['COST_PER_QUERY']:.4f}/query)\n"
-            result += f"- **Least efficient:** {least_efficient['WAREHOUSE_NAME']} (${least_efficient['COST_PER_QUERY']:.4f}/query)\n"
-            
-            efficiency_ratio = least_efficient['COST_PER_QUERY'] / most_efficient['COST_PER_QUERY']
-            result += f"- **Efficiency gap:** {efficiency_ratio:.1f}x difference\n\n"
-        
-        result += "## Recommendations:\n\n"
-        result += "- Focus optimization efforts on warehouses with highest cost/query\n"
-        result += "- Consider workload consolidation for low-volume, high-cost warehouses\n"
-        result += "- Review warehouse sizing for cost-inefficient warehouses\n"
-        result += "- Implement query result caching to reduce redundant execution costs\n"
-        
-        return result
+        query, params = get_cost_per_query(days_back, credit_price)
+        df = snowflake_conn.execute_query(query, params)
+        return _format_cost_per_query(df, days_back, credit_price)
         
     except Exception as e:
         return f"Error analyzing cost per query: {str(e)}"
 
+@ttl_cache()
 def find_expensive_queries(days_back: int = 7, limit: int = 25) -> str:
     """
     Identify the most credit-consuming queries.
@@ -164,67 +292,15 @@ def find_expensive_queries(days_back: int = 7, limit: int = 25) -> str:
         List of most expensive queries with cost details
     """
     try:
-        query = get_expensive_queries(days_back, limit)
-        df = snowflake_conn.execute_query(query)
-        
-        if df.empty:
-            return f"No expensive queries found in the last {days_back} days."
-        
         credit_price = snowflake_conn.get_credit_price()
-        
-        result = f"## Most Expensive Queries (Last {days_back} Days)\n\n"
-        
-        total_credits = df['CREDITS_USED_CLOUD_SERVICES'].sum()
-        total_cost = total_credits * credit_price
-        
-        result += f"**Top {limit} queries consumed {total_credits:.4f} credits (${total_cost:.2f})**\n\n"
-        
-        for idx, row in df.head(10).iterrows():
-            credits = row['CREDITS_USED_CLOUD_SERVICES']
-            cost = credits * credit_price
-            execution_time = row['EXECUTION_SECONDS']
-            
-            result += f"**Query {idx + 1}:**\n"
-            result += f"- Cost: ${cost:.4f} ({credits:.4f} credits)\n"
-            result += f"- Execution Time: {execution_time:.2f} seconds\n"
-            result += f"- Warehouse: {row['WAREHOUSE_NAME']}\n"
-            result += f"- User: {row['USER_NAME']}\n"
-            result += f"- Bytes Scanned: {row['BYTES_SCANNED']:,}\n"
-            result += f"- Rows Produced: {row['ROWS_PRODUCED']:,}\n"
-            
-            # Show truncated query
-            query_text = str(row['QUERY_TEXT'])[:200]
-            if len(str(row['QUERY_TEXT'])) > 200:
-                query_text += "..."
-            result += f"- Query: `{query_text}`\n\n"
-        
-        # Recommendations
-        result += "## Optimization Recommendations:\n\n"
-        
-        avg_credits = df['CREDITS_USED_CLOUD_SERVICES'].mean()
-        high_credit_queries = df[df['CREDITS_USED_CLOUD_SERVICES'] > avg_credits * 2]
-        
-        if not high_credit_queries.empty:
-            result += f"- {len(high_credit_queries)} queries use >2x average credits - prioritize these for optimization\n"
-        
-        # Check for large scans
-        large_scans = df[df['BYTES_SCANNED'] > 1000000000]  # 1GB
-        if not large_scans.empty:
-            result += f"- {len(large_scans)} queries scan >1GB - consider clustering/partitioning\n"
-        
-        # Check for long-running expensive queries
-        long_expensive = df[(df['EXECUTION_SECONDS'] > 60) & (df['CREDITS_USED_CLOUD_SERVICES'] > avg_credits)]
-        if not long_expensive.empty:
-            result += f"- {len(long_expensive)} queries are both slow (>1min) and expensive - high optimization priority\n"
-        
-        result += "- Consider query result caching for frequently executed expensive queries\n"
-        result += "- Review warehouse sizing for consistently expensive operations\n"
-        
-        return result
+        query, params = get_expensive_queries(days_back, limit)
+        df = snowflake_conn.execute_query(query, params)
+        return _format_expensive_queries(df, days_back, limit, credit_price)
         
     except Exception as e:
         return f"Error finding expensive queries: {str(e)}"
 
+@ttl_cache()
 def analyze_user_costs(days_back: int = 7) -> str:
     """
     Analyze resource consumption and costs by user.
@@ -236,64 +312,62 @@ def analyze_user_costs(days_back: int = 7) -> str:
         Analysis of user activity and associated costs
     """
     try:
-        query = get_user_activity_summary(days_back)
-        df = snowflake_conn.execute_query(query)
-        
-        if df.empty:
-            return f"No user activity data found in the last {days_back} days."
-        
         credit_price = snowflake_conn.get_credit_price()
+        query, params = get_user_activity_summary(days_back)
+        df = snowflake_conn.execute_query(query, params)
+        return _format_user_costs(df, days_back, credit_price)
         
-        result = f"## User Cost Analysis (Last {days_back} Days)\n\n"
-        
-        # Calculate costs
-        df['ESTIMATED_COST'] = df['TOTAL_CREDITS_USED'] * credit_price
-        
-        total_cost = df['ESTIMATED_COST'].sum()
-        total_queries = df['TOTAL_QUERIES'].sum()
-        
-        result += f"**Summary:**\n"
-        result += f"- Total Users: {len(df)}\n"
-        result += f"- Total Queries: {total_queries:,}\n"
-        result += f"- Total Estimated Cost: ${total_cost:.2f}\n\n"
-        
-        result += "### Top Users by Cost:\n\n"
-        result += "| User | Queries | Total Cost | Avg Time/Query | Warehouses |\n"
-        result += "|------|---------|------------|----------------|------------|\n"
-        
-        for _, row in df.head(10).iterrows():
-            user = row['USER_NAME']
-            queries = row['TOTAL_QUERIES']
-            cost = row['ESTIMATED_COST']
-            avg_time = row['AVG_EXECUTION_SECONDS']
-            warehouses = row['WAREHOUSES_USED']
-            
-            result += f"| {user} | {queries:,} | ${cost:.2f} | {avg_time:.1f}s | {warehouses} |\n"
-        
-        # Analysis
-        result += "\n## Analysis:\n\n"
-        
-        # Find power users
-        power_users = df[df['TOTAL_QUERIES'] > df['TOTAL_QUERIES'].quantile(0.8)]
-        result += f"- **Power users (top 20%):** {len(power_users)} users account for {power_users['TOTAL_QUERIES'].sum():,} queries\n"
-        
-        # Find high-cost users
-        high_cost_users = df[df['ESTIMATED_COST'] > df['ESTIMATED_COST'].quantile(0.8)]
-        cost_concentration = high_cost_users['ESTIMATED_COST'].sum() / total_cost * 100
-        result += f"- **High-cost users (top 20%):** Account for {cost_concentration:.1f}% of total cost\n"
-        
-        # Multi-warehouse users
-        multi_warehouse = df[df['WAREHOUSES_USED'] > 3]
-        if not multi_warehouse.empty:
-            result += f"- **Multi-warehouse users:** {len(multi_warehouse)} users access 4+ warehouses\n"
-        
-        result += "\n## Recommendations:\n\n"
-        result += "- Engage with high-cost users on query optimization best practices\n"
-        result += "- Provide training for users with long average query times\n"
-        result += "- Consider workload management policies for power users\n"
-        result += "- Review access patterns for multi-warehouse users\n"
-        
-        return result
+    except Exception as e:
+        return f"Error analyzing user costs: {str(e)}"
+
+@ttl_cache()
+def analyze_cost_overview(days_back: int = 7, limit: int = 25) -> str:
+    """
+    Run the warehouse, per-query, expensive query and user cost analyses together.
+    
+    The four ACCOUNT_USAGE queries are submitted concurrently and the credit price
+    is looked up once, so the overview takes about as long as the slowest analysis.
+    
+    Args:
+        days_back: Number of days to look back (default: 7)
+        limit: Maximum number of expensive queries to list (default: 25)
+    
+    Returns:
+        Combined cost analysis with one section per analysis
+    """
+    try:
+        credit_price = snowflake_conn.get_credit_price()
+        sections = [
+            (get_warehouse_credit_usage(days_back, credit_price),
+             lambda df: _format_warehouse_costs(df, days_back, credit_price),
+             "Error analyzing warehouse costs"),
+            (get_cost_per_query(days_back, credit_price),
+             lambda df: _format_cost_per_query(df, days_back, credit_price),
+             "Error analyzing cost per query"),
+            (get_expensive_queries(days_back, limit),
+             lambda df: _format_expensive_queries(df, days_back, limit, credit_price),
+             "Error finding expensive queries"),
+            (get_user_activity_summary(days_back),
+             lambda df: _format_user_costs(df, days_back, credit_price),
+             "Error analyzing user costs"),
+        ]
+        results = snowflake_conn.execute_queries_async([query for query, _, _ in sections])
+        
+        parts = []
+        failed = False
+        for (_, render, error_prefix), result in zip(sections, results):
+            # A failed query only blanks its own section
+            try:
+                if isinstance(result, Exception):
+                    raise result
+                parts.append(render(result))
+            except Exception as e:
+                failed = True
+                parts.append(f"{error_prefix}: {str(e)}")
+        
+        overview = "\n\n---\n\n".join(parts)
+        # A partial overview is returned but retried next time rather than cached
+        return UncachedResult(overview) if failed else overview
         
     except Exception as e:
-        return f"Error analyzing user costs: {str(e)}"
\ No newline at end of file
+        return f"Error generating cost overview: {str(e)}"
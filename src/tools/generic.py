@@ -2,28 +2,44 @@
 Generic query tools for flexible Snowflake ACCOUNT_USAGE analysis
 """
 
+import numpy as np
 import pandas as pd
 import re
-import sys
-import os
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+from utils.envs import envs
 from utils.snowflake_connection import snowflake_conn
 from typing import List, Dict, Any
 
+# Compiled once: one pass finds any write keyword, and word boundaries keep
+# column names such as CREATED_ON or DELETED_ON from being rejected
+_DANGEROUS_KEYWORDS_RE = re.compile(r'\b(INSERT|UPDATE|DELETE|DROP|CREATE|ALTER|TRUNCATE|MERGE)\b', re.IGNORECASE)
+_LINE_COMMENT_RE = re.compile(r'--[^\n]*')
+_BLOCK_COMMENT_RE = re.compile(r'/\*.*?\*/', re.DOTALL)
+
+# View name -> query type, in priority order for queries that touch several views
+_QUERY_TYPES = (
+    ('LOGIN_HISTORY', 'authentication'),
+    ('QUERY_HISTORY', 'performance'),
+    ('WAREHOUSE_METERING_HISTORY', 'cost'),
+    ('ACCESS_HISTORY', 'security'),
+    ('GRANTS', 'permissions'),
+    ('ROLES', 'permissions'),
+)
+_QUERY_TYPE_RE = re.compile('|'.join(name for name, _ in _QUERY_TYPES), re.IGNORECASE)
+
+_OUTPUT_FORMATS = ('csv', 'table')
+
 def is_read_only_query(query: str) -> bool:
     """Validate that a query is read-only for safety"""
     # Remove comments and normalize
-    query_upper = re.sub(r'--.*', '', query).upper().strip()
+    stripped = _LINE_COMMENT_RE.sub('', _BLOCK_COMMENT_RE.sub(' ', query)).strip()
     
     # Check for dangerous keywords
-    dangerous_keywords = ['INSERT', 'UPDATE', 'DELETE', 'DROP', 'CREATE', 'ALTER', 'TRUNCATE', 'MERGE']
-    for keyword in dangerous_keywords:
-        if keyword in query_upper:
-            return False
+    if _DANGEROUS_KEYWORDS_RE.search(stripped):
+        return False
     
     # Ensure it starts with SELECT or WITH
-    if not (query_upper.startswith('SELECT') or query_upper.startswith('WITH')):
+    if not stripped.upper().startswith(('SELECT', 'WITH')):
         return False
     
     return True
@@ -37,46 +53,45 @@ def add_limit_if_missing(query: str, limit: int) -> str:
         query += f" LIMIT {limit}"
     return query
 
-def format_dataframe(df: pd.DataFrame, max_rows: int = 20) -> str:
-    """Format DataFrame for CLI display"""
+def format_dataframe(df: pd.DataFrame, max_rows: int = 20, total_rows: int = None, output_format: str = 'csv') -> str:
+    """Format DataFrame for CLI display, optionally given the full result's row count"""
+    if output_format not in _OUTPUT_FORMATS:
+        raise ValueError(f"Unknown output format '{output_format}', expected 'csv' or 'table'")
+    
     if df.empty:
         return "No data returned."
     
     result = ""
+    total_rows = max(total_rows or 0, len(df))
     
     # Show shape
-    result += f"Shape: {df.shape[0]} rows × {df.shape[1]} columns\n\n"
+    result += f"Shape: {total_rows} rows × {df.shape[1]} columns\n\n"
     
     # Convert to string for display
-    if len(df) > max_rows:
-        result += f"Showing first {max_rows} of {len(df)} rows:\n\n"
+    if total_rows > max_rows:
+        result += f"Showing first {max_rows} of {total_rows} rows:\n\n"
         display_df = df.head(max_rows)
     else:
         display_df = df
     
-    # Format as table
-    result += display_df.to_string(index=False, max_cols=10)
+    # CSV skips the column-width padding to_string does; 'table' keeps aligned output
+    if output_format == 'csv':
+        result += display_df.to_csv(index=False).rstrip('\n')
+    else:
+        result += display_df.to_string(index=False, max_cols=10)
     
     return result
 
 def detect_query_type(query: str) -> str:
     """Detect the type of query for better interpretation"""
-    query_upper = query.upper()
-    
-    if 'LOGIN_HISTORY' in query_upper:
-        return 'authentication'
-    elif 'QUERY_HISTORY' in query_upper:
-        return 'performance'
-    elif 'WAREHOUSE_METERING_HISTORY' in query_upper:
-        return 'cost'
-    elif 'ACCESS_HISTORY' in query_upper:
-        return 'security'
-    elif 'GRANTS' in query_upper or 'ROLES' in query_upper:
-        return 'permissions'
-    else:
-        return 'general'
+    # Collect every view name in one scan, then apply the priority order
+    found = {match.upper() for match in _QUERY_TYPE_RE.findall(query)}
+    for name, query_type in _QUERY_TYPES:
+        if name in found:
+            return query_type
+    return 'general'
 
-def execute_account_usage_query(query: str, limit: int = 1000, interpret: bool = True) -> str:
+def execute_account_usage_query(query: str, limit: int = 1000, interpret: bool = True, output_format: str = 'csv') -> str:
     """
     Execute any query against SNOWFLAKE.ACCOUNT_USAGE schema.
     
@@ -84,6 +99,7 @@ def execute_account_usage_query(query: str, limit: int = 1000, interpret: bool =
         query: SQL query to execute
         limit: Maximum rows to return (default: 1000)
         interpret: Whether to provide AI interpretation of results (default: True)
+        output_format: 'csv' for compact rows or 'table' for aligned columns (default: 'csv')
     
     Returns:
         Formatted query results with optional interpretation
@@ -93,51 +109,63 @@ def execute_account_usage_query(query: str, limit: int = 1000, interpret: bool =
         if not is_read_only_query(query):
             return "❌ Error: Only SELECT queries are allowed for safety. Detected non-read operation."
         
+        # Validate the output format before running (and caching) the query
+        if output_format not in _OUTPUT_FORMATS:
+            return f"❌ Error: Unknown output format '{output_format}', expected 'csv' or 'table'."
+        
         # Add limit if missing
         query = add_limit_if_missing(query, limit)
         
         # Get timeout from env
-        timeout = int(os.getenv('QUERY_TIMEOUT_SECONDS', '300'))
+        timeout = envs.QUERY_TIMEOUT_SECONDS or 300
         
-        # Execute query
-        df = snowflake_conn.execute_query(query)
+        # Execute query; interpretation aggregates every returned row, otherwise only
+        # the displayed rows are downloaded
+        display_rows = 50
+        if interpret:
+            df = snowflake_conn.execute_query(query)
+            total_rows = len(df)
+        else:
+            df, total_rows = snowflake_conn.execute_query_preview(query, display_rows)
         
-        result = "## Query Results\n\n"
+        parts = ["## Query Results\n\n"]
         
         if df.empty:
-            result += "No data returned. This could mean:\n"
-            result += "- The filter criteria returned no matches\n"
-            result += "- The table might be empty or have data latency\n"
-            result += "- Check ACCOUNT_USAGE data latency (up to 3 hours for some tables)\n"
-            return result
+            parts.append("No data returned. This could mean:\n")
+            parts.append("- The filter criteria returned no matches\n")
+            parts.append("- The table might be empty or have data latency\n")
+            parts.append("- Check ACCOUNT_USAGE data latency (up to 3 hours for some tables)\n")
+            return "".join(parts)
         
         # Format results
-        result += format_dataframe(df, max_rows=50)
+        parts.append(format_dataframe(df, max_rows=display_rows, total_rows=total_rows, output_format=output_format))
         
         if interpret:
             query_type = detect_query_type(query)
-            result += f"\n\n## Analysis (Query Type: {query_type})\n\n"
+            parts.append(f"\n\n## Analysis (Query Type: {query_type})\n\n")
             
             # Provide basic interpretation based on query type
             if query_type == 'authentication':
-                result += "This query analyzes authentication and login patterns.\n"
+                parts.append("This query analyzes authentication and login patterns.\n")
                 if 'FIRST_AUTHENTICATION_FACTOR' in df.columns:
-                    auth_methods = df['FIRST_AUTHENTICATION_FACTOR'].value_counts()
-                    result += f"Authentication methods found: {', '.join(auth_methods.index.tolist())}\n"
+                    auth_methods = df['FIRST_AUTHENTICATION_FACTOR'].value_counts().index.tolist()
+                    parts.append(f"Authentication methods found: {', '.join(auth_methods)}\n")
             
             elif query_type == 'performance':
-                result += "This query analyzes query performance metrics.\n"
+                parts.append("This query analyzes query performance metrics.\n")
                 if 'EXECUTION_TIME' in df.columns:
-                    avg_time = df['EXECUTION_TIME'].mean() / 1000
-                    result += f"Average execution time: {avg_time:.2f} seconds\n"
+                    times = df['EXECUTION_TIME'].to_numpy(dtype=float)
+                    times = times[~np.isnan(times)]
+                    avg_time = times.mean() / 1000 if times.size else float('nan')
+                    parts.append(f"Average execution time: {avg_time:.2f} seconds\n")
             
             elif query_type == 'cost':
-                result += "This query analyzes compute costs and credit usage.\n"
+                parts.append("This query analyzes compute costs and credit usage.\n")
                 if 'CREDITS_USED' in df.columns:
-                    total_credits = df['CREDITS_USED'].sum()
-                    result += f"Total credits analyzed: {total_credits:.2f}\n"
+                    total_credits = np.nansum(df['CREDITS_USED'].to_numpy(dtype=float))
+                    parts.append(f"Total credits analyzed: {total_credits:.2f}\n")
         
-        return result
+        return "".join(parts)
         
     except Exception as e:
         error_msg = f"❌ Query Error: {str(e)}\n\n"
@@ -171,90 +199,79 @@ def explore_account_usage_schema(table_pattern: str = None, show_columns: bool =
             AND TABLE_CATALOG = 'SNOWFLAKE'
         """
         
+        params = None
         if table_pattern:
-            table_query += f" AND TABLE_NAME LIKE '{table_pattern.upper()}'"
+            table_query += " AND TABLE_NAME LIKE %(table_pattern)s"
+            params = {'table_pattern': table_pattern.upper()}
         
         table_query += " ORDER BY TABLE_NAME"
         
-        df = snowflake_conn.execute_query(table_query)
+        df = snowflake_conn.execute_query(table_query, params)
         
-        result = "## ACCOUNT_USAGE Schema Tables\n\n"
+        parts = ["## ACCOUNT_USAGE Schema Tables\n\n"]
         
-        if df.empty:
-            result += "No tables found matching your criteria.\n"
-            return result
+        table_count = len(df)
+        if table_count == 0:
+            parts.append("No tables found matching your criteria.\n")
+            return "".join(parts)
         
-        result += f"Found {len(df)} tables:\n\n"
+        parts.append(f"Found {table_count} tables:\n\n")
         
-        for _, row in df.iterrows():
+        columns_by_table = {}
+        if show_columns:
+            # Fetch columns for every matching table in one round trip
+            col_query = """
+            SELECT 
+                TABLE_NAME,
+                COLUMN_NAME,
+                DATA_TYPE,
+                IS_NULLABLE,
+                COMMENT
+            FROM SNOWFLAKE.ACCOUNT_USAGE.COLUMNS
+            WHERE TABLE_SCHEMA = 'ACCOUNT_USAGE'
+                AND TABLE_CATALOG = 'SNOWFLAKE'
+                AND TABLE_NAME IN (%(table_names)s)
+            ORDER BY TABLE_NAME, ORDINAL_POSITION
+            """
+            
+            col_df = snowflake_conn.execute_query(col_query, {'table_names': df['TABLE_NAME'].tolist()})
+            columns_by_table = {name: group for name, group in col_df.groupby('TABLE_NAME', sort=False)}
+        
+        for row in df.to_dict('records'):
             table_name = row['TABLE_NAME']
             row_count = row['ROW_COUNT'] if pd.notna(row['ROW_COUNT']) else 'Unknown'
             comment = row['COMMENT'] if pd.notna(row['COMMENT']) else 'No description'
             
-            result += f"### {table_name}\n"
-            result += f"- Rows: {row_count:,}\n" if isinstance(row_count, (int, float)) else f"- Rows: {row_count}\n"
-            result += f"- Description: {comment}\n"
+            parts.append(f"### {table_name}\n")
+            parts.append(f"- Rows: {row_count:,.0f}\n" if isinstance(row_count, (int, float)) else f"- Rows: {row_count}\n")
+            parts.append(f"- Description: {comment}\n")
             
-            if show_columns:
-                # Get columns for this table
-                col_query = f"""
-                SELECT 
-                    COLUMN_NAME,
-                    DATA_TYPE,
-                    IS_NULLABLE,
-                    COMMENT
-                FROM SNOWFLAKE.ACCOUNT_USAGE.COLUMNS
-                WHERE TABLE_SCHEMA = 'ACCOUNT_USAGE'
-                    AND TABLE_CATALOG = 'SNOWFLAKE'
-                    AND TABLE_NAME = '{table_name}'
-                ORDER BY ORDINAL_POSITION
-                """
-                
-                col_df = snowflake_conn.execute_query(col_query)
-                
-                if not col_df.empty:
-                    result += "- Columns:\n"
-                    for _, col in col_df.iterrows():
-                        nullable = "NULL" if col['IS_NULLABLE'] == 'YES' else "NOT NULL"
-                        result += f"  - {col['COLUMN_NAME']} ({col['DATA_TYPE']}) {nullable}\n"
+            table_columns = columns_by_table.get(table_name)
+            if table_columns is not None:
+                parts.append("- Columns:\n")
+                for col in table_columns.to_dict('records'):
+                    nullable = "NULL" if col['IS_NULLABLE'] == 'YES' else "NOT NULL"
+                    parts.append(f"  - {col['COLUMN_NAME']} ({col['DATA_TYPE']}) {nullable}\n")
             
-            result += "\n"
+            parts.append("\n")
         
-        result += "\n## Common Table Categories:\n"
-        result += "- **History Tables**: Query, Login, Access, Warehouse histories\n"
-        result += "- **Metering Tables**: Credit usage and cost tracking\n"
-        result += "- **Security Tables**: Grants, Roles, Users, Authentication\n"
-        result += "- **Storage Tables**: Tables, Databases, Stages storage info\n"
+        parts.append("\n## Common Table Categories:\n")
+        parts.append("- **History Tables**: Query, Login, Access, Warehouse histories\n")
+        parts.append("- **Metering Tables**: Credit usage and cost tracking\n")
+        parts.append("- **Security Tables**: Grants, Roles, Users, Authentication\n")
+        parts.append("- **Storage Tables**: Tables, Databases, Stages storage info\n")
         
-        return result
+        return "".join(parts)
         
     except Exception as e:
         return f"Error exploring schema: {str(e)}"
 
-def build_query_from_description(description: str, include_explanation: bool = True) -> str:
-    """
-    Help build a query from natural language description.
-    
-    Args:
-        description: Natural language description of what you want to query
-        include_explanation: Whether to include explanation of the query
-    
-    Returns:
-        SQL query template and explanation
-    """
-    result = "## Query Builder Assistant\n\n"
-    result += f"Request: {description}\n\n"
-    
-    # Provide common query templates based on keywords
-    description_lower = description.lower()
-    
-    suggested_queries = []
-    
+# (trigger keywords, suggested query) pairs for build_query_from_description
+_QUERY_TEMPLATES = (
     # Authentication/Login patterns
-    if any(word in description_lower for word in ['login', 'authentication', 'rsa', 'password']):
-        suggested_queries.append({
-            'title': 'User Authentication Analysis',
-            'query': """SELECT 
+    (('login', 'authentication', 'rsa', 'password'), {
+        'title': 'User Authentication Analysis',
+        'query': """SELECT 
     USER_NAME,
     FIRST_AUTHENTICATION_FACTOR,
     MAX(EVENT_TIMESTAMP) as LAST_LOGIN,
@@ -264,14 +281,12 @@ WHERE EVENT_TIMESTAMP >= DATEADD(day, -30, CURRENT_TIMESTAMP())
     AND IS_SUCCESS = 'YES'
 GROUP BY USER_NAME, FIRST_AUTHENTICATION_FACTOR
 ORDER BY USER_NAME, LAST_LOGIN DESC""",
-            'explanation': 'Shows authentication methods used by each user with last login time'
-        })
-    
+        'explanation': 'Shows authentication methods used by each user with last login time'
+    }),
     # Cost/Credit patterns
-    if any(word in description_lower for word in ['cost', 'credit', 'expensive', 'warehouse']):
-        suggested_queries.append({
-            'title': 'Warehouse Credit Usage',
-            'query': """SELECT 
+    (('cost', 'credit', 'expensive', 'warehouse'), {
+        'title': 'Warehouse Credit Usage',
+        'query': """SELECT 
     WAREHOUSE_NAME,
     SUM(CREDITS_USED) as TOTAL_CREDITS,
     AVG(CREDITS_USED) as AVG_CREDITS_PER_HOUR,
@@ -280,14 +295,12 @@ FROM SNOWFLAKE.ACCOUNT_USAGE.WAREHOUSE_METERING_HISTORY
 WHERE START_TIME >= DATEADD(day, -7, CURRENT_TIMESTAMP())
 GROUP BY WAREHOUSE_NAME
 ORDER BY TOTAL_CREDITS DESC""",
-            'explanation': 'Shows credit consumption by warehouse over the last 7 days'
-        })
-    
+        'explanation': 'Shows credit consumption by warehouse over the last 7 days'
+    }),
     # Query performance patterns
-    if any(word in description_lower for word in ['slow', 'query', 'performance', 'execution']):
-        suggested_queries.append({
-            'title': 'Slow Query Analysis',
-            'query': """SELECT 
+    (('slow', 'query', 'performance', 'execution'), {
+        'title': 'Slow Query Analysis',
+        'query': """SELECT 
     QUERY_ID,
     QUERY_TEXT,
     USER_NAME,
@@ -301,14 +314,12 @@ WHERE START_TIME >= DATEADD(hour, -24, CURRENT_TIMESTAMP())
     AND EXECUTION_TIME > 60000  -- Over 1 minute
 ORDER BY EXECUTION_TIME DESC
 LIMIT 50""",
-            'explanation': 'Finds queries that took over 1 minute to execute in the last 24 hours'
-        })
-    
+        'explanation': 'Finds queries that took over 1 minute to execute in the last 24 hours'
+    }),
     # Access/Security patterns
-    if any(word in description_lower for word in ['access', 'security', 'permission', 'grant', 'role']):
-        suggested_queries.append({
-            'title': 'User Role Grants',
-            'query': """SELECT 
+    (('access', 'security', 'permission', 'grant', 'role'), {
+        'title': 'User Role Grants',
+        'query': """SELECT 
     GRANTEE_NAME as USER_NAME,
     ROLE,
     GRANTED_ON,
@@ -317,38 +328,64 @@ LIMIT 50""",
 FROM SNOWFLAKE.ACCOUNT_USAGE.GRANTS_TO_USERS
 WHERE DELETED_ON IS NULL
 ORDER BY USER_NAME, ROLE""",
-            'explanation': 'Shows current role assignments for all users'
-        })
+        'explanation': 'Shows current role assignments for all users'
+    }),
+)
+# Lookahead so overlapping keywords are all reported from a single scan
+_TEMPLATE_KEYWORD_RE = re.compile(
+    '(?=(' + '|'.join(word for words, _ in _QUERY_TEMPLATES for word in words) + '))'
+)
+_TEMPLATE_BY_KEYWORD = {word: i for i, (words, _) in enumerate(_QUERY_TEMPLATES) for word in words}
+
+def build_query_from_description(description: str, include_explanation: bool = True) -> str:
+    """
+    Help build a query from natural language description.
+    
+    Args:
+        description: Natural language description of what you want to query
+        include_explanation: Whether to include explanation of the query
+    
+    Returns:
+        SQL query template and explanation
+    """
+    parts = ["## Query Builder Assistant\n\n"]
+    parts.append(f"Request: {description}\n\n")
+    
+    # Provide common query templates based on keywords
+    description_lower = description.lower()
+    
+    matched = {_TEMPLATE_BY_KEYWORD[word] for word in _TEMPLATE_KEYWORD_RE.findall(description_lower)}
+    suggested_queries = [template for i, (_, template) in enumerate(_QUERY_TEMPLATES) if i in matched]
     
     if suggested_queries:
-        result += "### Suggested Queries:\n\n"
+        parts.append("### Suggested Queries:\n\n")
         for i, sq in enumerate(suggested_queries, 1):
-            result += f"**{i}. {sq['title']}**\n\n"
-            result += "```sql\n"
-            result += sq['query']
-            result += "\n```\n\n"
+            parts.append(f"**{i}. {sq['title']}**\n\n")
+            parts.append("```sql\n")
+            parts.append(sq['query'])
+            parts.append("\n```\n\n")
             if include_explanation:
-                result += f"*{sq['explanation']}*\n\n"
+                parts.append(f"*{sq['explanation']}*\n\n")
     else:
-        result += "### Generic Query Template:\n\n"
-        result += "```sql\n"
-        result += "SELECT \n"
-        result += "    column1,\n"
-        result += "    column2,\n"
-        result += "    COUNT(*) as count,\n"
-        result += "    SUM(metric) as total\n"
-        result += "FROM SNOWFLAKE.ACCOUNT_USAGE.TABLE_NAME\n"
-        result += "WHERE condition = 'value'\n"
-        result += "    AND timestamp_column >= DATEADD(day, -7, CURRENT_TIMESTAMP())\n"
-        result += "GROUP BY column1, column2\n"
-        result += "ORDER BY total DESC\n"
-        result += "LIMIT 100\n"
-        result += "```\n\n"
+        parts.append("### Generic Query Template:\n\n")
+        parts.append("```sql\n")
+        parts.append("SELECT \n")
+        parts.append("    column1,\n")
+        parts.append("    column2,\n")
+        parts.append("    COUNT(*) as count,\n")
+        parts.append("    SUM(metric) as total\n")
+        parts.append("FROM SNOWFLAKE.ACCOUNT_USAGE.TABLE_NAME\n")
+        parts.append("WHERE condition = 'value'\n")
+        parts.append("    AND timestamp_column >= DATEADD(day, -7, CURRENT_TIMESTAMP())\n")
+        parts.append("GROUP BY column1, column2\n")
+        parts.append("ORDER BY total DESC\n")
+        parts.append("LIMIT 100\n")
+        parts.append("```\n\n")
     
-    result += "### Tips:\n"
-    result += "- Always include date filters to limit data volume\n"
-    result += "- Use LIMIT to control result size\n"
-    result += "- Remember ACCOUNT_USAGE data has latency (up to 3 hours)\n"
-    result += "- Use explore_account_usage_schema() to find exact table and column names\n"
+    parts.append("### Tips:\n")
+    parts.append("- Always include date filters to limit data volume\n")
+    parts.append("- Use LIMIT to control result size\n")
+    parts.append("- Remember ACCOUNT_USAGE data has latency (up to 3 hours)\n")
+    parts.append("- Use explore_account_usage_schema() to find exact table and column names\n")
     
-    return result
\ No newline at end of file
+    return "".join(parts)
\ No newline at end of file
@@ -2,17 +2,26 @@
 Monitoring and utilization tools for Snowflake
 """
 
-import pandas as pd
-import sys
-import os
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from datetime import datetime
 
 from utils.snowflake_connection import snowflake_conn
+from utils.cache import UncachedResult, ttl_cache
 from queries.optimization_queries import (
     get_warehouse_utilization,
-    get_query_acceleration_candidates
+    get_query_acceleration_candidates,
+    get_warehouse_credit_usage,
+    get_slow_query_summary
 )
+from queries.materializations import get_rollup_schema, get_rollup_setup_statements
 
+# Wording for the SIZING_RECOMMENDATION codes returned by get_warehouse_utilization
+_SIZING_ADVICE = {
+    'DOWNSIZE': "Consider downsizing from {size} (low utilization)",
+    'UPSIZE': "Consider upsizing from {size} (high queue times)",
+    'WELL_SIZED': "Well-sized {size} warehouse (high utilization, low queuing)",
+}
+
+@ttl_cache()
 def analyze_warehouse_utilization(days_back: int = 7) -> str:
     """
     Analyze warehouse utilization patterns and efficiency.
@@ -24,83 +33,79 @@ def analyze_warehouse_utilization(days_back: int = 7) -> str:
         Analysis of warehouse utilization with sizing recommendations
     """
     try:
-        query = get_warehouse_utilization(days_back)
-        df = snowflake_conn.execute_query(query)
+        query, params = get_warehouse_utilization(days_back)
+        df = snowflake_conn.execute_query(query, params)
         
         if df.empty:
             return f"No warehouse utilization data found in the last {days_back} days."
         
-        result = f"## Warehouse Utilization Analysis (Last {days_back} Days)\n\n"
+        parts = [f"## Warehouse Utilization Analysis (Last {days_back} Days)\n\n"]
         
         total_credits = df['TOTAL_CREDITS'].sum()
         total_hours = df['TOTAL_HOURS_ACTIVE'].sum()
         
-        result += f"**Overall Metrics:**\n"
-        result += f"- Total Credits Consumed: {total_credits:.2f}\n"
-        result += f"- Total Active Hours: {total_hours:,}\n"
-        result += f"- Average Credits/Hour: {total_credits/total_hours:.2f}\n\n"
-        
-        result += "### Warehouse Details:\n\n"
-        result += "| Warehouse | Size | Avg Concurrent | Avg Queued | Credits | Hours | Credits/Hr |\n"
-        result += "|-----------|------|----------------|------------|---------|-------|------------|\n"
-        
-        for _, row in df.iterrows():
-            warehouse = row['WAREHOUSE_NAME']
-            size = row['WAREHOUSE_SIZE']
-            concurrent = row['AVG_CONCURRENT_QUERIES']
-            queued = row['AVG_QUEUED_QUERIES']
-            credits = row['TOTAL_CREDITS']
-            hours = row['TOTAL_HOURS_ACTIVE']
-            credits_per_hour = row['AVG_CREDITS_PER_HOUR']
-            
-            result += f"| {warehouse} | {size} | {concurrent:.1f} | {queued:.1f} | {credits:.1f} | {hours} | {credits_per_hour:.2f} |\n"
+        parts.append(f"**Overall Metrics:**\n")
+        parts.append(f"- Total Credits Consumed: {total_credits:.2f}\n")
+        parts.append(f"- Total Active Hours: {total_hours:,}\n")
+        parts.append(f"- Average Credits/Hour: {total_credits/total_hours:.2f}\n\n")
+        
+        parts.append("### Warehouse Details:\n\n")
+        parts.append("| Warehouse | Size | Avg Concurrent | Avg Queued | Credits | Hours | Credits/Hr |\n")
+        parts.append("|-----------|------|----------------|------------|---------|-------|------------|\n")
+        
+        # Format each column once instead of each cell in a Python loop
+        rows = (
+            "| " + df['WAREHOUSE_NAME'].astype(str)
+            + " | " + df['WAREHOUSE_SIZE'].astype(str)
+            + " | " + df['AVG_CONCURRENT_QUERIES'].map('{:.1f}'.format)
+            + " | " + df['AVG_QUEUED_QUERIES'].map('{:.1f}'.format)
+            + " | " + df['TOTAL_CREDITS'].map('{:.1f}'.format)
+            + " | " + df['TOTAL_HOURS_ACTIVE'].astype(str)
+            + " | " + df['AVG_CREDITS_PER_HOUR'].map('{:.2f}'.format) + " |\n"
+        )
+        parts.extend(rows.tolist())
         
         # Analysis and recommendations
-        result += "\n## Utilization Analysis:\n\n"
+        parts.append("\n## Utilization Analysis:\n\n")
+        
+        # Every per-warehouse line below is built from the same flag and label columns
+        names = df['WAREHOUSE_NAME'].astype(str)
+        underutilized = df['IS_UNDERUTILIZED'].astype(bool)
+        over_queued = df['IS_OVER_QUEUED'].astype(bool)
+        sized = df['SIZING_RECOMMENDATION'].notna()
         
         # Find underutilized warehouses
-        underutilized = df[df['AVG_CONCURRENT_QUERIES'] < 0.5]
-        if not underutilized.empty:
-            result += f"**Underutilized warehouses ({len(underutilized)}):**\n"
-            for _, row in underutilized.iterrows():
-                result += f"- {row['WAREHOUSE_NAME']}: {row['AVG_CONCURRENT_QUERIES']:.1f} avg concurrent queries\n"
-            result += "\n"
+        if underutilized.any():
+            parts.append(f"**Underutilized warehouses ({underutilized.sum()}):**\n")
+            lines = "- " + names[underutilized] + ": " + df.loc[underutilized, 'AVG_CONCURRENT_QUERIES'].map('{:.1f}'.format) + " avg concurrent queries\n"
+            parts.extend(lines.tolist())
+            parts.append("\n")
         
         # Find over-queued warehouses
-        over_queued = df[df['AVG_QUEUED_QUERIES'] > 1.0]
-        if not over_queued.empty:
-            result += f"**Warehouses with queuing issues ({len(over_queued)}):**\n"
-            for _, row in over_queued.iterrows():
-                result += f"- {row['WAREHOUSE_NAME']}: {row['AVG_QUEUED_QUERIES']:.1f} avg queued queries\n"
-            result += "\n"
+        if over_queued.any():
+            parts.append(f"**Warehouses with queuing issues ({over_queued.sum()}):**\n")
+            lines = "- " + names[over_queued] + ": " + df.loc[over_queued, 'AVG_QUEUED_QUERIES'].map('{:.1f}'.format) + " avg queued queries\n"
+            parts.extend(lines.tolist())
+            parts.append("\n")
         
         # Efficiency analysis
-        result += "## Sizing Recommendations:\n\n"
+        parts.append("## Sizing Recommendations:\n\n")
         
-        for _, row in df.iterrows():
-            warehouse = row['WAREHOUSE_NAME']
-            concurrent = row['AVG_CONCURRENT_QUERIES']
-            queued = row['AVG_QUEUED_QUERIES']
-            size = row['WAREHOUSE_SIZE']
-            
-            if concurrent < 0.3 and queued < 0.1:
-                result += f"- **{warehouse}**: Consider downsizing from {size} (low utilization)\n"
-            elif queued > 2.0:
-                result += f"- **{warehouse}**: Consider upsizing from {size} (high queue times)\n"
-            elif concurrent > 5.0 and queued < 0.5:
-                result += f"- **{warehouse}**: Well-sized {size} warehouse (high utilization, low queuing)\n"
+        for name, code, size in zip(names[sized], df.loc[sized, 'SIZING_RECOMMENDATION'], df.loc[sized, 'WAREHOUSE_SIZE']):
+            parts.append(f"- **{name}**: {_SIZING_ADVICE[code].format(size=size)}\n")
         
-        result += "\n**General Recommendations:**\n"
-        result += "- Set auto-suspend to 60 seconds for underutilized warehouses\n"
-        result += "- Monitor query queuing during peak hours\n"
-        result += "- Consider multi-cluster warehouses for highly variable workloads\n"
-        result += "- Review warehouse sizing monthly based on utilization patterns\n"
+        parts.append("\n**General Recommendations:**\n")
+        parts.append("- Set auto-suspend to 60 seconds for underutilized warehouses\n")
+        parts.append("- Monitor query queuing during peak hours\n")
+        parts.append("- Consider multi-cluster warehouses for highly variable workloads\n")
+        parts.append("- Review warehouse sizing monthly based on utilization patterns\n")
         
-        return result
+        return "".join(parts)
         
     except Exception as e:
         return f"Error analyzing warehouse utilization: {str(e)}"
 
+@ttl_cache()
 def find_query_acceleration_opportunities(days_back: int = 7, limit: int = 50) -> str:
     """
     Identify queries that would benefit from Query Acceleration Service.
@@ -113,85 +118,86 @@ def find_query_acceleration_opportunities(days_back: int = 7, limit: int = 50) -
         List of queries eligible for acceleration with potential benefits
     """
     try:
-        query = get_query_acceleration_candidates(days_back, limit)
-        df = snowflake_conn.execute_query(query)
+        query, params = get_query_acceleration_candidates(days_back, limit)
+        df = snowflake_conn.execute_query(query, params)
+        candidate_count = len(df)
         
-        if df.empty:
+        if candidate_count == 0:
             return f"No query acceleration candidates found in the last {days_back} days."
         
-        result = f"## Query Acceleration Opportunities (Last {days_back} Days)\n\n"
+        parts = [f"## Query Acceleration Opportunities (Last {days_back} Days)\n\n"]
         
         total_eligible_time = df['ELIGIBLE_QUERY_ACCELERATION_TIME'].sum()
         total_eligible_hours = total_eligible_time / 3600000  # Convert ms to hours
         
-        result += f"**Summary:**\n"
-        result += f"- Queries eligible for acceleration: {len(df)}\n"
-        result += f"- Total eligible acceleration time: {total_eligible_hours:.2f} hours\n"
-        result += f"- Potential time savings: {total_eligible_hours * 0.5:.2f} hours (50% acceleration)\n\n"
+        parts.append(f"**Summary:**\n")
+        parts.append(f"- Queries eligible for acceleration: {candidate_count}\n")
+        parts.append(f"- Total eligible acceleration time: {total_eligible_hours:.2f} hours\n")
+        parts.append(f"- Potential time savings: {total_eligible_hours * 0.5:.2f} hours (50% acceleration)\n\n")
         
-        result += "### Top Acceleration Candidates:\n\n"
+        parts.append("### Top Acceleration Candidates:\n\n")
         
-        for idx, row in df.head(20).iterrows():
-            eligible_time_ms = row['ELIGIBLE_QUERY_ACCELERATION_TIME']
-            eligible_time_seconds = eligible_time_ms / 1000
-            eligible_time_minutes = eligible_time_seconds / 60
-            
+        # Truncate long queries and convert eligible time to minutes column-wise before the loop
+        top = df.iloc[:20]
+        texts = top['QUERY_TEXT'].fillna('')
+        short_texts = texts.str.slice(0, 150)
+        short_texts = short_texts.where(texts.str.len() <= 150, short_texts + "...")
+        eligible_minutes = top['ELIGIBLE_QUERY_ACCELERATION_TIME'] / 60000
+        
+        for i, (row, query_text, eligible_time_minutes) in enumerate(
+            zip(top.to_dict('records'), short_texts, eligible_minutes), 1
+        ):
             warehouse = row['WAREHOUSE_NAME']
             user = row['USER_NAME']
             
-            result += f"**Query {idx + 1}:**\n"
-            result += f"- Eligible acceleration time: {eligible_time_minutes:.1f} minutes\n"
-            result += f"- Warehouse: {warehouse}\n"
-            result += f"- User: {user}\n"
-            result += f"- Query ID: {row['QUERY_ID']}\n"
-            
-            # Show truncated query
-            query_text = str(row['QUERY_TEXT'])[:150]
-            if len(str(row['QUERY_TEXT'])) > 150:
-                query_text += "..."
-            result += f"- Query: `{query_text}`\n\n"
+            parts.append(f"**Query {i}:**\n")
+            parts.append(f"- Eligible acceleration time: {eligible_time_minutes:.1f} minutes\n")
+            parts.append(f"- Warehouse: {warehouse}\n")
+            parts.append(f"- User: {user}\n")
+            parts.append(f"- Query ID: {row['QUERY_ID']}\n")
+            parts.append(f"- Query: `{query_text}`\n\n")
         
         # Analysis by warehouse
-        warehouse_summary = df.groupby('WAREHOUSE_NAME').agg({
-            'ELIGIBLE_QUERY_ACCELERATION_TIME': ['count', 'sum', 'mean']
-        }).round(2)
+        # Flat named aggregates on the one column; warehouses stay in order of their top candidate
+        warehouse_summary = df.groupby('WAREHOUSE_NAME', sort=False)['ELIGIBLE_QUERY_ACCELERATION_TIME'].agg(
+            count='count', total_ms='sum', mean_ms='mean'
+        ).round(2)
         
         if not warehouse_summary.empty:
-            result += "### Acceleration Opportunities by Warehouse:\n\n"
-            result += "| Warehouse | Eligible Queries | Total Time (hrs) | Avg Time (min) |\n"
-            result += "|-----------|------------------|------------------|----------------|\n"
+            parts.append("### Acceleration Opportunities by Warehouse:\n\n")
+            parts.append("| Warehouse | Eligible Queries | Total Time (hrs) | Avg Time (min) |\n")
+            parts.append("|-----------|------------------|------------------|----------------|\n")
             
-            for warehouse in warehouse_summary.index:
-                count = warehouse_summary.loc[warehouse, ('ELIGIBLE_QUERY_ACCELERATION_TIME', 'count')]
-                total_time_ms = warehouse_summary.loc[warehouse, ('ELIGIBLE_QUERY_ACCELERATION_TIME', 'sum')]
-                avg_time_ms = warehouse_summary.loc[warehouse, ('ELIGIBLE_QUERY_ACCELERATION_TIME', 'mean')]
-                
-                total_hours = total_time_ms / 3600000
-                avg_minutes = avg_time_ms / 60000
-                
-                result += f"| {warehouse} | {count} | {total_hours:.2f} | {avg_minutes:.1f} |\n"
+            rows = (
+                "| " + warehouse_summary.index.to_series().astype(str)
+                + " | " + warehouse_summary['count'].astype(str)
+                + " | " + (warehouse_summary['total_ms'] / 3600000).map('{:.2f}'.format)
+                + " | " + (warehouse_summary['mean_ms'] / 60000).map('{:.1f}'.format) + " |\n"
+            )
+            parts.extend(rows.tolist())
         
-        result += "\n## Recommendations:\n\n"
+        parts.append("\n## Recommendations:\n\n")
         
         # Find warehouses with most opportunities
         if not warehouse_summary.empty:
-            top_warehouse = warehouse_summary.idxmax()[('ELIGIBLE_QUERY_ACCELERATION_TIME', 'sum')]
-            result += f"- **{top_warehouse}** has the most acceleration opportunities\n"
+            top_warehouse = warehouse_summary['total_ms'].idxmax()
+            parts.append(f"- **{top_warehouse}** has the most acceleration opportunities\n")
         
         # Check for patterns
-        long_candidates = df[df['ELIGIBLE_QUERY_ACCELERATION_TIME'] > 300000]  # >5 minutes
-        if not long_candidates.empty:
-            result += f"- {len(long_candidates)} queries have >5 minutes eligible time - high priority for acceleration\n"
+        long_candidate_count = int((df['ELIGIBLE_QUERY_ACCELERATION_TIME'] > 300000).sum())  # >5 minutes
+        if long_candidate_count:
+            parts.append(f"- {long_candidate_count} queries have >5 minutes eligible time - high priority for acceleration\n")
         
-        result += "- Enable Query Acceleration Service for warehouses with frequent long-running queries\n"
-        result += "- Monitor acceleration service usage and costs vs. time savings\n"
-        result += "- Consider automatic query acceleration for eligible queries\n"
+        parts.append("- Enable Query Acceleration Service for warehouses with frequent long-running queries\n")
+        parts.append("- Monitor acceleration service usage and costs vs. time savings\n")
+        parts.append("- Consider automatic query acceleration for eligible queries\n")
         
-        return result
+        return "".join(parts)
         
     except Exception as e:
         return f"Error finding query acceleration opportunities: {str(e)}"
 
+@ttl_cache()
 def generate_optimization_report(days_back: int = 7) -> str:
     """
     Generate a comprehensive optimization report combining multiple analyses.
@@ -205,88 +211,115 @@ def generate_optimization_report(days_back: int = 7) -> str:
     try:
         credit_price = snowflake_conn.get_credit_price()
         
-        result = f"# Snowflake Optimization Report\n"
-        result += f"**Analysis Period:** Last {days_back} days\n"
-        result += f"**Credit Price:** ${credit_price:.2f}\n"
-        result += f"**Generated:** {pd.Timestamp.now().strftime('%Y-%m-%d %H:%M:%S')}\n\n"
+        parts = [f"# Snowflake Optimization Report\n"]
+        parts.append(f"**Analysis Period:** Last {days_back} days\n")
+        parts.append(f"**Credit Price:** ${credit_price:.2f}\n")
+        parts.append(f"**Generated:** {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n\n")
+        
+        # Run the report queries concurrently instead of one round trip after another
+        cost_query = get_warehouse_credit_usage(days_back, credit_price)
+        # Convert days to hours; the report only needs counts and an average, so aggregate in Snowflake
+        perf_query = get_slow_query_summary(days_back * 24, 1000)
+        cost_df, perf_df = snowflake_conn.execute_queries_async([cost_query, perf_query])
         
         # Quick metrics
-        result += "## Executive Summary\n\n"
+        parts.append("## Executive Summary\n\n")
+        
+        # A failed query only blanks its own section, but the report is then not cached
+        cost_ok = not isinstance(cost_df, Exception)
+        perf_ok = not isinstance(perf_df, Exception)
+        slow_queries = 0
         
         # Get warehouse costs
-        try:
-            cost_query = get_warehouse_credit_usage(days_back).format(credit_price=credit_price)
-            cost_df = snowflake_conn.execute_query(cost_query)
-            
-            if not cost_df.empty:
+        if not cost_ok:
+            parts.append(f"- Cost data unavailable: {str(cost_df)}\n\n")
+        elif not cost_df.empty:
                 total_cost = cost_df['ESTIMATED_COST'].sum()
                 total_credits = cost_df['CREDITS_USED_COMPUTE_SUM'].sum()
                 projected_monthly = total_cost / days_back * 30
                 
-                result += f"- **Total Cost:** ${total_cost:.2f}\n"
-                result += f"- **Total Credits:** {total_credits:.2f}\n"
-                result += f"- **Projected Monthly:** ${projected_monthly:.2f}\n"
-                result += f"- **Active Warehouses:** {len(cost_df)}\n\n"
-        except:
-            result += "- Cost data unavailable\n\n"
+                parts.append(f"- **Total Cost:** ${total_cost:.2f}\n")
+                parts.append(f"- **Total Credits:** {total_credits:.2f}\n")
+                parts.append(f"- **Projected Monthly:** ${projected_monthly:.2f}\n")
+                parts.append(f"- **Active Warehouses:** {len(cost_df)}\n\n")
         
         # Get query metrics
-        try:
-            perf_query = get_slow_queries(days_back * 24, 1000)  # Convert days to hours
-            perf_df = snowflake_conn.execute_query(perf_query)
-            
-            if not perf_df.empty:
-                total_queries = len(perf_df)
-                avg_execution = perf_df['EXECUTION_TIME_SECONDS'].mean()
-                slow_queries = len(perf_df[perf_df['EXECUTION_TIME_SECONDS'] > 60])
+        if not perf_ok:
+            parts.append(f"- Query performance data unavailable: {str(perf_df)}\n\n")
+        else:
+            summary = perf_df.iloc[0]
+            total_queries = int(summary['TOTAL_QUERIES'])
+            slow_queries = int(summary['SLOW_QUERIES'])
+            if total_queries:
+                avg_execution = float(summary['AVG_EXECUTION_SECONDS'])
                 
-                result += f"- **Total Queries Analyzed:** {total_queries:,}\n"
-                result += f"- **Average Execution Time:** {avg_execution:.2f} seconds\n"
-                result += f"- **Slow Queries (>1min):** {slow_queries:,} ({slow_queries/total_queries*100:.1f}%)\n\n"
-        except:
-            result += "- Query performance data unavailable\n\n"
+                parts.append(f"- **Total Queries Analyzed:** {total_queries:,}\n")
+                parts.append(f"- **Average Execution Time:** {avg_execution:.2f} seconds\n")
+                parts.append(f"- **Slow Queries (>1min):** {slow_queries:,} ({slow_queries/total_queries*100:.1f}%)\n\n")
         
         # Key recommendations
-        result += "## Top Recommendations\n\n"
+        parts.append("## Top Recommendations\n\n")
         
         # Cost optimization
-        result += "### 💰 Cost Optimization\n"
-        try:
-            if not cost_df.empty:
-                most_expensive = cost_df.iloc[0]
-                result += f"- Review **{most_expensive['WAREHOUSE_NAME']}** warehouse (${most_expensive['ESTIMATED_COST']:.2f} cost)\n"
-                
-                low_util = cost_df[cost_df['AVG_CREDITS_PER_HOUR'] < 0.1]
-                if not low_util.empty:
-                    result += f"- Optimize auto-suspend for {len(low_util)} low-utilization warehouses\n"
-        except:
-            pass
-        result += "- Implement query result caching for repeated queries\n"
-        result += "- Review warehouse sizing based on utilization patterns\n\n"
+        parts.append("### 💰 Cost Optimization\n")
+        if cost_ok and not cost_df.empty:
+            most_expensive = cost_df.loc[cost_df['ESTIMATED_COST'].idxmax()]
+            parts.append(f"- Review **{most_expensive['WAREHOUSE_NAME']}** warehouse (${most_expensive['ESTIMATED_COST']:.2f} cost)\n")
+            
+            low_util = cost_df[cost_df['AVG_CREDITS_PER_HOUR'] < 0.1]
+            if not low_util.empty:
+                parts.append(f"- Optimize auto-suspend for {len(low_util)} low-utilization warehouses\n")
+        parts.append("- Implement query result caching for repeated queries\n")
+        parts.append("- Review warehouse sizing based on utilization patterns\n\n")
         
         # Performance optimization
-        result += "### ⚡ Performance Optimization\n"
-        try:
-            if not perf_df.empty and slow_queries > 0:
-                result += f"- Optimize {slow_queries:,} slow queries (>1 minute execution time)\n"
-        except:
-            pass
-        result += "- Consider Query Acceleration Service for long-running queries\n"
-        result += "- Review table clustering and partitioning strategies\n"
-        result += "- Implement workload management policies\n\n"
+        parts.append("### ⚡ Performance Optimization\n")
+        if slow_queries > 0:
+            parts.append(f"- Optimize {slow_queries:,} slow queries (>1 minute execution time)\n")
+        parts.append("- Consider Query Acceleration Service for long-running queries\n")
+        parts.append("- Review table clustering and partitioning strategies\n")
+        parts.append("- Implement workload management policies\n\n")
         
         # Monitoring recommendations
-        result += "### 📊 Monitoring & Governance\n"
-        result += "- Set up automated alerts for cost anomalies\n"
-        result += "- Monitor query performance trends weekly\n"
-        result += "- Implement resource monitoring dashboards\n"
-        result += "- Regular optimization reviews with high-usage teams\n\n"
+        parts.append("### 📊 Monitoring & Governance\n")
+        parts.append("- Set up automated alerts for cost anomalies\n")
+        parts.append("- Monitor query performance trends weekly\n")
+        parts.append("- Implement resource monitoring dashboards\n")
+        parts.append("- Regular optimization reviews with high-usage teams\n\n")
+        
+        parts.append("---\n\n")
+        parts.append("*This report was generated by the MCP Snowflake Optimization Server*\n")
+        parts.append("*For detailed analysis, use individual optimization tools*\n")
         
-        result += "---\n\n"
-        result += "*This report was generated by the MCP Snowflake Optimization Server*\n"
-        result += "*For detailed analysis, use individual optimization tools*\n"
+        report = "".join(parts)
+        return report if cost_ok and perf_ok else UncachedResult(report)
+        
+    except Exception as e:
+        return f"Error generating optimization report: {str(e)}"
+
+def create_rollup_tables() -> str:
+    """
+    Create the hourly ACCOUNT_USAGE rollup tables and their refresh task.
+    
+    Returns:
+        Setup status message
+    """
+    rollup_schema = get_rollup_schema()
+    if not rollup_schema:
+        return ("Rollups are disabled. Set SNOWFLAKE_ROLLUP_SCHEMA to a writable schema "
+                "(e.g. ANALYTICS.MCP_ROLLUP) and try again.")
+    
+    try:
+        warehouse = snowflake_conn.get_warehouse()
+        for statement in get_rollup_setup_statements(rollup_schema, warehouse):
+            snowflake_conn.execute_query(statement)
         
-        return result
+        parts = [f"## Rollup Tables Ready\n\n"]
+        parts.append(f"- Schema: {rollup_schema}\n")
+        parts.append(f"- Tables: query_history_hourly, warehouse_metering_hourly, login_history_hourly\n")
+        parts.append(f"- Refresh task: {rollup_schema}.refresh_rollups (every 15 minutes on {warehouse})\n\n")
+        parts.append("Repeated-pattern, warehouse cost, user cost, execution distribution and user authentication tools now read from these tables.\n")
+        return "".join(parts)
         
     except Exception as e:
-        return f"Error generating optimization report: {str(e)}"
\ No newline at end of file
+        return f"Error creating rollup tables: {str(e)}"
@@ -3,17 +3,23 @@ Performance analysis tools for Snowflake optimization
 """
 
 import pandas as pd
-import sys
-import os
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import pyarrow as pa
+import pyarrow.compute as pc
 
 from utils.snowflake_connection import snowflake_conn
+from utils.cache import ttl_cache
 from queries.optimization_queries import (
     get_slow_queries, 
     get_query_patterns, 
     get_execution_time_distribution
 )
+from queries.materializations import EXECUTION_TIME_BUCKETS
 
+# Bucket labels the distribution analysis reports on, derived from the shared bucket bounds
+_QUICK_BUCKET = EXECUTION_TIME_BUCKETS[0][0]
+_SLOW_BUCKETS = frozenset(label for label, lower, _ in EXECUTION_TIME_BUCKETS if lower >= 60000)
+
+@ttl_cache()
 def analyze_slow_queries(hours_back: int = 24, limit: int = 50) -> str:
     """
     Find and analyze the slowest queries in your Snowflake account.
@@ -26,44 +32,48 @@ def analyze_slow_queries(hours_back: int = 24, limit: int = 50) -> str:
         Formatted analysis of slow queries with recommendations
     """
     try:
-        query = get_slow_queries(hours_back, limit)
-        df = snowflake_conn.execute_query(query)
+        query, params = get_slow_queries(hours_back, limit)
+        df = snowflake_conn.execute_query(query, params)
         
         if df.empty:
             return f"No queries found in the last {hours_back} hours."
         
         # Format results
-        result = f"## Slowest Queries (Last {hours_back} Hours)\n\n"
-        result += f"Found {len(df)} slow queries:\n\n"
-        
-        for idx, row in df.head(10).iterrows():
-            result += f"**Query {idx + 1}:**\n"
-            result += f"- Execution Time: {row['EXECUTION_TIME_SECONDS']:.2f} seconds\n"
-            result += f"- Warehouse: {row['WAREHOUSE_NAME']}\n"
-            result += f"- User: {row['USER_NAME']}\n"
-            result += f"- Bytes Scanned: {row['BYTES_SCANNED']:,}\n"
-            result += f"- Query ID: {row['QUERY_ID']}\n"
-            
-            # Truncate long queries
-            query_text = str(row['QUERY_TEXT'])[:200]
-            if len(str(row['QUERY_TEXT'])) > 200:
-                query_text += "..."
-            result += f"- Query: `{query_text}`\n\n"
+        parts = [f"## Slowest Queries (Last {hours_back} Hours)\n\n"]
+        # Window statistics cover all `limit` queries; only the displayed ones are returned
+        window = df.iloc[0]
+        parts.append(f"Found {window['WINDOW_QUERY_COUNT']} slow queries:\n\n")
+        
+        # Truncate long queries column-wise before the loop
+        top = df.iloc[:10]
+        texts = top['QUERY_TEXT'].fillna('')
+        short_texts = texts.str.slice(0, 200)
+        short_texts = short_texts.where(texts.str.len() <= 200, short_texts + "...")
+        
+        for i, (row, query_text) in enumerate(zip(top.to_dict('records'), short_texts), 1):
+            parts.append(f"**Query {i}:**\n")
+            parts.append(f"- Execution Time: {row['EXECUTION_TIME_SECONDS']:.2f} seconds\n")
+            parts.append(f"- Warehouse: {row['WAREHOUSE_NAME']}\n")
+            parts.append(f"- User: {row['USER_NAME']}\n")
+            parts.append(f"- Bytes Scanned: {row['BYTES_SCANNED'] if pd.notna(row['BYTES_SCANNED']) else 0:,.0f}\n")
+            parts.append(f"- Query ID: {row['QUERY_ID']}\n")
+            parts.append(f"- Query: `{query_text}`\n\n")
         
         # Add recommendations
-        result += "## Recommendations:\n"
-        if df['EXECUTION_TIME_SECONDS'].max() > 300:  # 5 minutes
-            result += "- Consider enabling Query Acceleration Service for queries > 5 minutes\n"
-        if df['BYTES_SCANNED'].mean() > 1000000000:  # 1GB
-            result += "- Review table clustering and partitioning for large scans\n"
-        if df['TOTAL_QUEUED_TIME'].mean() > 30000:  # 30 seconds
-            result += "- Consider scaling up warehouses to reduce queue times\n"
+        parts.append("## Recommendations:\n")
+        if (window['WINDOW_MAX_EXECUTION_SECONDS'] or 0) > 300:  # 5 minutes
+            parts.append("- Consider enabling Query Acceleration Service for queries > 5 minutes\n")
+        if (window['WINDOW_AVG_BYTES_SCANNED'] or 0) > 1000000000:  # 1GB
+            parts.append("- Review table clustering and partitioning for large scans\n")
+        if (window['WINDOW_AVG_QUEUED_TIME'] or 0) > 30000:  # 30 seconds
+            parts.append("- Consider scaling up warehouses to reduce queue times\n")
         
-        return result
+        return "".join(parts)
         
     except Exception as e:
         return f"Error analyzing slow queries: {str(e)}"
 
+@ttl_cache()
 def analyze_query_patterns(hours_back: int = 168, limit: int = 50) -> str:
     """
     Identify frequently repeated expensive query patterns.
@@ -76,54 +86,61 @@ def analyze_query_patterns(hours_back: int = 168, limit: int = 50) -> str:
         Analysis of repeated query patterns with optimization suggestions
     """
     try:
-        query = get_query_patterns(hours_back, limit)
-        df = snowflake_conn.execute_query(query)
+        query, params = get_query_patterns(hours_back, limit)
+        table = snowflake_conn.execute_query_arrow(query, params)
+        pattern_count = table.num_rows
         
-        if df.empty:
+        if pattern_count == 0:
             return f"No repeated query patterns found in the last {hours_back} hours."
         
-        result = f"## Repeated Query Patterns (Last {hours_back} Hours)\n\n"
-        result += f"Found {len(df)} repeated query patterns:\n\n"
-        
-        total_wasted_time = 0
-        
-        for idx, row in df.head(10).iterrows():
-            execution_count = row['EXECUTION_COUNT']
-            avg_time = row['AVG_TIME_SECONDS']
-            total_time = row['TOTAL_TIME_SECONDS']
-            
-            # Calculate potential savings if optimized by 50%
-            potential_savings = total_time * 0.5
-            total_wasted_time += potential_savings
-            
-            result += f"**Pattern {idx + 1}:**\n"
-            result += f"- Executions: {execution_count}\n"
-            result += f"- Avg Time: {avg_time:.2f} seconds\n"
-            result += f"- Total Time: {total_time:.2f} seconds\n"
-            result += f"- Potential 50% Savings: {potential_savings:.2f} seconds\n"
-            result += f"- Warehouse: {row['WAREHOUSE_NAME']}\n"
-            
-            # Show sample query
-            query_text = str(row['SAMPLE_QUERY_TEXT'])[:150]
-            if len(str(row['SAMPLE_QUERY_TEXT'])) > 150:
-                query_text += "..."
-            result += f"- Sample Query: `{query_text}`\n\n"
-        
-        result += f"## Summary:\n"
-        result += f"- Total potential time savings: {total_wasted_time:.2f} seconds\n"
-        result += f"- Equivalent to: {total_wasted_time/3600:.2f} hours\n\n"
-        
-        result += "## Optimization Recommendations:\n"
-        result += "- Cache results for frequently repeated queries\n"
-        result += "- Create materialized views for common aggregations\n"
-        result += "- Consider query result caching settings\n"
-        result += "- Review and optimize the most repeated patterns first\n"
-        
-        return result
+        parts = [f"## Repeated Query Patterns (Last {hours_back} Hours)\n\n"]
+        parts.append(f"Found {pattern_count} repeated query patterns:\n\n")
+        
+        # Only the top 10 patterns are rendered; slice before touching any column
+        top = table.slice(0, 10)
+        # Millisecond sums and averages divided by 1000 arrive as scaled NUMBER (decimal128);
+        # do the arithmetic in float
+        avg_times = pc.cast(top['AVG_TIME_SECONDS'], pa.float64())
+        total_times = pc.cast(top['TOTAL_TIME_SECONDS'], pa.float64())
+        
+        # Calculate potential savings if optimized by 50%
+        potential_savings = pc.multiply(total_times, 0.5)
+        total_wasted_time = pc.sum(potential_savings, min_count=0).as_py()
+        
+        # Truncate sample queries column-wise before the loop
+        texts = pc.fill_null(top['SAMPLE_QUERY_TEXT'], '')
+        short_texts = pc.utf8_slice_codeunits(texts, 0, 150)
+        ellipsis, no_separator = pa.scalar('...', texts.type), pa.scalar('', texts.type)
+        short_texts = pc.if_else(pc.greater(pc.utf8_length(texts), 150),
+                                 pc.binary_join_element_wise(short_texts, ellipsis, no_separator), short_texts)
+        
+        rows = zip(top['EXECUTION_COUNT'].to_pylist(), avg_times.to_pylist(), total_times.to_pylist(),
+                   potential_savings.to_pylist(), top['WAREHOUSE_NAME'].to_pylist(), short_texts.to_pylist())
+        for i, (execution_count, avg_time, total_time, savings, warehouse, query_text) in enumerate(rows, 1):
+            parts.append(f"**Pattern {i}:**\n")
+            parts.append(f"- Executions: {execution_count}\n")
+            parts.append(f"- Avg Time: {avg_time:.2f} seconds\n")
+            parts.append(f"- Total Time: {total_time:.2f} seconds\n")
+            parts.append(f"- Potential 50% Savings: {savings:.2f} seconds\n")
+            parts.append(f"- Warehouse: {warehouse}\n")
+            parts.append(f"- Sample Query: `{query_text}`\n\n")
+        
+        parts.append(f"## Summary:\n")
+        parts.append(f"- Total potential time savings: {total_wasted_time:.2f} seconds\n")
+        parts.append(f"- Equivalent to: {total_wasted_time/3600:.2f} hours\n\n")
+        
+        parts.append("## Optimization Recommendations:\n")
+        parts.append("- Cache results for frequently repeated queries\n")
+        parts.append("- Create materialized views for common aggregations\n")
+        parts.append("- Consider query result caching settings\n")
+        parts.append("- Review and optimize the most repeated patterns first\n")
+        
+        return "".join(parts)
         
     except Exception as e:
         return f"Error analyzing query patterns: {str(e)}"
 
+@ttl_cache()
 def analyze_execution_time_distribution(days_back: int = 7) -> str:
     """
     Analyze the distribution of query execution times.
@@ -135,46 +152,51 @@ def analyze_execution_time_distribution(days_back: int = 7) -> str:
         Analysis of query execution time distribution
     """
     try:
-        query = get_execution_time_distribution(days_back)
-        df = snowflake_conn.execute_query(query)
+        query, params = get_execution_time_distribution(days_back)
+        # A handful of bucket rows that are only summed and printed; stay in Arrow
+        table = snowflake_conn.execute_query_arrow(query, params)
         
-        if df.empty:
+        if table.num_rows == 0:
             return f"No query data found in the last {days_back} days."
         
-        result = f"## Query Execution Time Distribution (Last {days_back} Days)\n\n"
+        parts = [f"## Query Execution Time Distribution (Last {days_back} Days)\n\n"]
+        
+        buckets = table['EXECUTION_TIME_BUCKET']
+        counts = table['QUERY_COUNT']
+        # ROUND(..., 2) arrives as decimal128; compare and print it as a float
+        percentages = pc.cast(table['PERCENTAGE'], pa.float64())
         
-        total_queries = df['QUERY_COUNT'].sum()
-        result += f"Total queries analyzed: {total_queries:,}\n\n"
+        total_queries = pc.sum(counts).as_py()
+        parts.append(f"Total queries analyzed: {total_queries:,}\n\n")
         
-        result += "| Time Range | Query Count | Percentage |\n"
-        result += "|------------|-------------|------------|\n"
+        parts.append("| Time Range | Query Count | Percentage |\n")
+        parts.append("|------------|-------------|------------|\n")
         
-        for _, row in df.iterrows():
-            bucket = row['EXECUTION_TIME_BUCKET']
-            count = row['QUERY_COUNT']
-            percentage = row['PERCENTAGE']
-            result += f"| {bucket} | {count:,} | {percentage}% |\n"
+        rows = zip(buckets.to_pylist(), counts.to_pylist(), percentages.to_pylist())
+        parts.extend(f"| {bucket} | {count:,} | {percentage:.2f}% |\n" for bucket, count, percentage in rows)
         
         # Analysis and recommendations
-        result += "\n## Analysis:\n"
+        parts.append("\n## Analysis:\n")
         
-        quick_queries = df[df['EXECUTION_TIME_BUCKET'] == 'Less than 1 second']['PERCENTAGE'].iloc[0] if len(df[df['EXECUTION_TIME_BUCKET'] == 'Less than 1 second']) > 0 else 0
-        slow_queries = df[df['EXECUTION_TIME_BUCKET'].str.contains('minutes', na=False)]['PERCENTAGE'].sum()
+        quick = pc.filter(percentages, pc.equal(buckets, _QUICK_BUCKET))
+        quick_queries = quick[0].as_py() if len(quick) else 0.0
+        is_slow = pc.is_in(buckets, value_set=pa.array(sorted(_SLOW_BUCKETS)))
+        slow_queries = pc.sum(pc.filter(percentages, is_slow), min_count=0).as_py()
         
-        result += f"- **Quick queries (<1s):** {quick_queries}%\n"
-        result += f"- **Slow queries (>1min):** {slow_queries}%\n\n"
+        parts.append(f"- **Quick queries (<1s):** {quick_queries:.2f}%\n")
+        parts.append(f"- **Slow queries (>1min):** {slow_queries:.2f}%\n\n")
         
-        result += "## Recommendations:\n"
+        parts.append("## Recommendations:\n")
         
         if slow_queries > 10:
-            result += f"- {slow_queries}% of queries take >1 minute - investigate these for optimization\n"
+            parts.append(f"- {slow_queries:.2f}% of queries take >1 minute - investigate these for optimization\n")
         if quick_queries < 50:
-            result += "- Consider query result caching to improve response times\n"
+            parts.append("- Consider query result caching to improve response times\n")
         
-        result += "- Focus optimization efforts on the longest-running query categories\n"
-        result += "- Monitor query performance trends over time\n"
+        parts.append("- Focus optimization efforts on the longest-running query categories\n")
+        parts.append("- Monitor query performance trends over time\n")
         
-        return result
+        return "".join(parts)
         
     except Exception as e:
         return f"Error analyzing execution time distribution: {str(e)}"
\ No newline at end of file
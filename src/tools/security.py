@@ -2,16 +2,40 @@
 Security and access analysis tools for Snowflake
 """
 
+import numpy as np
 import pandas as pd
-import sys
-import os
 from typing import List, Optional
 from datetime import datetime, timedelta
 
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-
 from utils.snowflake_connection import snowflake_conn
+from utils.cache import ttl_cache
+from queries.materializations import get_rollup_schema
+
+# Roles whose assignment is always called out in privilege audits
+_SENSITIVE_ROLES = ('ACCOUNTADMIN', 'SECURITYADMIN', 'SYSADMIN')
+
+# AUTH_STATUS values shown with a warning marker in the user details table
+_AUTH_STATUS_DISPLAY = {
+    'Password Only': '⚠️ Password Only',
+    'Both Methods Active': '⚡ Both Methods Active'
+}
+
+# Detection thresholds per sensitivity level
+_SENSITIVITY_THRESHOLDS = {
+    'low': {'hour_threshold': 2, 'volume_multiplier': 10, 'new_object_days': 90},
+    'medium': {'hour_threshold': 4, 'volume_multiplier': 5, 'new_object_days': 30},
+    'high': {'hour_threshold': 8, 'volume_multiplier': 3, 'new_object_days': 7}
+}
 
+_ANOMALY_EMOJI = {
+    'Unusual Hours': '🌙',
+    'High Query Volume': '📊',
+    'High Data Volume': '💾',
+    'Multiple Database Access': '🗄️',
+    'New Object Access': '🆕'
+}
+
+@ttl_cache()
 def analyze_user_authentication(users: List[str] = None, days_back: int = 30, check_both_methods: bool = True) -> str:
     """
     Analyze authentication methods for specified users.
@@ -25,53 +49,77 @@ def analyze_user_authentication(users: List[str] = None, days_back: int = 30, ch
         Formatted analysis of user authentication methods and recommendations
     """
     try:
-        # Build user filter
+        # Normalize the user list once: trimmed, upper-cased, de-duplicated and sorted,
+        # so equivalent lists bind identical values
+        users = sorted({user.strip().upper() for user in users or [] if user and user.strip()})
+        
+        # Build user filter; names are bound, never formatted into the SQL
+        params = {'days_back': days_back}
         user_filter = ""
         if users:
-            user_list = ", ".join([f"'{user.upper()}'" for user in users])
-            user_filter = f"AND USER_NAME IN ({user_list})"
+            params['users'] = users
+            user_filter = "AND USER_NAME IN (%(users)s)"
         
-        # Query to analyze authentication methods
-        query = f"""
-        WITH auth_summary AS (
+        # Per-user login pivot, from the hourly rollup when one is configured
+        rollup_schema = get_rollup_schema()
+        if rollup_schema:
+            auth_pivot = f"""
             SELECT 
                 USER_NAME,
-                FIRST_AUTHENTICATION_FACTOR,
-                MAX(EVENT_TIMESTAMP) as LAST_LOGIN,
-                COUNT(*) as LOGIN_COUNT,
-                COUNT(DISTINCT DATE(EVENT_TIMESTAMP)) as ACTIVE_DAYS
+                MAX(CASE WHEN FIRST_AUTHENTICATION_FACTOR = 'PASSWORD' THEN LAST_LOGIN END) as LAST_PASSWORD_LOGIN,
+                SUM(CASE WHEN FIRST_AUTHENTICATION_FACTOR = 'PASSWORD' THEN CNT ELSE 0 END) as PASSWORD_LOGIN_COUNT,
+                MAX(CASE WHEN FIRST_AUTHENTICATION_FACTOR LIKE '%%RSA%%' THEN LAST_LOGIN END) as LAST_RSA_LOGIN,
+                SUM(CASE WHEN FIRST_AUTHENTICATION_FACTOR LIKE '%%RSA%%' THEN CNT ELSE 0 END) as RSA_LOGIN_COUNT,
+                SUM(CNT) as TOTAL_LOGINS
+            FROM {rollup_schema}.login_history_hourly
+            WHERE HR >= DATEADD(day, -%(days_back)s, DATE_TRUNC('hour', CURRENT_TIMESTAMP()))
+                {user_filter}
+            GROUP BY USER_NAME"""
+        else:
+            auth_pivot = f"""
+            -- One pass over LOGIN_HISTORY with conditional aggregation per factor
+            SELECT 
+                USER_NAME,
+                MAX(CASE WHEN FIRST_AUTHENTICATION_FACTOR = 'PASSWORD' THEN EVENT_TIMESTAMP END) as LAST_PASSWORD_LOGIN,
+                COUNT_IF(FIRST_AUTHENTICATION_FACTOR = 'PASSWORD') as PASSWORD_LOGIN_COUNT,
+                MAX(CASE WHEN FIRST_AUTHENTICATION_FACTOR LIKE '%%RSA%%' THEN EVENT_TIMESTAMP END) as LAST_RSA_LOGIN,
+                COUNT_IF(FIRST_AUTHENTICATION_FACTOR LIKE '%%RSA%%') as RSA_LOGIN_COUNT,
+                COUNT(*) as TOTAL_LOGINS
             FROM SNOWFLAKE.ACCOUNT_USAGE.LOGIN_HISTORY
-            WHERE EVENT_TIMESTAMP >= DATEADD(day, -{days_back}, CURRENT_TIMESTAMP())
+            WHERE EVENT_TIMESTAMP >= DATEADD(day, -%(days_back)s, CURRENT_TIMESTAMP())
                 AND IS_SUCCESS = 'YES'
                 {user_filter}
-            GROUP BY USER_NAME, FIRST_AUTHENTICATION_FACTOR
+            GROUP BY USER_NAME"""
+        
+        # Query to analyze authentication methods
+        query = f"""
+        WITH user_auth_pivot AS ({auth_pivot}
         ),
-        user_auth_pivot AS (
+        user_auth_status AS (
             SELECT 
                 USER_NAME,
-                MAX(CASE WHEN FIRST_AUTHENTICATION_FACTOR = 'PASSWORD' THEN LAST_LOGIN END) as LAST_PASSWORD_LOGIN,
-                MAX(CASE WHEN FIRST_AUTHENTICATION_FACTOR = 'PASSWORD' THEN LOGIN_COUNT END) as PASSWORD_LOGIN_COUNT,
-                MAX(CASE WHEN FIRST_AUTHENTICATION_FACTOR LIKE '%RSA%' THEN LAST_LOGIN END) as LAST_RSA_LOGIN,
-                MAX(CASE WHEN FIRST_AUTHENTICATION_FACTOR LIKE '%RSA%' THEN LOGIN_COUNT END) as RSA_LOGIN_COUNT,
-                SUM(LOGIN_COUNT) as TOTAL_LOGINS
-            FROM auth_summary
-            GROUP BY USER_NAME
+                LAST_PASSWORD_LOGIN,
+                PASSWORD_LOGIN_COUNT,
+                LAST_RSA_LOGIN,
+                RSA_LOGIN_COUNT,
+                TOTAL_LOGINS,
+                CASE 
+                    WHEN LAST_RSA_LOGIN IS NULL THEN 'Password Only'
+                    WHEN LAST_PASSWORD_LOGIN IS NULL THEN 'RSA Only'
+                    WHEN DATEDIFF(day, LAST_PASSWORD_LOGIN, CURRENT_TIMESTAMP()) > 7 
+                        AND LAST_RSA_LOGIN > LAST_PASSWORD_LOGIN THEN 'Migrating to RSA'
+                    ELSE 'Both Methods Active'
+                END as AUTH_STATUS
+            FROM user_auth_pivot
         )
+        -- Status totals ride along on every row so the summary needs no pandas filtering
         SELECT 
-            USER_NAME,
-            LAST_PASSWORD_LOGIN,
-            COALESCE(PASSWORD_LOGIN_COUNT, 0) as PASSWORD_LOGIN_COUNT,
-            LAST_RSA_LOGIN,
-            COALESCE(RSA_LOGIN_COUNT, 0) as RSA_LOGIN_COUNT,
-            TOTAL_LOGINS,
-            CASE 
-                WHEN LAST_RSA_LOGIN IS NULL THEN 'Password Only'
-                WHEN LAST_PASSWORD_LOGIN IS NULL THEN 'RSA Only'
-                WHEN DATEDIFF(day, LAST_PASSWORD_LOGIN, CURRENT_TIMESTAMP()) > 7 
-                    AND LAST_RSA_LOGIN > LAST_PASSWORD_LOGIN THEN 'Migrating to RSA'
-                ELSE 'Both Methods Active'
-            END as AUTH_STATUS
-        FROM user_auth_pivot
+            *,
+            COUNT_IF(AUTH_STATUS = 'Password Only') OVER () as PASSWORD_ONLY_USERS,
+            COUNT_IF(AUTH_STATUS = 'RSA Only') OVER () as RSA_ONLY_USERS,
+            COUNT_IF(AUTH_STATUS = 'Both Methods Active') OVER () as BOTH_ACTIVE_USERS,
+            COUNT_IF(AUTH_STATUS = 'Migrating to RSA') OVER () as MIGRATING_USERS
+        FROM user_auth_status
         ORDER BY 
             CASE 
                 WHEN LAST_RSA_LOGIN IS NULL THEN 0  -- Password only users first
@@ -81,92 +129,89 @@ def analyze_user_authentication(users: List[str] = None, days_back: int = 30, ch
             USER_NAME
         """
         
-        df = snowflake_conn.execute_query(query)
+        df = snowflake_conn.execute_query(query, params)
+        total_users = len(df)
         
-        if df.empty:
+        if total_users == 0:
             return f"No login data found for the specified users in the last {days_back} days."
         
-        result = f"## User Authentication Analysis (Last {days_back} Days)\n\n"
+        parts = [f"## User Authentication Analysis (Last {days_back} Days)\n\n"]
         
         if users:
-            result += f"**Analyzing {len(users)} specified users**\n\n"
+            parts.append(f"**Analyzing {len(users)} specified users**\n\n")
         else:
-            result += f"**Analyzing all {len(df)} active users**\n\n"
-        
-        # Summary statistics
-        total_users = len(df)
-        password_only = len(df[df['AUTH_STATUS'] == 'Password Only'])
-        rsa_only = len(df[df['AUTH_STATUS'] == 'RSA Only'])
-        both_active = len(df[df['AUTH_STATUS'] == 'Both Methods Active'])
-        migrating = len(df[df['AUTH_STATUS'] == 'Migrating to RSA'])
-        
-        result += "### Summary:\n"
-        result += f"- Total Users: {total_users}\n"
-        result += f"- Password Only: {password_only} ({password_only/total_users*100:.1f}%)\n"
-        result += f"- RSA Only: {rsa_only} ({rsa_only/total_users*100:.1f}%)\n"
-        result += f"- Both Methods Active: {both_active} ({both_active/total_users*100:.1f}%)\n"
-        result += f"- Migrating to RSA: {migrating} ({migrating/total_users*100:.1f}%)\n\n"
+            parts.append(f"**Analyzing all {total_users} active users**\n\n")
+        
+        # Summary statistics, computed by the query's window aggregates
+        summary = df.iloc[0]
+        password_only = int(summary['PASSWORD_ONLY_USERS'])
+        rsa_only = int(summary['RSA_ONLY_USERS'])
+        both_active = int(summary['BOTH_ACTIVE_USERS'])
+        migrating = int(summary['MIGRATING_USERS'])
+        
+        parts.append("### Summary:\n")
+        parts.append(f"- Total Users: {total_users}\n")
+        parts.append(f"- Password Only: {password_only} ({password_only/total_users*100:.1f}%)\n")
+        parts.append(f"- RSA Only: {rsa_only} ({rsa_only/total_users*100:.1f}%)\n")
+        parts.append(f"- Both Methods Active: {both_active} ({both_active/total_users*100:.1f}%)\n")
+        parts.append(f"- Migrating to RSA: {migrating} ({migrating/total_users*100:.1f}%)\n\n")
         
         # Security concerns
         if password_only > 0:
-            result += f"⚠️ **Security Alert: {password_only} users still using password-only authentication**\n\n"
+            parts.append(f"⚠️ **Security Alert: {password_only} users still using password-only authentication**\n\n")
         
         if both_active > 0 and check_both_methods:
-            result += f"⚡ **Note: {both_active} users actively using both authentication methods**\n\n"
+            parts.append(f"⚡ **Note: {both_active} users actively using both authentication methods**\n\n")
         
         # Detailed user table
-        result += "### User Details:\n\n"
-        result += "| User | Status | Last Password | Last RSA | Password Logins | RSA Logins |\n"
-        result += "|------|--------|---------------|----------|-----------------|------------|\n"
-        
-        for _, row in df.iterrows():
-            user = row['USER_NAME']
-            status = row['AUTH_STATUS']
-            
-            # Format dates
-            pwd_date = row['LAST_PASSWORD_LOGIN'].strftime('%Y-%m-%d') if pd.notna(row['LAST_PASSWORD_LOGIN']) else 'Never'
-            rsa_date = row['LAST_RSA_LOGIN'].strftime('%Y-%m-%d') if pd.notna(row['LAST_RSA_LOGIN']) else 'Never'
-            
-            pwd_count = int(row['PASSWORD_LOGIN_COUNT']) if pd.notna(row['PASSWORD_LOGIN_COUNT']) else 0
-            rsa_count = int(row['RSA_LOGIN_COUNT']) if pd.notna(row['RSA_LOGIN_COUNT']) else 0
-            
-            # Add warning emoji for security concerns
-            status_display = status
-            if status == 'Password Only':
-                status_display = f"⚠️ {status}"
-            elif status == 'Both Methods Active':
-                status_display = f"⚡ {status}"
-            
-            result += f"| {user} | {status_display} | {pwd_date} | {rsa_date} | {pwd_count} | {rsa_count} |\n"
+        parts.append("### User Details:\n\n")
+        parts.append("| User | Status | Last Password | Last RSA | Password Logins | RSA Logins |\n")
+        parts.append("|------|--------|---------------|----------|-----------------|------------|\n")
+        
+        # Format the table column-wise; warning emoji mark security concerns
+        pwd_dates = pd.to_datetime(df['LAST_PASSWORD_LOGIN']).dt.strftime('%Y-%m-%d').fillna('Never')
+        rsa_dates = pd.to_datetime(df['LAST_RSA_LOGIN']).dt.strftime('%Y-%m-%d').fillna('Never')
+        status_display = df['AUTH_STATUS'].map(_AUTH_STATUS_DISPLAY).fillna(df['AUTH_STATUS'])
+        
+        rows = (
+            "| " + df['USER_NAME'].astype(str)
+            + " | " + status_display
+            + " | " + pwd_dates
+            + " | " + rsa_dates
+            + " | " + df['PASSWORD_LOGIN_COUNT'].fillna(0).astype(int).astype(str)
+            + " | " + df['RSA_LOGIN_COUNT'].fillna(0).astype(int).astype(str) + " |\n"
+        )
+        parts.extend(rows.tolist())
         
         # Recommendations
-        result += "\n### Recommendations:\n\n"
+        parts.append("\n### Recommendations:\n\n")
         
         if password_only > 0:
-            result += "**High Priority - Password-Only Users:**\n"
+            parts.append("**High Priority - Password-Only Users:**\n")
             password_only_users = df[df['AUTH_STATUS'] == 'Password Only']['USER_NAME'].tolist()
             for user in password_only_users[:10]:  # Show first 10
-                result += f"- {user}: Migrate to RSA key authentication\n"
+                parts.append(f"- {user}: Migrate to RSA key authentication\n")
             if len(password_only_users) > 10:
-                result += f"- ... and {len(password_only_users) - 10} more users\n"
-            result += "\n"
+                parts.append(f"- ... and {len(password_only_users) - 10} more users\n")
+            parts.append("\n")
         
         if both_active > 0:
-            result += "**Medium Priority - Both Methods Active:**\n"
-            result += "- Consider disabling password authentication for users who have successfully adopted RSA\n"
-            result += "- Monitor these users to ensure smooth transition to RSA-only\n\n"
+            parts.append("**Medium Priority - Both Methods Active:**\n")
+            parts.append("- Consider disabling password authentication for users who have successfully adopted RSA\n")
+            parts.append("- Monitor these users to ensure smooth transition to RSA-only\n\n")
         
-        result += "**General Security Best Practices:**\n"
-        result += "- Enforce RSA key authentication for all production users\n"
-        result += "- Set up alerts for password-based login attempts\n"
-        result += "- Regular security audits of authentication methods\n"
-        result += "- Consider implementing MFA for additional security\n"
+        parts.append("**General Security Best Practices:**\n")
+        parts.append("- Enforce RSA key authentication for all production users\n")
+        parts.append("- Set up alerts for password-based login attempts\n")
+        parts.append("- Regular security audits of authentication methods\n")
+        parts.append("- Consider implementing MFA for additional security\n")
         
-        return result
+        return "".join(parts)
         
     except Exception as e:
         return f"Error analyzing user authentication: {str(e)}"
 
+@ttl_cache()
 def audit_privilege_changes(days_back: int = 7, role_filter: str = None) -> str:
     """
     Track privilege and role changes in the account.
@@ -179,9 +224,11 @@ def audit_privilege_changes(days_back: int = 7, role_filter: str = None) -> str:
         Analysis of privilege changes and potential security concerns
     """
     try:
+        params = {'days_back': days_back, 'sensitive_roles': list(_SENSITIVE_ROLES)}
         role_condition = ""
         if role_filter:
-            role_condition = f"AND (ROLE = '{role_filter.upper()}' OR NAME = '{role_filter.upper()}')"
+            params['role'] = role_filter.upper()
+            role_condition = "AND (ROLE = %(role)s OR NAME = %(role)s)"
         
         # Query for grant history
         query = f"""
@@ -196,7 +243,7 @@ def audit_privilege_changes(days_back: int = 7, role_filter: str = None) -> str:
                 CREATED_ON as EVENT_TIME,
                 'GRANT' as ACTION
             FROM SNOWFLAKE.ACCOUNT_USAGE.GRANTS_TO_USERS
-            WHERE CREATED_ON >= DATEADD(day, -{days_back}, CURRENT_TIMESTAMP())
+            WHERE CREATED_ON >= DATEADD(day, -%(days_back)s, CURRENT_TIMESTAMP())
                 AND DELETED_ON IS NULL
                 {role_condition}
             
@@ -212,7 +259,7 @@ def audit_privilege_changes(days_back: int = 7, role_filter: str = None) -> str:
                 DELETED_ON as EVENT_TIME,
                 'REVOKE' as ACTION
             FROM SNOWFLAKE.ACCOUNT_USAGE.GRANTS_TO_USERS
-            WHERE DELETED_ON >= DATEADD(day, -{days_back}, CURRENT_TIMESTAMP())
+            WHERE DELETED_ON >= DATEADD(day, -%(days_back)s, CURRENT_TIMESTAMP())
                 AND DELETED_ON IS NOT NULL
                 {role_condition}
             
@@ -228,104 +275,137 @@ def audit_privilege_changes(days_back: int = 7, role_filter: str = None) -> str:
                 CREATED_ON as EVENT_TIME,
                 'GRANT' as ACTION
             FROM SNOWFLAKE.ACCOUNT_USAGE.GRANTS_TO_ROLES
-            WHERE CREATED_ON >= DATEADD(day, -{days_back}, CURRENT_TIMESTAMP())
+            WHERE CREATED_ON >= DATEADD(day, -%(days_back)s, CURRENT_TIMESTAMP())
                 AND DELETED_ON IS NULL
                 AND PRIVILEGE IN ('CREATE', 'OWNERSHIP', 'MANAGE GRANTS', 'IMPORTED PRIVILEGES')
         )
+        -- Recent or sensitive events carry the audit totals; users with many changes get a rollup row
         SELECT 
+            'EVENT' as ROW_KIND,
             EVENT_TIME,
             ACTION,
             GRANTEE_TYPE,
             GRANTEE_NAME,
             GRANTED_OBJECT,
             OBJECT_TYPE,
-            GRANTED_BY
+            GRANTED_BY,
+            ROW_NUMBER() OVER (ORDER BY EVENT_TIME DESC) as RECENT_RANK,
+            UPPER(GRANTED_OBJECT) IN (%(sensitive_roles)s) as IS_SENSITIVE_ROLE,
+            COUNT(*) OVER () as TOTAL_CHANGES,
+            COUNT_IF(ACTION = 'GRANT') OVER () as GRANT_COUNT,
+            COUNT_IF(ACTION = 'REVOKE') OVER () as REVOKE_COUNT,
+            COUNT(DISTINCT GRANTEE_NAME) OVER () as UNIQUE_GRANTEES,
+            COUNT(DISTINCT GRANTED_BY) OVER () as UNIQUE_GRANTORS,
+            NULL as GRANTEE_CHANGES
+        FROM grant_events
+        QUALIFY RECENT_RANK <= 20 OR IS_SENSITIVE_ROLE
+        
+        UNION ALL
+        
+        SELECT 
+            'RAPID' as ROW_KIND,
+            NULL, NULL, GRANTEE_TYPE, GRANTEE_NAME, NULL, NULL, NULL, NULL, NULL,
+            NULL, NULL, NULL, NULL, NULL,
+            COUNT(*) as GRANTEE_CHANGES
         FROM grant_events
-        ORDER BY EVENT_TIME DESC
+        WHERE GRANTEE_TYPE = 'USER'
+        GROUP BY GRANTEE_TYPE, GRANTEE_NAME
+        HAVING COUNT(*) > 3
+        
+        ORDER BY ROW_KIND, EVENT_TIME DESC, GRANTEE_NAME
         """
         
-        df = snowflake_conn.execute_query(query)
+        df = snowflake_conn.execute_query(query, params)
+        events = df[df['ROW_KIND'] == 'EVENT']
         
-        if df.empty:
+        if events.empty:
             return f"No privilege changes found in the last {days_back} days."
         
-        result = f"## Privilege Change Audit (Last {days_back} Days)\n\n"
+        parts = [f"## Privilege Change Audit (Last {days_back} Days)\n\n"]
         
-        # Summary
-        total_changes = len(df)
-        grants = len(df[df['ACTION'] == 'GRANT'])
-        revokes = len(df[df['ACTION'] == 'REVOKE'])
-        unique_grantees = df['GRANTEE_NAME'].nunique()
-        unique_grantors = df['GRANTED_BY'].nunique()
+        # Summary, computed by the query's window aggregates
+        summary = events.iloc[0]
+        total_changes = int(summary['TOTAL_CHANGES'])
+        grants = int(summary['GRANT_COUNT'])
+        revokes = int(summary['REVOKE_COUNT'])
+        unique_grantees = int(summary['UNIQUE_GRANTEES'])
+        unique_grantors = int(summary['UNIQUE_GRANTORS'])
         
-        result += "### Summary:\n"
-        result += f"- Total Changes: {total_changes}\n"
-        result += f"- Grants: {grants}\n"
-        result += f"- Revokes: {revokes}\n"
-        result += f"- Unique Grantees: {unique_grantees}\n"
-        result += f"- Unique Grantors: {unique_grantors}\n\n"
+        parts.append("### Summary:\n")
+        parts.append(f"- Total Changes: {total_changes}\n")
+        parts.append(f"- Grants: {grants}\n")
+        parts.append(f"- Revokes: {revokes}\n")
+        parts.append(f"- Unique Grantees: {unique_grantees}\n")
+        parts.append(f"- Unique Grantors: {unique_grantors}\n\n")
         
         # Check for sensitive role grants
-        sensitive_roles = ['ACCOUNTADMIN', 'SECURITYADMIN', 'SYSADMIN']
-        sensitive_grants = df[df['GRANTED_OBJECT'].str.upper().isin(sensitive_roles)]
+        sensitive_grants = events[events['IS_SENSITIVE_ROLE'].astype(bool)]
         
         if not sensitive_grants.empty:
-            result += "### ⚠️ Sensitive Role Assignments:\n\n"
-            for _, row in sensitive_grants.iterrows():
-                result += f"- {row['ACTION']}: **{row['GRANTED_OBJECT']}** to {row['GRANTEE_TYPE']} "
-                result += f"'{row['GRANTEE_NAME']}' by {row['GRANTED_BY']} "
-                result += f"on {row['EVENT_TIME'].strftime('%Y-%m-%d %H:%M')}\n"
-            result += "\n"
+            parts.append("### ⚠️ Sensitive Role Assignments:\n\n")
+            for row in sensitive_grants.to_dict('records'):
+                parts.append(f"- {row['ACTION']}: **{row['GRANTED_OBJECT']}** to {row['GRANTEE_TYPE']} ")
+                parts.append(f"'{row['GRANTEE_NAME']}' by {row['GRANTED_BY']} ")
+                parts.append(f"on {row['EVENT_TIME'].strftime('%Y-%m-%d %H:%M')}\n")
+            parts.append("\n")
         
         # Recent changes table
-        result += "### Recent Privilege Changes:\n\n"
-        result += "| Time | Action | Grantee | Object | Granted By |\n"
-        result += "|------|--------|---------|--------|------------|\n"
-        
-        for _, row in df.head(20).iterrows():
-            time_str = row['EVENT_TIME'].strftime('%Y-%m-%d %H:%M')
-            action = row['ACTION']
-            grantee = f"{row['GRANTEE_TYPE']}: {row['GRANTEE_NAME']}"
-            obj = row['GRANTED_OBJECT'][:50] + '...' if len(row['GRANTED_OBJECT']) > 50 else row['GRANTED_OBJECT']
-            
-            # Highlight sensitive changes
-            if any(role in row['GRANTED_OBJECT'].upper() for role in sensitive_roles):
-                action = f"**{action}**"
-                obj = f"**{obj}**"
-            
-            result += f"| {time_str} | {action} | {grantee} | {obj} | {row['GRANTED_BY']} |\n"
+        parts.append("### Recent Privilege Changes:\n\n")
+        parts.append("| Time | Action | Grantee | Object | Granted By |\n")
+        parts.append("|------|--------|---------|--------|------------|\n")
+        
+        recent = events[events['RECENT_RANK'] <= 20]
+        objects = recent['GRANTED_OBJECT'].astype(str)
+        short_objects = objects.str.slice(0, 50)
+        short_objects = short_objects.where(objects.str.len() <= 50, short_objects + '...')
+        actions = recent['ACTION'].astype(str)
+        
+        # Highlight sensitive changes, using the query's exact-match flag so the table
+        # and the sensitive assignments section agree
+        is_sensitive = recent['IS_SENSITIVE_ROLE'].astype(bool)
+        actions = actions.where(~is_sensitive, "**" + actions + "**")
+        short_objects = short_objects.where(~is_sensitive, "**" + short_objects + "**")
+        
+        rows = (
+            "| " + pd.to_datetime(recent['EVENT_TIME']).dt.strftime('%Y-%m-%d %H:%M')
+            + " | " + actions
+            + " | " + recent['GRANTEE_TYPE'].astype(str) + ": " + recent['GRANTEE_NAME'].astype(str)
+            + " | " + short_objects
+            + " | " + recent['GRANTED_BY'].astype(str) + " |\n"
+        )
+        parts.extend(rows.tolist())
         
-        if len(df) > 20:
-            result += f"\n*Showing 20 of {len(df)} total changes*\n"
+        if total_changes > 20:
+            parts.append(f"\n*Showing 20 of {total_changes} total changes*\n")
         
         # Analysis
-        result += "\n### Security Analysis:\n\n"
+        parts.append("\n### Security Analysis:\n\n")
         
         # Check for unusual patterns
         if unique_grantors == 1:
-            result += f"- All grants made by single user: {df['GRANTED_BY'].iloc[0]}\n"
+            parts.append(f"- All grants made by single user: {summary['GRANTED_BY']}\n")
         
         # Check for rapid privilege escalation
-        user_grants = df[df['GRANTEE_TYPE'] == 'USER'].groupby('GRANTEE_NAME').size()
-        rapid_grants = user_grants[user_grants > 3]
+        rapid_grants = df[df['ROW_KIND'] == 'RAPID']
         if not rapid_grants.empty:
-            result += f"- Rapid privilege accumulation detected for {len(rapid_grants)} users\n"
-            for user, count in rapid_grants.items():
-                result += f"  - {user}: {count} new privileges\n"
+            parts.append(f"- Rapid privilege accumulation detected for {len(rapid_grants)} users\n")
+            for user, count in zip(rapid_grants['GRANTEE_NAME'], rapid_grants['GRANTEE_CHANGES']):
+                parts.append(f"  - {user}: {int(count)} new privileges\n")
         
         # Recommendations
-        result += "\n### Recommendations:\n"
-        result += "- Review all sensitive role assignments (ACCOUNTADMIN, SECURITYADMIN)\n"
-        result += "- Implement approval workflow for privilege changes\n"
-        result += "- Set up alerts for unauthorized privilege escalation\n"
-        result += "- Regular audit of user privileges and role memberships\n"
-        result += "- Follow principle of least privilege\n"
+        parts.append("\n### Recommendations:\n")
+        parts.append("- Review all sensitive role assignments (ACCOUNTADMIN, SECURITYADMIN)\n")
+        parts.append("- Implement approval workflow for privilege changes\n")
+        parts.append("- Set up alerts for unauthorized privilege escalation\n")
+        parts.append("- Regular audit of user privileges and role memberships\n")
+        parts.append("- Follow principle of least privilege\n")
         
-        return result
+        return "".join(parts)
         
     except Exception as e:
         return f"Error auditing privilege changes: {str(e)}"
 
+@ttl_cache()
 def detect_unusual_access_patterns(days_back: int = 7, sensitivity_level: str = "medium") -> str:
     """
     Identify unusual data access patterns that might indicate security issues.
@@ -339,16 +419,10 @@ def detect_unusual_access_patterns(days_back: int = 7, sensitivity_level: str =
     """
     try:
         # Set thresholds based on sensitivity
-        thresholds = {
-            'low': {'hour_threshold': 2, 'volume_multiplier': 10, 'new_object_days': 90},
-            'medium': {'hour_threshold': 4, 'volume_multiplier': 5, 'new_object_days': 30},
-            'high': {'hour_threshold': 8, 'volume_multiplier': 3, 'new_object_days': 7}
-        }
-        
-        config = thresholds.get(sensitivity_level, thresholds['medium'])
+        config = _SENSITIVITY_THRESHOLDS.get(sensitivity_level, _SENSITIVITY_THRESHOLDS['medium'])
         
         # Query for access patterns
-        query = f"""
+        query = """
         WITH user_access_stats AS (
             -- Get user access patterns
             SELECT 
@@ -360,7 +434,7 @@ def detect_unusual_access_patterns(days_back: int = 7, sensitivity_level: str =
                 SUM(ROWS_PRODUCED) as TOTAL_ROWS,
                 COUNT(DISTINCT DATABASE_NAME) as DATABASES_ACCESSED
             FROM SNOWFLAKE.ACCOUNT_USAGE.ACCESS_HISTORY
-            WHERE QUERY_START_TIME >= DATEADD(day, -{days_back}, CURRENT_TIMESTAMP())
+            WHERE QUERY_START_TIME >= DATEADD(day, -%(days_back)s, CURRENT_TIMESTAMP())
             GROUP BY USER_NAME, DATE(QUERY_START_TIME), HOUR(QUERY_START_TIME)
         ),
         user_baseline AS (
@@ -388,8 +462,8 @@ def detect_unusual_access_patterns(days_back: int = 7, sensitivity_level: str =
                 b.AVG_ROWS,
                 CASE 
                     WHEN s.ACCESS_HOUR < 6 OR s.ACCESS_HOUR > 22 THEN 'Unusual Hours'
-                    WHEN s.QUERY_COUNT > b.AVG_QUERIES + ({config['volume_multiplier']} * b.STDDEV_QUERIES) THEN 'High Query Volume'
-                    WHEN s.TOTAL_ROWS > b.AVG_ROWS * {config['volume_multiplier']} THEN 'High Data Volume'
+                    WHEN s.QUERY_COUNT > b.AVG_QUERIES + (%(volume_multiplier)s * b.STDDEV_QUERIES) THEN 'High Query Volume'
+                    WHEN s.TOTAL_ROWS > b.AVG_ROWS * %(volume_multiplier)s THEN 'High Data Volume'
                     WHEN s.DATABASES_ACCESSED > 3 THEN 'Multiple Database Access'
                     ELSE 'Normal'
                 END as ANOMALY_TYPE
@@ -404,13 +478,19 @@ def detect_unusual_access_patterns(days_back: int = 7, sensitivity_level: str =
                 ah.QUERY_START_TIME,
                 t.CREATED as OBJECT_CREATED
             FROM SNOWFLAKE.ACCOUNT_USAGE.ACCESS_HISTORY ah
-            JOIN SNOWFLAKE.ACCOUNT_USAGE.TABLES t 
-                ON ah.OBJECT_NAME = t.TABLE_CATALOG || '.' || t.TABLE_SCHEMA || '.' || t.TABLE_NAME
-            WHERE ah.QUERY_START_TIME >= DATEADD(day, -{days_back}, CURRENT_TIMESTAMP())
-                AND t.CREATED >= DATEADD(day, -{config['new_object_days']}, CURRENT_TIMESTAMP())
-                AND ah.QUERY_START_TIME < DATEADD(hour, {config['hour_threshold']}, t.CREATED)
-        )
-        SELECT * FROM (
+            -- Narrow TABLES to recently created objects before joining on the qualified name
+            JOIN (
+                SELECT 
+                    TABLE_CATALOG || '.' || TABLE_SCHEMA || '.' || TABLE_NAME as FULL_NAME,
+                    CREATED
+                FROM SNOWFLAKE.ACCOUNT_USAGE.TABLES
+                WHERE CREATED >= DATEADD(day, -%(new_object_days)s, CURRENT_TIMESTAMP())
+            ) t 
+                ON ah.OBJECT_NAME = t.FULL_NAME
+            WHERE ah.QUERY_START_TIME >= DATEADD(day, -%(days_back)s, CURRENT_TIMESTAMP())
+                AND ah.QUERY_START_TIME < DATEADD(hour, %(hour_threshold)s, t.CREATED)
+        ),
+        flagged AS (
             SELECT 
                 USER_NAME,
                 ACCESS_DATE,
@@ -436,88 +516,130 @@ def detect_unusual_access_patterns(days_back: int = 7, sensitivity_level: str =
                 1 as DATABASES_ACCESSED
             FROM new_object_access
         )
-        ORDER BY ACCESS_DATE DESC, USER_NAME
+        -- Occurrence counts per user and anomaly type, plus only the 20 most recent anomalies
+        SELECT 
+            'ROLLUP' as ROW_KIND,
+            USER_NAME,
+            NULL as ACCESS_DATE,
+            0 as ACCESS_HOUR,
+            ANOMALY_TYPE,
+            COUNT(*) as OCCURRENCE_COUNT,
+            0 as QUERY_COUNT,
+            0 as OBJECTS_ACCESSED,
+            0 as TOTAL_ROWS,
+            0 as DATABASES_ACCESSED
+        FROM flagged
+        GROUP BY USER_NAME, ANOMALY_TYPE
+        
+        UNION ALL
+        
+        SELECT * FROM (
+            SELECT 
+                'RECENT' as ROW_KIND,
+                USER_NAME,
+                ACCESS_DATE,
+                ACCESS_HOUR,
+                ANOMALY_TYPE,
+                1 as OCCURRENCE_COUNT,
+                QUERY_COUNT,
+                OBJECTS_ACCESSED,
+                TOTAL_ROWS,
+                DATABASES_ACCESSED
+            FROM flagged
+            QUALIFY ROW_NUMBER() OVER (ORDER BY ACCESS_DATE DESC, USER_NAME) <= 20
+        )
+        ORDER BY ROW_KIND, ACCESS_DATE DESC, USER_NAME, OCCURRENCE_COUNT DESC, ANOMALY_TYPE
         """
         
-        df = snowflake_conn.execute_query(query)
+        df = snowflake_conn.execute_query(query, {'days_back': days_back, **config})
+        
+        parts = [f"## Unusual Access Pattern Detection (Last {days_back} Days)\n"]
+        parts.append(f"**Sensitivity Level:** {sensitivity_level.capitalize()}\n\n")
         
-        result = f"## Unusual Access Pattern Detection (Last {days_back} Days)\n"
-        result += f"**Sensitivity Level:** {sensitivity_level.capitalize()}\n\n"
+        # Split the per-user rollup from the recent anomaly rows once
+        is_rollup = df['ROW_KIND'] == 'ROLLUP'
+        user_anomalies = df.loc[is_rollup, ['USER_NAME', 'ANOMALY_TYPE', 'OCCURRENCE_COUNT']]
+        recent = df[~is_rollup]
         
-        if df.empty:
-            result += "No unusual access patterns detected with current sensitivity settings.\n"
-            return result
+        total_anomalies = int(user_anomalies['OCCURRENCE_COUNT'].sum())
+        if total_anomalies == 0:
+            parts.append("No unusual access patterns detected with current sensitivity settings.\n")
+            return "".join(parts)
         
         # Summary of anomalies
-        anomaly_counts = df['ANOMALY_TYPE'].value_counts()
-        unique_users = df['USER_NAME'].nunique()
+        anomaly_counts = (
+            user_anomalies.groupby('ANOMALY_TYPE')['OCCURRENCE_COUNT'].sum()
+            .sort_values(ascending=False, kind='stable')
+        )
+        unique_users = user_anomalies['USER_NAME'].nunique()
         
-        result += "### Summary:\n"
-        result += f"- Total Anomalies Detected: {len(df)}\n"
-        result += f"- Affected Users: {unique_users}\n\n"
+        parts.append("### Summary:\n")
+        parts.append(f"- Total Anomalies Detected: {total_anomalies}\n")
+        parts.append(f"- Affected Users: {unique_users}\n\n")
         
-        result += "### Anomaly Breakdown:\n"
+        parts.append("### Anomaly Breakdown:\n")
         for anomaly_type, count in anomaly_counts.items():
-            emoji = {
-                'Unusual Hours': '🌙',
-                'High Query Volume': '📊',
-                'High Data Volume': '💾',
-                'Multiple Database Access': '🗄️',
-                'New Object Access': '🆕'
-            }.get(anomaly_type, '❓')
-            result += f"- {emoji} {anomaly_type}: {count} occurrences\n"
-        
-        result += "\n### Detailed Findings:\n\n"
+            emoji = _ANOMALY_EMOJI.get(anomaly_type, '❓')
+            parts.append(f"- {emoji} {anomaly_type}: {count} occurrences\n")
         
-        # Group by user and anomaly type
-        user_anomalies = df.groupby(['USER_NAME', 'ANOMALY_TYPE']).size().reset_index(name='OCCURRENCE_COUNT')
+        parts.append("\n### Detailed Findings:\n\n")
         
         # Highlight high-risk users
         high_risk_users = user_anomalies.groupby('USER_NAME').size()
         high_risk_users = high_risk_users[high_risk_users >= 3].index.tolist()
         
         if high_risk_users:
-            result += f"#### ⚠️ High Risk Users (3+ anomaly types):\n"
-            for user in high_risk_users:
-                user_data = df[df['USER_NAME'] == user]
-                result += f"\n**{user}:**\n"
-                for anomaly in user_data['ANOMALY_TYPE'].unique():
-                    count = len(user_data[user_data['ANOMALY_TYPE'] == anomaly])
-                    result += f"- {anomaly}: {count} occurrences\n"
+            parts.append(f"#### ⚠️ High Risk Users (3+ anomaly types):\n")
+            # Per-type counts come straight from the rollup rows
+            high_risk_rows = user_anomalies[user_anomalies['USER_NAME'].isin(high_risk_users)]
+            for user, user_rows in high_risk_rows.groupby('USER_NAME'):
+                parts.append(f"\n**{user}:**\n")
+                for anomaly, count in zip(user_rows['ANOMALY_TYPE'], user_rows['OCCURRENCE_COUNT']):
+                    parts.append(f"- {anomaly}: {count} occurrences\n")
         
         # Recent anomalies table
-        result += "\n#### Recent Anomalies:\n\n"
-        result += "| Date | User | Anomaly Type | Details |\n"
-        result += "|------|------|--------------|----------|\n"
+        parts.append("\n#### Recent Anomalies:\n\n")
+        parts.append("| Date | User | Anomaly Type | Details |\n")
+        parts.append("|------|------|--------------|----------|\n")
+        
+        anomaly_types = recent['ANOMALY_TYPE'].astype(str)
+        details = np.select(
+            [
+                anomaly_types == 'Unusual Hours',
+                anomaly_types == 'High Query Volume',
+                anomaly_types == 'High Data Volume',
+                anomaly_types == 'Multiple Database Access'
+            ],
+            [
+                recent['ACCESS_HOUR'].map('Hour: {:02d}:00'.format),
+                recent['QUERY_COUNT'].map('Queries: {}'.format),
+                recent['TOTAL_ROWS'].fillna(0).map('Rows: {:,.0f}'.format),
+                recent['DATABASES_ACCESSED'].map('DBs: {}'.format)
+            ],
+            default=''
+        )
         
-        for _, row in df.head(20).iterrows():
-            date_str = row['ACCESS_DATE'].strftime('%Y-%m-%d')
-            details = ""
-            
-            if row['ANOMALY_TYPE'] == 'Unusual Hours':
-                details = f"Hour: {row['ACCESS_HOUR']:02d}:00"
-            elif row['ANOMALY_TYPE'] == 'High Query Volume':
-                details = f"Queries: {row['QUERY_COUNT']}"
-            elif row['ANOMALY_TYPE'] == 'High Data Volume':
-                details = f"Rows: {row['TOTAL_ROWS']:,}"
-            elif row['ANOMALY_TYPE'] == 'Multiple Database Access':
-                details = f"DBs: {row['DATABASES_ACCESSED']}"
-            
-            result += f"| {date_str} | {row['USER_NAME']} | {row['ANOMALY_TYPE']} | {details} |\n"
+        rows = (
+            "| " + pd.to_datetime(recent['ACCESS_DATE']).dt.strftime('%Y-%m-%d')
+            + " | " + recent['USER_NAME'].astype(str)
+            + " | " + anomaly_types
+            + " | " + pd.Series(details, index=recent.index) + " |\n"
+        )
+        parts.extend(rows.tolist())
         
-        if len(df) > 20:
-            result += f"\n*Showing 20 of {len(df)} total anomalies*\n"
+        if total_anomalies > 20:
+            parts.append(f"\n*Showing 20 of {total_anomalies} total anomalies*\n")
         
         # Recommendations
-        result += "\n### Recommendations:\n"
-        result += "- Investigate high-risk users with multiple anomaly types\n"
-        result += "- Review access patterns during unusual hours\n"
-        result += "- Set up real-time alerts for anomalous behavior\n"
-        result += "- Implement data access monitoring dashboards\n"
-        result += "- Consider implementing row access policies for sensitive data\n"
-        result += f"- Adjust sensitivity level (current: {sensitivity_level}) based on false positive rate\n"
-        
-        return result
+        parts.append("\n### Recommendations:\n")
+        parts.append("- Investigate high-risk users with multiple anomaly types\n")
+        parts.append("- Review access patterns during unusual hours\n")
+        parts.append("- Set up real-time alerts for anomalous behavior\n")
+        parts.append("- Implement data access monitoring dashboards\n")
+        parts.append("- Consider implementing row access policies for sensitive data\n")
+        parts.append(f"- Adjust sensitivity level (current: {sensitivity_level}) based on false positive rate\n")
+        
+        return "".join(parts)
         
     except Exception as e:
         return f"Error detecting unusual access patterns: {str(e)}"
\ No newline at end of file
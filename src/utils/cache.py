@@ -0,0 +1,109 @@
+"""
+TTL caching helpers for analysis results
+
+ACCOUNT_USAGE views lag by 45 minutes to 3 hours, so results for identical
+arguments stay valid for several minutes and can be served from memory.
+"""
+
+import hashlib
+import threading
+from functools import wraps
+
+from cachetools import TTLCache
+
+from utils.envs import envs
+
+# Raw query results are reused for an hour unless ACCOUNT_USAGE_LATENCY_SECONDS says otherwise
+DEFAULT_ACCOUNT_USAGE_LATENCY_SECONDS = 3600
+
+_MISSING = object()
+
+# Every cache created by ttl_cache, so they can be flushed together on account switch
+_registered_caches = []
+
+def caching_enabled() -> bool:
+    """Check the CACHE_RESULTS setting (default: true)"""
+    return envs.CACHE_RESULTS
+
+def _freeze(value):
+    """Convert list/dict arguments into hashable equivalents for use in cache keys"""
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(v) for v in value)
+    if isinstance(value, dict):
+        return tuple(sorted((k, _freeze(v)) for k, v in value.items()))
+    return value
+
+class UncachedResult(str):
+    """
+    A tool result that is returned as usual but must not be cached.
+    
+    Reports that render a placeholder for a failed section return their text wrapped
+    in this class, so the degraded report is retried instead of served for ttl_seconds.
+    """
+
+def _is_error(result) -> bool:
+    """Tools report failures as strings; those should be retried, not cached"""
+    if isinstance(result, UncachedResult):
+        return True
+    return isinstance(result, str) and result.startswith(('Error', '❌'))
+
+def ttl_cache(ttl_seconds: int = 600, maxsize: int = 256):
+    """
+    Cache a function's results for ttl_seconds, keyed by its name and arguments.
+
+    Args:
+        ttl_seconds: How long a cached result stays valid (default: 600)
+        maxsize: Maximum number of cached results (default: 256)
+
+    Returns:
+        Decorator exposing cache_clear() on the wrapped function
+    """
+    def decorator(func):
+        cache = TTLCache(maxsize=maxsize, ttl=ttl_seconds)
+        lock = threading.Lock()
+        _registered_caches.append((cache, lock))
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if not caching_enabled():
+                return func(*args, **kwargs)
+
+            key = (func.__name__, _freeze(args), _freeze(kwargs))
+            with lock:
+                cached = cache.get(key, _MISSING)
+            if cached is not _MISSING:
+                return cached
+
+            result = func(*args, **kwargs)
+            if not _is_error(result):
+                with lock:
+                    cache[key] = result
+            return result
+
+        def cache_clear():
+            with lock:
+                cache.clear()
+
+        wrapper.cache_clear = cache_clear
+        return wrapper
+    return decorator
+
+def clear_all_caches():
+    """Drop every cached result, e.g. after switching Snowflake accounts"""
+    for cache, lock in _registered_caches:
+        with lock:
+            cache.clear()
+
+def account_usage_latency_seconds() -> int:
+    """How long raw query results stay valid, from ACCOUNT_USAGE_LATENCY_SECONDS (default: 3600)"""
+    return envs.ACCOUNT_USAGE_LATENCY_SECONDS or DEFAULT_ACCOUNT_USAGE_LATENCY_SECONDS
+
+def is_cacheable_query(query: str) -> bool:
+    """Only read-only statements may be answered from the result cache"""
+    return caching_enabled() and query.lstrip().upper().startswith(('SELECT', 'WITH'))
+
+def result_cache_key(query: str, params=None, *extra) -> str:
+    """Hash a statement, its bind parameters and any extra qualifiers into a cache key"""
+    normalized = query.strip().rstrip(';').rstrip()
+    material = repr((normalized, _freeze(params), extra))
+    return hashlib.sha256(material.encode('utf-8')).hexdigest()
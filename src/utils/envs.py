@@ -0,0 +1,92 @@
+"""
+Cached access to the server's environment settings
+
+Each setting is read from the environment on first use and kept, so connection
+setup and per-tool credit price lookups do not re-read and re-parse os.environ.
+Numeric settings that can be read at import time are validated here and come back
+as None when malformed, so callers fall back to their defaults instead of failing.
+"""
+
+import os
+from functools import cached_property
+from typing import Optional
+
+def _positive_int(value: Optional[str]) -> Optional[int]:
+    """Parse a positive integer setting, or None when it is unset or malformed"""
+    try:
+        number = int(value)
+    except (TypeError, ValueError):
+        return None
+    return number if number > 0 else None
+
+def _flag(value: Optional[str], default: bool) -> bool:
+    """Parse a true/false setting"""
+    if value is None:
+        return default
+    return value.strip().lower() == 'true'
+
+class Envs:
+    """Lazily read, cached SNOWFLAKE_* environment settings"""
+
+    @cached_property
+    def SNOWFLAKE_ACCOUNT(self) -> Optional[str]:
+        return os.getenv('SNOWFLAKE_ACCOUNT')
+
+    @cached_property
+    def SNOWFLAKE_USER(self) -> Optional[str]:
+        return os.getenv('SNOWFLAKE_USER')
+
+    @cached_property
+    def SNOWFLAKE_PASSWORD(self) -> Optional[str]:
+        return os.getenv('SNOWFLAKE_PASSWORD')
+
+    @cached_property
+    def SNOWFLAKE_WAREHOUSE(self) -> str:
+        return os.getenv('SNOWFLAKE_WAREHOUSE') or 'COMPUTE_WH'
+
+    @cached_property
+    def SNOWFLAKE_ROLE(self) -> str:
+        return os.getenv('SNOWFLAKE_ROLE', 'ACCOUNTADMIN')
+
+    @cached_property
+    def SNOWFLAKE_PRIVATE_KEY_PATH(self) -> Optional[str]:
+        return os.getenv('SNOWFLAKE_PRIVATE_KEY_PATH')
+
+    @cached_property
+    def SNOWFLAKE_PRIVATE_KEY_PASSPHRASE(self) -> Optional[str]:
+        return os.getenv('SNOWFLAKE_PRIVATE_KEY_PASSPHRASE')
+
+    @cached_property
+    def SNOWFLAKE_CREDIT_PRICE(self) -> float:
+        return float(os.getenv('SNOWFLAKE_CREDIT_PRICE', '4.00'))
+
+    @cached_property
+    def SNOWFLAKE_FORCE_RESULT_CACHE(self) -> bool:
+        return _flag(os.getenv('SNOWFLAKE_FORCE_RESULT_CACHE'), False)
+
+    @cached_property
+    def SNOWFLAKE_POOL_SIZE(self) -> Optional[int]:
+        return _positive_int(os.getenv('SNOWFLAKE_POOL_SIZE'))
+
+    @cached_property
+    def SNOWFLAKE_ROLLUP_SCHEMA(self) -> Optional[str]:
+        return os.getenv('SNOWFLAKE_ROLLUP_SCHEMA', '').strip() or None
+
+    @cached_property
+    def CACHE_RESULTS(self) -> bool:
+        return _flag(os.getenv('CACHE_RESULTS'), True)
+
+    @cached_property
+    def ACCOUNT_USAGE_LATENCY_SECONDS(self) -> Optional[int]:
+        return _positive_int(os.getenv('ACCOUNT_USAGE_LATENCY_SECONDS'))
+
+    @cached_property
+    def QUERY_TIMEOUT_SECONDS(self) -> Optional[int]:
+        return _positive_int(os.getenv('QUERY_TIMEOUT_SECONDS'))
+
+    def refresh(self, *names: str):
+        """Forget cached settings (all of them when no names are given) so they are re-read"""
+        for name in names or list(self.__dict__):
+            self.__dict__.pop(name, None)
+
+envs = Envs()
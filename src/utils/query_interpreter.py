@@ -5,6 +5,59 @@ Query result interpretation helper for AI-powered analysis
 import pandas as pd
 from typing import List, Dict, Any
 
+def _summarize_authentication(df: pd.DataFrame, cols: set) -> List[str]:
+    """Unique users and authentication factor mix"""
+    lines = []
+    if 'USER_NAME' in cols:
+        lines.append(f"Found {df['USER_NAME'].nunique()} unique users")
+    if 'FIRST_AUTHENTICATION_FACTOR' in cols:
+        auth_methods = df['FIRST_AUTHENTICATION_FACTOR'].value_counts()
+        lines.append(f"Authentication methods: {dict(auth_methods)}")
+    return lines
+
+def _summarize_performance(df: pd.DataFrame, cols: set) -> List[str]:
+    """Execution time statistics and warehouses involved"""
+    lines = []
+    if 'EXECUTION_TIME' in cols:
+        exec_time_sec = df['EXECUTION_TIME'] / 1000  # Convert to seconds
+        lines.append(f"Average execution: {exec_time_sec.mean():.2f}s")
+        lines.append(f"Max execution: {exec_time_sec.max():.2f}s")
+    if 'WAREHOUSE_NAME' in cols:
+        lines.append(f"Warehouses involved: {df['WAREHOUSE_NAME'].nunique()}")
+    return lines
+
+def _summarize_cost(df: pd.DataFrame, cols: set) -> List[str]:
+    """Total credits and the highest consuming warehouse"""
+    lines = []
+    if 'CREDITS_USED' in cols:
+        total_credits = df['CREDITS_USED'].sum()
+        lines.append(f"Total credits: {total_credits:.2f}")
+        if 'WAREHOUSE_NAME' in cols:
+            top_warehouse = df.groupby('WAREHOUSE_NAME')['CREDITS_USED'].sum().idxmax()
+            lines.append(f"Highest consumer: {top_warehouse}")
+    return lines
+
+def _summarize_security(df: pd.DataFrame, cols: set) -> List[str]:
+    """Affected grantees and grant/revoke counts"""
+    lines = []
+    if 'GRANTEE_NAME' in cols:
+        lines.append(f"Users/roles affected: {df['GRANTEE_NAME'].nunique()}")
+    if 'ACTION' in cols:
+        action_counts = df['ACTION'].value_counts()
+        grants = int(action_counts.get('GRANT', 0))
+        revokes = int(action_counts.get('REVOKE', 0))
+        if grants or revokes:
+            lines.append(f"Grants: {grants}, Revokes: {revokes}")
+    return lines
+
+# query_type -> summary handler; each handler gets the frame and its column set
+_SUMMARY_HANDLERS = {
+    'authentication': _summarize_authentication,
+    'performance': _summarize_performance,
+    'cost': _summarize_cost,
+    'security': _summarize_security,
+}
+
 class QueryInterpreter:
     """Helper class to interpret and summarize query results"""
     
@@ -28,36 +81,9 @@ class QueryInterpreter:
         summary.append(f"Analyzed {len(df):,} records")
         
         # Type-specific summaries
-        if query_type == 'authentication':
-            if 'USER_NAME' in df.columns:
-                summary.append(f"Found {df['USER_NAME'].nunique()} unique users")
-            if 'FIRST_AUTHENTICATION_FACTOR' in df.columns:
-                auth_methods = df['FIRST_AUTHENTICATION_FACTOR'].value_counts()
-                summary.append(f"Authentication methods: {dict(auth_methods)}")
-        
-        elif query_type == 'performance':
-            if 'EXECUTION_TIME' in df.columns:
-                exec_time_sec = df['EXECUTION_TIME'] / 1000  # Convert to seconds
-                summary.append(f"Average execution: {exec_time_sec.mean():.2f}s")
-                summary.append(f"Max execution: {exec_time_sec.max():.2f}s")
-            if 'WAREHOUSE_NAME' in df.columns:
-                summary.append(f"Warehouses involved: {df['WAREHOUSE_NAME'].nunique()}")
-        
-        elif query_type == 'cost':
-            if 'CREDITS_USED' in df.columns:
-                total_credits = df['CREDITS_USED'].sum()
-                summary.append(f"Total credits: {total_credits:.2f}")
-                if 'WAREHOUSE_NAME' in df.columns:
-                    top_warehouse = df.groupby('WAREHOUSE_NAME')['CREDITS_USED'].sum().idxmax()
-                    summary.append(f"Highest consumer: {top_warehouse}")
-        
-        elif query_type == 'security':
-            if 'GRANTEE_NAME' in df.columns:
-                summary.append(f"Users/roles affected: {df['GRANTEE_NAME'].nunique()}")
-            if 'ACTION' in df.columns and df['ACTION'].isin(['GRANT', 'REVOKE']).any():
-                grants = len(df[df['ACTION'] == 'GRANT'])
-                revokes = len(df[df['ACTION'] == 'REVOKE'])
-                summary.append(f"Grants: {grants}, Revokes: {revokes}")
+        handler = _SUMMARY_HANDLERS.get(query_type)
+        if handler:
+            summary.extend(handler(df, set(df.columns)))
         
         return " | ".join(summary)
     
@@ -83,7 +109,7 @@ class QueryInterpreter:
         # Context-based suggestions
         if 'authentication' in context_lower or 'login' in context_lower:
             if 'FIRST_AUTHENTICATION_FACTOR' in df.columns:
-                if 'PASSWORD' in df['FIRST_AUTHENTICATION_FACTOR'].values:
+                if (df['FIRST_AUTHENTICATION_FACTOR'] == 'PASSWORD').any():
                     suggestions.append("Migrate password-only users to RSA key authentication")
                 if df['FIRST_AUTHENTICATION_FACTOR'].nunique() > 1:
                     suggestions.append("Standardize authentication methods across users")
@@ -91,9 +117,9 @@ class QueryInterpreter:
         if 'performance' in context_lower or 'slow' in context_lower:
             if 'EXECUTION_TIME' in df.columns:
                 slow_threshold = 60000  # 1 minute in milliseconds
-                slow_queries = df[df['EXECUTION_TIME'] > slow_threshold]
-                if not slow_queries.empty:
-                    suggestions.append(f"Optimize {len(slow_queries)} queries taking over 1 minute")
+                slow_count = int((df['EXECUTION_TIME'] > slow_threshold).sum())
+                if slow_count:
+                    suggestions.append(f"Optimize {slow_count} queries taking over 1 minute")
                     suggestions.append("Consider Query Acceleration Service for long-running queries")
         
         if 'cost' in context_lower or 'credit' in context_lower:
@@ -106,7 +132,7 @@ class QueryInterpreter:
         if 'security' in context_lower or 'access' in context_lower:
             suggestions.append("Set up alerts for privilege escalation")
             suggestions.append("Conduct regular access reviews")
-            if 'ROLE' in df.columns and 'ACCOUNTADMIN' in df['ROLE'].values:
+            if 'ROLE' in df.columns and (df['ROLE'] == 'ACCOUNTADMIN').any():
                 suggestions.append("Review ACCOUNTADMIN role assignments")
         
         # General suggestions
@@ -129,26 +155,17 @@ class QueryInterpreter:
         if df.empty:
             return "No data to display."
         
-        # Limit columns width for better display
-        pd.set_option('display.max_colwidth', 50)
-        pd.set_option('display.max_columns', 10)
+        # Limit column width and count per call rather than through global pandas options
+        display_options = {'index': False, 'max_colwidth': 50, 'max_cols': 10}
         
-        # Create display dataframe
         if len(df) > max_rows:
-            display_df = pd.concat([
-                df.head(int(max_rows/2)),
-                pd.DataFrame([['...' for _ in df.columns]], columns=df.columns),
-                df.tail(int(max_rows/2))
-            ])
-            result = f"Showing {max_rows} of {len(df)} rows (truncated):\n\n"
+            # Render head and tail in one call so they share column widths, then insert the
+            # ellipsis line between them; a '...' data row would upcast every column to object
+            half = int(max_rows / 2)
+            lines = pd.concat([df.head(half), df.tail(half)]).to_string(**display_options).split("\n")
+            lines.insert(len(lines) - half, "...")
+            parts = [f"Showing {max_rows} of {len(df)} rows (truncated):\n\n", "\n".join(lines)]
         else:
-            display_df = df
-            result = ""
-        
-        result += display_df.to_string(index=False)
-        
-        # Reset pandas options
-        pd.reset_option('display.max_colwidth')
-        pd.reset_option('display.max_columns')
+            parts = [df.to_string(**display_options)]
         
-        return result
\ No newline at end of file
+        return "".join(parts)
\ No newline at end of file
@@ -1,148 +1,534 @@
 import os
-import snowflake.connector
+import queue
+import threading
+import time
+from contextlib import contextmanager
+from functools import lru_cache
 from dotenv import load_dotenv
-from typing import Optional
+from typing import TYPE_CHECKING, Any, Dict, Iterator, List, Optional, Tuple, Union
 import pandas as pd
-from cryptography.hazmat.primitives import serialization
-from cryptography.hazmat.primitives.serialization import load_pem_private_key
+from cachetools import TTLCache
+
+from utils.envs import envs
+from utils.cache import (
+    account_usage_latency_seconds,
+    clear_all_caches,
+    is_cacheable_query,
+    result_cache_key
+)
+
+# snowflake.connector and cryptography are imported on first connect, not at module import
+if TYPE_CHECKING:
+    import pyarrow
+    import snowflake.connector
 
 load_dotenv()
 
+# The credit price is contract-level configuration and rarely changes
+CREDIT_PRICE_TTL_SECONDS = 24 * 3600
+
+# Fail fast when Snowflake is unreachable instead of waiting out the connector's
+# default login timeout (120s); query-time socket timeouts are left at their defaults
+# because ACCOUNT_USAGE queries can legitimately hold a request open for ~45s
+LOGIN_TIMEOUT_SECONDS = 5
+
+# Live connections kept per (account, user, warehouse, role), unless SNOWFLAKE_POOL_SIZE is set
+DEFAULT_POOL_SIZE = 4
+
+# cursor.description type codes for NUMBER/FLOAT and TIMESTAMP[_LTZ/_TZ/_NTZ] columns
+_FIXED_TYPE_CODE = 0
+_NUMERIC_TYPE_CODES = (_FIXED_TYPE_CODE, 1)
+_TIMESTAMP_TYPE_CODES = (4, 6, 7, 8)
+
+@lru_cache(maxsize=4)
+def _load_private_key_der(private_key_path: str, mtime_ns: int, passphrase: Optional[str] = None) -> bytes:
+    """Parse a PEM private key into DER bytes; mtime_ns in the cache key picks up rotated keys"""
+    from cryptography.hazmat.primitives import serialization
+    from cryptography.hazmat.primitives.serialization import load_pem_private_key
+    
+    with open(private_key_path, 'rb') as key_file:
+        private_key = load_pem_private_key(
+            key_file.read(),
+            password=passphrase.encode() if passphrase else None,
+        )
+    
+    # Convert to DER format for Snowflake
+    return private_key.private_bytes(
+        encoding=serialization.Encoding.DER,
+        format=serialization.PrivateFormat.PKCS8,
+        encryption_algorithm=serialization.NoEncryption()
+    )
+
+class _PooledConnection:
+    """
+    A pooled connection and the cursor reused across the queries run on it.
+    
+    Only the caller that checked the connection out uses it, so the cursor is never shared.
+    """
+
+    def __init__(self, connection: 'snowflake.connector.SnowflakeConnection'):
+        self.connection = connection
+        self.cursor = None
+
+    def get_cursor(self):
+        """Get the connection's cursor, creating it on first use or after it was closed"""
+        if self.cursor is None or self.cursor.is_closed():
+            self.cursor = self.connection.cursor()
+        return self.cursor
+
+    def close(self):
+        """Close the connection, which also closes its cursor"""
+        self.cursor = None
+        self.connection.close()
+
 class SnowflakeConnection:
-    def __init__(self):
-        self.connection = None
+    def __init__(self, pool_size: int = DEFAULT_POOL_SIZE):
+        # Idle connections and the number of open ones, per connection parameter key;
+        # a None in a pool's queue tells a waiting caller that a slot was freed
+        self.pool_size = pool_size
+        self._pools: Dict[tuple, queue.LifoQueue] = {}
+        self._pool_open: Dict[tuple, int] = {}
+        self._pool_lock = threading.Lock()
         self.dynamic_account = None
         self.dynamic_user = None
         self.dynamic_warehouse = None
         self.dynamic_role = None
+        # Resolved connection parameters; rebuilt only when set_account_parameters changes them
+        self._params_cache = None
+        # Raw query results keyed by statement hash; ACCOUNT_USAGE lags, so they stay valid for a while
+        self._result_cache = TTLCache(maxsize=256, ttl=account_usage_latency_seconds())
+        self._result_cache_lock = threading.Lock()
+        self._credit_price_expires = 0.0
 
     def _load_private_key(self, private_key_path: str, passphrase: Optional[str] = None):
-        """Load RSA private key from file"""
-        with open(private_key_path, 'rb') as key_file:
-            private_key = load_pem_private_key(
-                key_file.read(),
-                password=passphrase.encode() if passphrase else None,
-            )
-        
-        # Convert to DER format for Snowflake
-        private_key_der = private_key.private_bytes(
-            encoding=serialization.Encoding.DER,
-            format=serialization.PrivateFormat.PKCS8,
-            encryption_algorithm=serialization.NoEncryption()
-        )
-        return private_key_der
+        """Load RSA private key from file, reusing the parsed key until the file changes"""
+        mtime_ns = os.stat(private_key_path).st_mtime_ns
+        return _load_private_key_der(private_key_path, mtime_ns, passphrase)
 
     def _get_connection_params(self):
         """Get connection parameters, preferring dynamic values over environment variables"""
-        return {
-            'account': self.dynamic_account or os.getenv('SNOWFLAKE_ACCOUNT'),
-            'user': self.dynamic_user or os.getenv('SNOWFLAKE_USER'),
-            'warehouse': self.dynamic_warehouse or os.getenv('SNOWFLAKE_WAREHOUSE') or 'COMPUTE_WH',
-            'role': self.dynamic_role or os.getenv('SNOWFLAKE_ROLE', 'ACCOUNTADMIN'),
-            'database': 'SNOWFLAKE',
-            'schema': 'ACCOUNT_USAGE'
-        }
-
-    def connect(self) -> snowflake.connector.SnowflakeConnection:
-        """Create a connection to Snowflake using dynamic parameters or environment variables"""
-        if self.connection is None:
-            params = self._get_connection_params()
-            private_key_path = os.getenv('SNOWFLAKE_PRIVATE_KEY_PATH')
-            
-            if private_key_path and os.path.exists(private_key_path):
-                # Use RSA key authentication
-                passphrase = os.getenv('SNOWFLAKE_PRIVATE_KEY_PASSPHRASE')
-                private_key_der = self._load_private_key(private_key_path, passphrase)
-                
-                self.connection = snowflake.connector.connect(
-                    account=params['account'],
-                    user=params['user'],
-                    private_key=private_key_der,
-                    warehouse=params['warehouse'],
-                    role=params['role'],
-                    database=params['database'],
-                    schema=params['schema']
-                )
+        if self._params_cache is None:
+            self._params_cache = {
+                'account': self.dynamic_account or envs.SNOWFLAKE_ACCOUNT,
+                'user': self.dynamic_user or envs.SNOWFLAKE_USER,
+                'warehouse': self.dynamic_warehouse or envs.SNOWFLAKE_WAREHOUSE,
+                'role': self.dynamic_role or envs.SNOWFLAKE_ROLE,
+                'database': 'SNOWFLAKE',
+                'schema': 'ACCOUNT_USAGE'
+            }
+        return self._params_cache
+
+    @staticmethod
+    def _pool_key(params: Dict[str, Any]) -> tuple:
+        """Connections are only interchangeable for the same account, user, warehouse and role"""
+        return (params['account'], params['user'], params['warehouse'], params['role'])
+
+    def _get_session_parameters(self):
+        """Session parameters applied to every connection"""
+        # USE_CACHED_RESULT already defaults to TRUE; only override an account or user
+        # level setting that turned it off when SNOWFLAKE_FORCE_RESULT_CACHE asks for it
+        if envs.SNOWFLAKE_FORCE_RESULT_CACHE:
+            return {'USE_CACHED_RESULT': True}
+        return {}
+
+    @staticmethod
+    def _fetch_dataframe(cursor) -> pd.DataFrame:
+        """Fetch the cursor's remaining rows as a DataFrame, via Arrow result chunks when possible"""
+        from snowflake.connector.errors import NotSupportedError, ProgrammingError
+        
+        columns = [desc[0] for desc in cursor.description]
+        try:
+            df = cursor.fetch_pandas_all()
+            # Keep the column names on empty results so callers can still select columns
+            if not len(df.columns):
+                df = pd.DataFrame(columns=columns)
+        except (NotSupportedError, ProgrammingError):
+            # Non-SELECT statements have no Arrow result, and the connector raises
+            # ProgrammingError when its pandas/pyarrow extra is not installed
+            df = pd.DataFrame(cursor.fetchall(), columns=columns)
+        return SnowflakeConnection._normalize_dtypes(df, cursor.description)
+
+    @staticmethod
+    def _fetch_preview(cursor, max_rows: int) -> pd.DataFrame:
+        """Fetch at most max_rows rows as a DataFrame, converting only those rows from Arrow"""
+        # pyarrow ships with the connector's pandas extra, a hard requirement
+        import pyarrow as pa
+        from snowflake.connector.errors import NotSupportedError, ProgrammingError
+        
+        columns = [desc[0] for desc in cursor.description]
+        try:
+            tables = []
+            remaining = max_rows
+            # Stop at the batch that completes max_rows; later result chunks are never converted
+            for table in cursor.fetch_arrow_batches():
+                tables.append(table.slice(0, remaining))
+                remaining -= tables[-1].num_rows
+                if remaining <= 0:
+                    break
+            df = pa.concat_tables(tables).to_pandas() if tables else pd.DataFrame(columns=columns)
+        except (NotSupportedError, ProgrammingError):
+            df = pd.DataFrame(cursor.fetchmany(max_rows), columns=columns)
+        return SnowflakeConnection._normalize_dtypes(df, cursor.description)
+
+    @staticmethod
+    def _normalize_dtypes(df: pd.DataFrame, description) -> pd.DataFrame:
+        """Convert object columns left by row fetches or DECIMAL Arrow columns to numpy dtypes"""
+        # Match the dtypes fetch_pandas_all produces: NUMBER/FLOAT columns
+        # become int64, or float64 when they hold NULLs or a scale (Decimal values),
+        # and TIMESTAMP columns become datetime64 so .dt accessors work either way
+        for position, desc in enumerate(description):
+            column = df.iloc[:, position]
+            if column.dtype != object or not len(column):
+                continue
+            if desc[1] in _NUMERIC_TYPE_CODES:
+                column = pd.to_numeric(column)
+                if desc[1] == _FIXED_TYPE_CODE and not desc[5] and column.notna().all():
+                    column = column.astype('int64')
+            elif desc[1] in _TIMESTAMP_TYPE_CODES:
+                try:
+                    column = pd.to_datetime(column)
+                except (ValueError, TypeError):
+                    # TIMESTAMP_TZ values with mixed UTC offsets need a common zone
+                    column = pd.to_datetime(column, utc=True)
             else:
-                # Fall back to password authentication
-                self.connection = snowflake.connector.connect(
-                    account=params['account'],
-                    user=params['user'],
-                    password=os.getenv('SNOWFLAKE_PASSWORD'),
-                    warehouse=params['warehouse'],
-                    role=params['role'],
-                    database=params['database'],
-                    schema=params['schema']
-                )
-        return self.connection
-
-    def execute_query(self, query: str) -> pd.DataFrame:
-        """Execute a query and return results as a pandas DataFrame"""
-        conn = self.connect()
-        cursor = conn.cursor()
+                continue
+            df.isetitem(position, column)
+        return df
+
+    def _open_connection(self, params: Dict[str, Any]) -> 'snowflake.connector.SnowflakeConnection':
+        """Open a new connection to Snowflake with the given connection parameters"""
+        import snowflake.connector
+        
+        private_key_path = envs.SNOWFLAKE_PRIVATE_KEY_PATH
+        
+        if private_key_path and os.path.exists(private_key_path):
+            # Use RSA key authentication
+            passphrase = envs.SNOWFLAKE_PRIVATE_KEY_PASSPHRASE
+            private_key_der = self._load_private_key(private_key_path, passphrase)
+            
+            return snowflake.connector.connect(
+                account=params['account'],
+                user=params['user'],
+                private_key=private_key_der,
+                warehouse=params['warehouse'],
+                role=params['role'],
+                database=params['database'],
+                schema=params['schema'],
+                session_parameters=self._get_session_parameters(),
+                client_session_keep_alive=True,
+                login_timeout=LOGIN_TIMEOUT_SECONDS,
+                # Download result chunks in parallel while earlier ones are parsed
+                client_prefetch_threads=4
+            )
+        else:
+            # Fall back to password authentication
+            return snowflake.connector.connect(
+                account=params['account'],
+                user=params['user'],
+                password=envs.SNOWFLAKE_PASSWORD,
+                warehouse=params['warehouse'],
+                role=params['role'],
+                database=params['database'],
+                schema=params['schema'],
+                session_parameters=self._get_session_parameters(),
+                client_session_keep_alive=True,
+                login_timeout=LOGIN_TIMEOUT_SECONDS,
+                # Download result chunks in parallel while earlier ones are parsed
+                client_prefetch_threads=4
+            )
+
+    def _checkout(self) -> Tuple[tuple, queue.LifoQueue, '_PooledConnection']:
+        """Take an idle pooled connection, open a new one, or wait for one to be returned"""
+        while True:
+            params = self._get_connection_params()
+            key = self._pool_key(params)
+            with self._pool_lock:
+                pool = self._pools.setdefault(key, queue.LifoQueue())
+                entry = self._take_idle(pool)
+                can_open = entry is None and self._pool_open.get(key, 0) < self.pool_size
+                if can_open:
+                    self._pool_open[key] = self._pool_open.get(key, 0) + 1
+            if entry is not None:
+                return key, pool, entry
+            if can_open:
+                break
+            # Every connection is in use; a returned one, or None for a freed slot
+            entry = pool.get()
+            if entry is not None:
+                return key, pool, entry
+        
         try:
-            cursor.execute(query)
-            results = cursor.fetchall()
-            columns = [desc[0] for desc in cursor.description]
-            return pd.DataFrame(results, columns=columns)
+            return key, pool, _PooledConnection(self._open_connection(params))
+        except Exception:
+            self._release_slot(key, pool)
+            raise
+
+    @staticmethod
+    def _take_idle(pool: queue.LifoQueue) -> Optional['_PooledConnection']:
+        """Pop an idle connection, discarding freed-slot markers left by no-longer-waiting callers"""
+        while True:
+            try:
+                entry = pool.get_nowait()
+            except queue.Empty:
+                return None
+            if entry is not None:
+                return entry
+
+    def _release_slot(self, key: tuple, pool: queue.LifoQueue):
+        """Give up a pool slot held by a connection that failed or was closed"""
+        with self._pool_lock:
+            if self._pools.get(key) is pool:
+                self._pool_open[key] -= 1
+                pool.put(None)
+
+    def _checkin(self, key: tuple, pool: queue.LifoQueue, entry: '_PooledConnection'):
+        """Return a connection to its pool, or close it if the pool was flushed meanwhile"""
+        if not entry.connection.is_closed():
+            with self._pool_lock:
+                if self._pools.get(key) is pool:
+                    pool.put(entry)
+                    return
+            entry.close()
+            return
+        self._release_slot(key, pool)
+
+    @contextmanager
+    def _checked_out(self) -> Iterator['_PooledConnection']:
+        """Hold a pooled connection for the duration of the block"""
+        key, pool, entry = self._checkout()
+        try:
+            yield entry
         finally:
-            cursor.close()
+            self._checkin(key, pool, entry)
+
+    @contextmanager
+    def acquire(self) -> Iterator['snowflake.connector.SnowflakeConnection']:
+        """
+        Check out a live connection for the current account parameters.
+        
+        Up to pool_size calls can hold a connection at once; further calls wait for
+        one to be returned. Connections are returned to the pool on exit, so the
+        login handshake is paid once per pooled connection rather than per query.
+        
+        Usage:
+            with snowflake_conn.acquire() as conn:
+                cursor = conn.cursor()
+        """
+        with self._checked_out() as entry:
+            yield entry.connection
+
+    @contextmanager
+    def _cursor(self) -> Iterator[Any]:
+        """Check out a pooled connection and yield its cursor, created once and reused across queries"""
+        with self._checked_out() as entry:
+            yield entry.get_cursor()
+
+    def _flush_pool(self, key: tuple):
+        """Close the idle connections for one parameter key; checked-out ones close on return"""
+        with self._pool_lock:
+            pool = self._pools.pop(key, None)
+            self._pool_open.pop(key, None)
+        if pool is None:
+            return
+        while True:
+            try:
+                entry = pool.get_nowait()
+            except queue.Empty:
+                break
+            if entry is not None:
+                entry.close()
+        # Wake callers waiting on this pool so they check out from the current one
+        for _ in range(self.pool_size):
+            pool.put(None)
+
+    def _get_cached_result(self, key: str):
+        """Look up a cached result, returning a copy so callers can modify it freely"""
+        with self._result_cache_lock:
+            cached = self._result_cache.get(key)
+        if cached is None:
+            return None
+        df, *rest = cached
+        return (df.copy(), *rest)
+
+    def _set_cached_result(self, key: str, *result):
+        """Store a result tuple in the result cache"""
+        with self._result_cache_lock:
+            self._result_cache[key] = result
+
+    def clear_result_cache(self):
+        """Drop every cached query result"""
+        with self._result_cache_lock:
+            self._result_cache.clear()
+
+    def execute_query(self, query: str, params: Optional[Dict[str, Any]] = None) -> pd.DataFrame:
+        """Execute a query with optional bind parameters and return results as a pandas DataFrame"""
+        cacheable = is_cacheable_query(query)
+        if cacheable:
+            key = result_cache_key(query, params)
+            cached = self._get_cached_result(key)
+            if cached is not None:
+                return cached[0]
+        
+        with self._cursor() as cursor:
+            cursor.execute(query, params)
+            df = self._fetch_dataframe(cursor)
+        
+        if cacheable:
+            self._set_cached_result(key, df.copy())
+        return df
+
+    def execute_query_arrow(self, query: str, params: Optional[Dict[str, Any]] = None) -> 'pyarrow.Table':
+        """
+        Execute a query and return its result as a pyarrow Table, without converting to pandas.
+        
+        Integer and timestamp columns keep their Snowflake types (no float/NaN coercion
+        of nullable ints), and aggregations can run directly with pyarrow.compute.
+        Callers that need a DataFrame can use .to_pandas(types_mapper=pd.ArrowDtype).
+        Results are not cached; tools calling this are wrapped in ttl_cache instead.
+        """
+        with self._cursor() as cursor:
+            cursor.execute(query, params)
+            # Empty results come back as an empty table with the schema rather than None
+            return cursor.fetch_arrow_all(force_return_table=True)
+
+    def execute_scalar_row(self, query: str, params: Optional[Dict[str, Any]] = None) -> Optional[tuple]:
+        """Execute a query and return its first row as a tuple (None if empty), without building a DataFrame"""
+        with self._cursor() as cursor:
+            cursor.execute(query, params)
+            return cursor.fetchone()
+
+    def execute_scalar(self, query: str, params: Optional[Dict[str, Any]] = None) -> Any:
+        """Execute a query and return the first column of its first row, without building a DataFrame"""
+        row = self.execute_scalar_row(query, params)
+        return row[0] if row else None
+
+    def execute_query_preview(self, query: str, max_rows: int,
+                              params: Optional[Dict[str, Any]] = None) -> Tuple[pd.DataFrame, int]:
+        """
+        Execute a query but only download its first max_rows rows.
+        
+        Returns:
+            Tuple of (DataFrame with at most max_rows rows, total row count of the result)
+        """
+        cacheable = is_cacheable_query(query)
+        if cacheable:
+            key = result_cache_key(query, params, 'preview', max_rows)
+            cached = self._get_cached_result(key)
+            if cached is not None:
+                return cached
+        
+        with self._cursor() as cursor:
+            cursor.execute(query, params)
+            # Result chunks past the first max_rows rows are never converted to pandas
+            df = self._fetch_preview(cursor, max_rows)
+            total_rows = cursor.rowcount if cursor.rowcount is not None else len(df)
+        
+        if cacheable:
+            self._set_cached_result(key, df.copy(), total_rows)
+        return df, total_rows
+
+    def execute_queries_async(self, queries: List[Tuple[str, Optional[Dict[str, Any]]]],
+                              poll_interval: float = 0.5) -> List[Union[pd.DataFrame, Exception]]:
+        """
+        Submit several (query, params) pairs at once and collect their results as DataFrames.
+        
+        All queries run concurrently on the warehouse, so the wall-clock time is
+        roughly that of the slowest query. A query that fails yields its exception
+        in place of a DataFrame so the other results remain usable.
+        """
+        with self._cursor() as cursor:
+            conn = cursor.connection
+            query_ids = []
+            for query, params in queries:
+                cursor.execute_async(query, params)
+                query_ids.append(cursor.sfqid)
+        
+            results = []
+            for query_id in query_ids:
+                try:
+                    while conn.is_still_running(conn.get_query_status_throw_if_error(query_id)):
+                        time.sleep(poll_interval)
+                    cursor.get_results_from_sfqid(query_id)
+                    results.append(self._fetch_dataframe(cursor))
+                except Exception as e:
+                    results.append(e)
+            return results
 
     def close(self):
-        """Close the connection"""
-        if self.connection:
-            self.connection.close()
-            self.connection = None
+        """Close every pooled connection"""
+        with self._pool_lock:
+            keys = list(self._pools)
+        for key in keys:
+            self._flush_pool(key)
 
     def set_account_parameters(self, account: str, user: str = None, warehouse: str = None, role: str = None):
-        """Set dynamic account parameters and close existing connection"""
+        """Set dynamic account parameters and close the pooled connections for the previous ones"""
+        previous_key = self._pool_key(self._get_connection_params())
         self.dynamic_account = account
         self.dynamic_user = user
         self.dynamic_warehouse = warehouse
         self.dynamic_role = role
+        self._params_cache = None
         
-        # Close existing connection to force reconnection with new parameters
-        self.close()
+        # Pools for other parameter keys stay warm for switching back
+        if self._pool_key(self._get_connection_params()) != previous_key:
+            self._flush_pool(previous_key)
+        
+        # Cached results belong to the previous account
+        clear_all_caches()
+        self.clear_result_cache()
         
         return f"Account parameters updated: {account}"
 
     def test_connection(self) -> bool:
         """Test the connection to Snowflake and return True if successful"""
         try:
-            conn = self.connect()
-            cursor = conn.cursor()
-            cursor.execute("SELECT 1")
-            cursor.fetchone()
-            cursor.close()
+            self.execute_scalar("SELECT 1")
             return True
         except Exception as e:
-            # Close the failed connection
-            self.close()
+            # Close the current parameters' pooled connections; other pools are unaffected
+            self._flush_pool(self._pool_key(self._get_connection_params()))
             return False
 
     def get_current_account_info(self) -> str:
         """Get information about the current connection parameters"""
         params = self._get_connection_params()
         
-        info = []
-        info.append(f"Account: {params['account']}")
-        info.append(f"User: {params['user']}")
-        info.append(f"Warehouse: {params['warehouse']}")
-        info.append(f"Role: {params['role']}")
-        info.append(f"Database: {params['database']}")
-        info.append(f"Schema: {params['schema']}")
-        
-        # Check if connection is active
-        if self.connection:
-            info.append("Status: Connected")
-        else:
-            info.append("Status: Not connected")
+        # Check if any pooled connection is open for these parameters
+        with self._pool_lock:
+            open_connections = self._pool_open.get(self._pool_key(params), 0)
+        status = f"Connected ({open_connections} pooled connection(s))" if open_connections else "Not connected"
         
-        return "\n".join(info)
+        return (
+            f"Account: {params['account']}\n"
+            f"User: {params['user']}\n"
+            f"Warehouse: {params['warehouse']}\n"
+            f"Role: {params['role']}\n"
+            f"Database: {params['database']}\n"
+            f"Schema: {params['schema']}\n"
+            f"Status: {status}"
+        )
+
+    def get_warehouse(self) -> str:
+        """Get the warehouse new connections use, preferring the dynamic override"""
+        return self._get_connection_params()['warehouse']
 
     def get_credit_price(self) -> float:
-        """Get the credit price from environment variables"""
-        return float(os.getenv('SNOWFLAKE_CREDIT_PRICE', '4.00'))
+        """Get the credit price from environment variables, parsed at most once per day"""
+        now = time.monotonic()
+        if now >= self._credit_price_expires:
+            envs.refresh('SNOWFLAKE_CREDIT_PRICE')
+            self._credit_price_expires = now + CREDIT_PRICE_TTL_SECONDS
+        return envs.SNOWFLAKE_CREDIT_PRICE
+
+    def clear_credit_price_cache(self):
+        """
+        Drop the memoized credit price so the next lookup re-parses SNOWFLAKE_CREDIT_PRICE.
+        
+        This is a cache flush, not a price lookup: the price only ever comes from the
+        process environment, so a new price still needs a restart with the new value.
+        """
+        self._credit_price_expires = 0.0
 
-# Global connection instance
-snowflake_conn = SnowflakeConnection()
\ No newline at end of file
+# Global connection pool
+snowflake_conn = SnowflakeConnection(pool_size=envs.SNOWFLAKE_POOL_SIZE or DEFAULT_POOL_SIZE)
\ No newline at end of file
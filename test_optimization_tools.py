@@ -11,6 +11,16 @@ from tools.performance import analyze_slow_queries
 from tools.costs import analyze_warehouse_costs
 from utils.snowflake_connection import snowflake_conn
 
+# ACCOUNT_USAGE access probes, built once so repeated runs send identical statement text
+_DIAG_DAYS_BACK = 7
+_DIAG_QUERIES = (
+    ("QUERY_HISTORY table", f"SELECT COUNT(*) as query_count FROM snowflake.account_usage.query_history WHERE start_time >= DATEADD(day, -{_DIAG_DAYS_BACK}, CURRENT_TIMESTAMP())"),
+    ("WAREHOUSE_METERING_HISTORY table", f"SELECT COUNT(*) as warehouse_count FROM snowflake.account_usage.warehouse_metering_history WHERE start_time >= DATEADD(day, -{_DIAG_DAYS_BACK}, CURRENT_TIMESTAMP())"),
+    ("WAREHOUSES table", "SELECT COUNT(*) as warehouse_def_count FROM snowflake.account_usage.warehouses"),
+)
+# Every probe as a scalar subquery, so all counts come back in one round trip
+_DIAG_COMBINED_QUERY = "SELECT " + ", ".join(f"({query})" for _, query in _DIAG_QUERIES)
+
 def test_connection():
     """Test basic connection to Snowflake"""
     print("=" * 50)
@@ -20,16 +30,17 @@ def test_connection():
     try:
         # Try a simple query to verify connection
         query = "SELECT CURRENT_TIMESTAMP() as test_time, CURRENT_USER() as test_user, CURRENT_ROLE() as test_role"
-        df = snowflake_conn.execute_query(query)
+        row = snowflake_conn.execute_scalar_row(query)
         
-        if df.empty:
+        if row is None:
             print("❌ Connection test failed - no results returned")
             return False
         else:
+            test_time, test_user, test_role = row
             print("✅ Connection successful!")
-            print(f"Current time: {df.iloc[0]['TEST_TIME']}")
-            print(f"Current user: {df.iloc[0]['TEST_USER']}")
-            print(f"Current role: {df.iloc[0]['TEST_ROLE']}")
+            print(f"Current time: {test_time}")
+            print(f"Current user: {test_user}")
+            print(f"Current role: {test_role}")
             return True
             
     except Exception as e:
@@ -43,20 +54,21 @@ def test_account_usage_access():
     print("=" * 50)
     
     try:
-        # Try to query ACCOUNT_USAGE tables
-        test_queries = [
-            ("QUERY_HISTORY table", "SELECT COUNT(*) as query_count FROM snowflake.account_usage.query_history WHERE start_time >= DATEADD(day, -7, CURRENT_TIMESTAMP())"),
-            ("WAREHOUSE_METERING_HISTORY table", "SELECT COUNT(*) as warehouse_count FROM snowflake.account_usage.warehouse_metering_history WHERE start_time >= DATEADD(day, -7, CURRENT_TIMESTAMP())"),
-            ("WAREHOUSES table", "SELECT COUNT(*) as warehouse_def_count FROM snowflake.account_usage.warehouses"),
-        ]
+        # Fetch every count in one round trip; only probe tables one by one if that fails
+        try:
+            counts = snowflake_conn.execute_scalar_row(_DIAG_COMBINED_QUERY)
+            for (table_name, _), count in zip(_DIAG_QUERIES, counts):
+                print(f"✅ {table_name}: {count} records found")
+            return
+        except Exception as e:
+            print(f"⚠️ Combined ACCOUNT_USAGE check failed ({str(e)}), checking tables individually")
         
-        for table_name, query in test_queries:
+        for table_name, query in _DIAG_QUERIES:
             try:
-                df = snowflake_conn.execute_query(query)
-                if df.empty:
+                count = snowflake_conn.execute_scalar(query)
+                if count is None:
                     print(f"❌ {table_name}: No access or query failed")
                 else:
-                    count = df.iloc[0].iloc[0]  # First column of first row
                     print(f"✅ {table_name}: {count} records found")
                     
             except Exception as e:
@@ -82,8 +94,7 @@ def test_slow_queries():
             # Try a broader query to see if there's ANY query history
             try:
                 query = "SELECT COUNT(*) as total_queries FROM snowflake.account_usage.query_history WHERE start_time >= DATEADD(day, -30, CURRENT_TIMESTAMP())"
-                df = snowflake_conn.execute_query(query)
-                total_queries = df.iloc[0]['TOTAL_QUERIES']
+                total_queries = snowflake_conn.execute_scalar(query)
                 print(f"Total queries in last 30 days: {total_queries}")
                 
                 if total_queries == 0:
@@ -119,14 +130,12 @@ def test_warehouse_costs():
             # Check if warehouses exist at all
             try:
                 query = "SELECT COUNT(*) as warehouse_count FROM snowflake.account_usage.warehouses"
-                df = snowflake_conn.execute_query(query)
-                warehouse_count = df.iloc[0]['WAREHOUSE_COUNT']
+                warehouse_count = snowflake_conn.execute_scalar(query)
                 print(f"Total warehouses defined: {warehouse_count}")
                 
                 # Check metering history
                 query = "SELECT COUNT(*) as metering_records FROM snowflake.account_usage.warehouse_metering_history WHERE start_time >= DATEADD(day, -30, CURRENT_TIMESTAMP())"
-                df = snowflake_conn.execute_query(query)
-                metering_records = df.iloc[0]['METERING_RECORDS']
+                metering_records = snowflake_conn.execute_scalar(query)
                 print(f"Metering records in last 30 days: {metering_records}")
                 
                 if warehouse_count == 0:
@@ -164,18 +173,19 @@ def test_simple_account_usage_query():
         FROM snowflake.account_usage.query_history 
         """
         
-        df = snowflake_conn.execute_query(query)
+        row = snowflake_conn.execute_scalar_row(query)
         
-        if df.empty:
+        if row is None:
             print("❌ Simple ACCOUNT_USAGE query returned no results")
         else:
+            total_queries, earliest_query, latest_query = row
             print("✅ Simple ACCOUNT_USAGE query successful:")
-            print(f"Total queries ever: {df.iloc[0]['TOTAL_QUERIES']}")
-            print(f"Earliest query: {df.iloc[0]['EARLIEST_QUERY']}")
-            print(f"Latest query: {df.iloc[0]['LATEST_QUERY']}")
+            print(f"Total queries ever: {total_queries}")
+            print(f"Earliest query: {earliest_query}")
+            print(f"Latest query: {latest_query}")
             
             # Additional diagnostic info
-            if df.iloc[0]['TOTAL_QUERIES'] == 0:
+            if total_queries == 0:
                 print("\n❌ Account has no query history at all")
                 print("This suggests:")
                 print("  - Brand new account")
@@ -191,8 +201,7 @@ def test_simple_account_usage_query():
                 WHERE start_time >= DATEADD(day, -7, CURRENT_TIMESTAMP())
                 """
                 
-                df_recent = snowflake_conn.execute_query(recent_query)
-                recent_count = df_recent.iloc[0]['RECENT_QUERIES']
+                recent_count = snowflake_conn.execute_scalar(recent_query)
                 print(f"Queries in last 7 days: {recent_count}")
                 
                 if recent_count == 0: